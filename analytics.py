@@ -0,0 +1,477 @@
+"""Analytics charts for the typing test.
+
+Each view owns one matplotlib Figure whose artists are created once and
+then updated in place (line data, bar sizes, collection vertices, image
+arrays), so refreshing a view neither creates figures nor leaks them. The
+figures are plain ``matplotlib.figure.Figure`` objects, not pyplot ones, and
+can be embedded in Tk or rendered offscreen.
+
+This module imports numpy, matplotlib and seaborn (which pulls in pandas), so the app only
+imports it through ``load_analytics_stack``.
+"""
+import math
+
+import matplotlib.dates as mdates
+import numpy as np
+import seaborn as sns
+from matplotlib.figure import Figure
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+TOP_USERS = 10
+VIOLIN_USERS = 5
+HISTOGRAM_BINS = 10
+KDE_POINTS = 200
+
+# Progress charts plot at most one point per PIXELS_PER_POINT pixels of axes
+# width; longer histories are averaged into the finest bucket that fits
+PIXELS_PER_POINT = 4
+BUCKETS = ('day', 'week', 'month')
+BUCKET_LABELS = {'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+EPOCH = mdates.date2num(np.datetime64('1970-01-01'))  # A Thursday
+
+
+def kde_curve(values, grid, weights=None):
+    """Gaussian kernel density of ``values`` on ``grid`` (Scott's bandwidth).
+
+    ``weights`` gives the number of samples at each value, so a histogram
+    of (value, count) pairs has the same density as the expanded samples.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=float)
+    count = weights.sum()
+    mean = np.average(values, weights=weights) if count else 0.0
+    variance = (weights * (values - mean) ** 2).sum() / (count - 1) if count > 1 else 0.0
+    if variance <= 0:
+        return np.zeros_like(grid)
+    bandwidth = math.sqrt(variance) * count ** -0.2
+    offsets = (grid[:, None] - values[None, :]) / bandwidth
+    return (np.exp(-0.5 * offsets ** 2) @ weights) / (count * bandwidth * math.sqrt(2 * math.pi))
+
+
+def weighted_median(values, weights):
+    """Median of sorted ``values`` repeated ``weights`` times"""
+    cumulative = np.cumsum(weights)
+    return values[np.searchsorted(cumulative, cumulative[-1] / 2)]
+
+
+def padded_limits(low, high, fraction=0.05, minimum=1.0):
+    """Axis limits around [low, high] with some padding"""
+    pad = max((high - low) * fraction, minimum)
+    return low - pad, high + pad
+
+
+def area_vertices(x, y):
+    """Polygon vertices for the area between a line and y = 0"""
+    return np.concatenate([[[x[0], 0]], np.column_stack([x, y]), [[x[-1], 0]]])
+
+
+def bucket_keys(dates, bucket):
+    """Start of the day, week (from Monday) or month of each date number"""
+    days = np.floor(dates)
+    if bucket == 'day':
+        return days
+    if bucket == 'week':
+        return days - (days - EPOCH + 3) % 7
+    months = (days - EPOCH).astype('int64').astype('datetime64[D]').astype('datetime64[M]')
+    return months.astype('datetime64[D]').astype('int64') + EPOCH
+
+
+def aggregate(dates, keys, series):
+    """Mean, min and max of each series over runs of equal (sorted) keys"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    return {
+        'dates': np.add.reduceat(dates, starts) / counts,
+        'count': counts,
+        'mean': [np.add.reduceat(values, starts) / counts for values in series],
+        'min': [np.minimum.reduceat(values, starts) for values in series],
+        'max': [np.maximum.reduceat(values, starts) for values in series]
+    }
+
+
+def lttb(x, y, threshold):
+    """Indices of ``threshold`` points picked by Largest-Triangle-Three-Buckets"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(dates, series, max_points):
+    """Reduce chronological series to at most ``max_points`` points.
+
+    Returns None when the raw points fit. Otherwise the points are averaged
+    into daily, weekly or monthly buckets, whichever is finest with few
+    enough buckets, and the result has each bucket's mean date, test count
+    and per-series mean, min and max. If even monthly buckets are too many,
+    LTTB picks which of them to keep, guided by the first series.
+    """
+    if len(dates) <= max_points:
+        return None
+    for bucket in BUCKETS:
+        keys = bucket_keys(dates, bucket)
+        if np.count_nonzero(keys[1:] != keys[:-1]) + 1 <= max_points:
+            break
+    buckets = aggregate(dates, keys, series)
+    buckets['bucket'] = bucket
+    if len(buckets['dates']) > max_points:
+        keep = lttb(buckets['dates'], buckets['mean'][0], max_points)
+        buckets = {name: ([values[keep] for values in column] if isinstance(column, list) else column[keep])
+                   for name, column in buckets.items() if name != 'bucket'}
+        buckets['bucket'] = bucket
+    return buckets
+
+
+def band_vertices(x, low, high):
+    """Polygon vertices for the band between two lines"""
+    return np.concatenate([np.column_stack([x, high]), np.column_stack([x, low])[::-1]])
+
+
+def create_figure():
+    """A figure sized for the 2x2 analytics layout"""
+    return Figure(figsize=(12, 8))
+
+
+class AnalyticsView:
+    """Base class for a figure whose artists are updated in place"""
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.laid_out = False
+
+    def lay_out(self):
+        """Fit the subplots to their labels once, on the first update.
+
+        tight_layout measures every tick label and costs more than drawing
+        the figure, so later refreshes keep the first layout.
+        """
+        if not self.laid_out:
+            self.figure.tight_layout()
+            self.laid_out = True
+
+
+# One row of StatsDatabase.get_user_history
+HISTORY_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[s]'),
+    ('wpm', 'i4'),
+    ('accuracy', 'i4'),
+    ('total_chars', 'i8'),
+    ('cpm', 'i4')
+])
+
+
+def prepare_user_data(history):
+    """Load ``get_user_history`` rows into arrays for the user view.
+
+    The rows become one structured array in a single conversion (the epoch
+    timestamps are read straight into datetime64, not per row in Python),
+    and the summary statistics are reductions over its columns.
+    """
+    history = np.array(history, dtype=HISTORY_DTYPE)
+    wpms = history['wpm'].astype(float)
+    accuracies = history['accuracy'].astype(float)
+    return {
+        'dates': mdates.date2num(history['timestamp']),
+        'wpm': wpms,
+        'accuracy': accuracies,
+        'summary': {
+            'total_tests': len(history),
+            'best_wpm': wpms.max(),
+            'avg_wpm': wpms.mean(),
+            'best_accuracy': accuracies.max(),
+            'avg_accuracy': accuracies.mean(),
+            'total_chars': history['total_chars'].sum(),
+            'avg_cpm': history['cpm'].mean(),
+            'improving': len(history) > 1 and wpms[-1] > wpms[0]
+        }
+    }
+
+
+def user_summary_text(username, data):
+    """Summary shown under the user charts"""
+    summary = data['summary']
+    return f"""
+📊 DETAILED ANALYTICS FOR {username.upper()}:
+Total Tests: {summary['total_tests']} | Best WPM: {summary['best_wpm']:.0f} | Average WPM: {summary['avg_wpm']:.1f} | Best Accuracy: {summary['best_accuracy']:.0f}%
+Average Accuracy: {summary['avg_accuracy']:.1f}% | Total Characters Typed: {summary['total_chars']} | Average CPM: {summary['avg_cpm']:.1f}
+Improvement Trend: {"📈 Improving" if summary['improving'] else "📊 Stable"}
+"""
+
+
+def query_comparison_data(db):
+    """Run the comparison view's aggregate queries on a StatsDatabase.
+
+    Returns (overall, user_summaries, top_users, distributions, activity,
+    leaders); only aggregates leave the database, never per-test rows.
+    """
+    top_users = db.get_top_users(TOP_USERS)
+    distribution_users = [user['username'] for user in top_users[:VIOLIN_USERS]]
+    return (db.get_overall_summary(), db.get_user_summaries(), top_users,
+            db.get_wpm_distributions(distribution_users), db.get_activity(), db.get_leaders())
+
+
+def prepare_comparison_data(user_summaries, top_users, distributions, activity, leaders):
+    """Arrays for the comparison view from the database's aggregate queries.
+
+    ``top_users`` are user summaries, ``leaders`` maps leaderboard names to
+    the summary of the user in first place (or None), ``distributions``
+    maps usernames to (wpm, count) pairs and ``activity`` is a list of
+    (day_of_week, hour, count) rows; nothing here is per test.
+    """
+    activity_counts = np.zeros((7, 24), dtype=int)
+    if activity:
+        days, hours, counts = np.array(activity).T
+        activity_counts[days, hours] = counts
+    return {
+        'top_users': [user['username'] for user in top_users],
+        'top_avg_wpm': np.array([user['avg_wpm'] for user in top_users]),
+        'avg_wpm': np.array([user['avg_wpm'] for user in user_summaries]),
+        'avg_accuracy': np.array([user['avg_accuracy'] for user in user_summaries]),
+        'test_count': np.array([user['test_count'] for user in user_summaries]),
+        'distributions': [(username, np.array(pairs, dtype=float).reshape(-1, 2))
+                          for username, pairs in distributions.items() if pairs],
+        'activity': activity_counts,
+        'leaders': {board: (leader['username'], leader) if leader else ("N/A", None)
+                    for board, leader in leaders.items()}
+    }
+
+
+def comparison_summary_text(data, overall):
+    """Summary shown under the comparison charts"""
+    top_performer = data['top_users'][0] if data['top_users'] else "N/A"
+    top_wpm = data['top_avg_wpm'][0] if len(data['top_avg_wpm']) else 0
+    most_active, most_active_summary = data['leaders']['activity']
+    fastest, fastest_summary = data['leaders']['best_wpm']
+    most_accurate, most_accurate_summary = data['leaders']['accuracy']
+    return f"""
+🏆 PLATFORM COMPARISON ANALYTICS:
+Total Users: {overall['unique_users']} | Total Tests: {overall['total_tests']} | Platform Avg WPM: {overall['avg_wpm']:.1f} | Platform Avg Accuracy: {overall['avg_accuracy']:.1f}%
+Total Characters Typed: {overall['total_chars']:,} | Top Performer: {top_performer} ({top_wpm:.1f} WPM avg)
+Most Active User: {most_active} ({most_active_summary['test_count'] if most_active_summary else 0} tests) | Fastest Test: {fastest} ({fastest_summary['wpm_max'] if fastest_summary else 0} WPM) | Most Accurate: {most_accurate} ({most_accurate_summary['avg_accuracy'] if most_accurate_summary else 0:.1f}% avg)
+"""
+
+
+class UserAnalyticsView(AnalyticsView):
+    """Progress, correlation and distribution charts for one user"""
+
+    def __init__(self, figure):
+        super().__init__(figure)
+        with sns.axes_style('whitegrid'):
+            (self.wpm_ax, self.accuracy_ax), (self.scatter_ax, self.histogram_ax) = figure.subplots(2, 2)
+        self.title = figure.suptitle('', fontsize=16, fontweight='bold')
+
+        # Chart 1: WPM Progress Over Time
+        self.wpm_line, = self.wpm_ax.plot([], [], marker='o', linewidth=3, markersize=8, color='#2196f3')
+        self.wpm_area = self.wpm_ax.fill_between([0, 1], [0, 0], alpha=0.3, color='#2196f3')
+        self.wpm_ax.set_ylabel('Words Per Minute')
+
+        # Chart 2: Accuracy Over Time
+        self.accuracy_line, = self.accuracy_ax.plot([], [], marker='s', linewidth=3, markersize=8, color='#4caf50')
+        self.accuracy_area = self.accuracy_ax.fill_between([0, 1], [0, 0], alpha=0.3, color='#4caf50')
+        self.accuracy_ax.set_ylabel('Accuracy (%)')
+        self.progress_charts = ((self.wpm_ax, self.wpm_line, self.wpm_area, 'WPM Progress Over Time'),
+                                (self.accuracy_ax, self.accuracy_line, self.accuracy_area,
+                                 'Accuracy Progress Over Time'))
+
+        # Both progress charts show the same dates; zooming or panning either
+        # one re-buckets the points in the visible range
+        self.accuracy_ax.sharex(self.wpm_ax)
+        self.wpm_ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.data = None
+        for ax in (self.wpm_ax, self.accuracy_ax):
+            ax.xaxis_date()
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax.xaxis.get_major_locator()))
+            ax.tick_params(axis='x', rotation=45)
+
+        # Chart 3: WPM vs Accuracy Scatter with regression line
+        self.scatter = self.scatter_ax.scatter([], [], s=100, alpha=0.7)
+        self.regression_line, = self.scatter_ax.plot([], [], color='red', linewidth=2)
+        self.scatter_ax.set_title('WPM vs Accuracy Correlation', fontweight='bold', fontsize=12)
+        self.scatter_ax.set_xlabel('Words Per Minute')
+        self.scatter_ax.set_ylabel('Accuracy (%)')
+
+        # Chart 4: Performance Distribution with KDE
+        self.bars = self.histogram_ax.bar(np.arange(HISTOGRAM_BINS), np.zeros(HISTOGRAM_BINS), width=1,
+                                          align='edge', color='#ff9800', alpha=0.7, edgecolor='white')
+        self.kde_line, = self.histogram_ax.plot([], [], color='#ff9800', linewidth=2)
+        self.mean_line = self.histogram_ax.axvline(0, color='red', linestyle='--', linewidth=2)
+        self.histogram_ax.set_title('WPM Distribution with Density', fontweight='bold', fontsize=12)
+        self.histogram_ax.set_xlabel('Words Per Minute')
+        self.histogram_ax.set_ylabel('Frequency')
+        self.legend = self.histogram_ax.legend([self.mean_line], ['Average: 0.0'])
+
+    def update(self, username, data):
+        """Show ``prepare_user_data`` output for a user"""
+        dates, wpms, accuracies = data['dates'], data['wpm'], data['accuracy']
+        self.data = data
+        self.title.set_text(f'Performance Analytics for {username}')
+
+        for ax, values in ((self.wpm_ax, wpms), (self.accuracy_ax, accuracies)):
+            ax.set_ylim(0, values.max() * 1.1 + 1)
+        # Setting the limits plots the progress charts and scatter (on_xlim_changed)
+        self.wpm_ax.set_xlim(*padded_limits(dates.min(), dates.max(), minimum=0.5))
+
+        # The fit and the distribution always use the whole history; both are O(n)
+        if len(wpms) > 1 and wpms.std() > 0:
+            slope, intercept = np.polyfit(wpms, accuracies, 1)
+            x = np.array([wpms.min(), wpms.max()])
+            self.regression_line.set_data(x, slope * x + intercept)
+        else:
+            self.regression_line.set_data([], [])
+        self.scatter_ax.set_xlim(*padded_limits(wpms.min(), wpms.max()))
+        self.scatter_ax.set_ylim(*padded_limits(accuracies.min(), accuracies.max()))
+
+        counts, edges = np.histogram(wpms, bins=HISTOGRAM_BINS)
+        for bar, count, left, right in zip(self.bars, counts, edges[:-1], edges[1:]):
+            bar.set_x(left)
+            bar.set_width(right - left)
+            bar.set_height(count)
+        grid = np.linspace(edges[0], edges[-1], KDE_POINTS)
+        values, value_counts = np.unique(wpms, return_counts=True)
+        self.kde_line.set_data(grid, kde_curve(values, grid, value_counts) * len(wpms) * (edges[1] - edges[0]))
+        mean = wpms.mean()
+        self.mean_line.set_xdata([mean, mean])
+        self.legend.get_texts()[0].set_text(f'Average: {mean:.1f}')
+        self.histogram_ax.set_xlim(*padded_limits(edges[0], edges[-1]))
+        self.histogram_ax.set_ylim(0, counts.max() * 1.15)
+
+        self.lay_out()
+
+    def on_xlim_changed(self, ax):
+        if self.data is not None:
+            self.plot_range(*ax.get_xlim())
+
+    def plot_range(self, start, end):
+        """Plot the tests between two date numbers, downsampled to the axes width"""
+        dates = self.data['dates']
+        # One extra point on each side so the lines run to the edges
+        first = max(np.searchsorted(dates, start) - 1, 0)
+        last = min(np.searchsorted(dates, end, side='right') + 1, len(dates))
+        dates, wpms, accuracies = dates[first:last], self.data['wpm'][first:last], self.data['accuracy'][first:last]
+        max_points = max(int(self.wpm_ax.bbox.width / PIXELS_PER_POINT), 2)
+        buckets = downsample(dates, [wpms, accuracies], max_points)
+
+        if buckets is None:
+            for (ax, line, area, title), values in zip(self.progress_charts, (wpms, accuracies)):
+                line.set_data(dates, values)
+                area.set_verts([area_vertices(dates, values)] if len(dates) else [])
+                ax.set_title(title, fontweight='bold', fontsize=12)
+            self.scatter.set_offsets(np.column_stack([wpms, accuracies]))
+            self.scatter.set_sizes([100])
+            self.scatter_ax.set_title('WPM vs Accuracy Correlation', fontweight='bold', fontsize=12)
+            return
+
+        # Bucket means as the line, each bucket's min to max as the band
+        label = BUCKET_LABELS[buckets['bucket']]
+        for (ax, line, area, title), mean, low, high in zip(self.progress_charts, buckets['mean'],
+                                                             buckets['min'], buckets['max']):
+            line.set_data(buckets['dates'], mean)
+            area.set_verts([band_vertices(buckets['dates'], low, high)])
+            ax.set_title(f'{title} ({label} mean, min-max)', fontweight='bold', fontsize=12)
+        wpm_means, accuracy_means = buckets['mean']
+        self.scatter.set_offsets(np.column_stack([wpm_means, accuracy_means]))
+        self.scatter.set_sizes(40 + 160 * buckets['count'] / buckets['count'].max())
+        self.scatter_ax.set_title(f'WPM vs Accuracy Correlation ({label} means)', fontweight='bold', fontsize=12)
+
+
+class ComparisonAnalyticsView(AnalyticsView):
+    """Leaderboard, performance scatter, distributions and activity for all users"""
+
+    def __init__(self, figure):
+        super().__init__(figure)
+        with sns.axes_style('whitegrid'):
+            (self.top_ax, self.scatter_ax), (self.violin_ax, self.activity_ax) = figure.subplots(2, 2)
+        figure.suptitle('User Comparison Analytics', fontsize=16, fontweight='bold')
+
+        # Chart 1: Top Users by Average WPM
+        self.top_bars = self.top_ax.barh(np.arange(TOP_USERS), np.zeros(TOP_USERS),
+                                         color=sns.color_palette('viridis', TOP_USERS))
+        self.top_ax.invert_yaxis()
+        self.top_ax.set_title(f'Top {TOP_USERS} Users by Average WPM', fontweight='bold', fontsize=12)
+        self.top_ax.set_xlabel('Average WPM')
+
+        # Chart 2: WPM vs Accuracy Comparison
+        self.scatter = self.scatter_ax.scatter([], [], c=[], alpha=0.6, cmap='plasma', edgecolors='black', linewidth=1)
+        self.scatter_ax.set_title('User Performance Comparison\n(Size = Number of Tests)', fontweight='bold', fontsize=12)
+        self.scatter_ax.set_xlabel('Average WPM')
+        self.scatter_ax.set_ylabel('Average Accuracy (%)')
+        figure.colorbar(self.scatter, ax=self.scatter_ax, label='Avg WPM')
+
+        # Chart 3: Performance Distribution Comparison (violins drawn as polygons)
+        self.violins = [self.violin_ax.fill([], [], color=color, alpha=0.8, edgecolor='#333')[0]
+                        for color in sns.color_palette('Set2', VIOLIN_USERS)]
+        self.medians, = self.violin_ax.plot([], [], 'o', color='white', markeredgecolor='#333')
+        self.violin_ax.set_title(f'WPM Distribution - Top {VIOLIN_USERS} Users', fontweight='bold', fontsize=12)
+        self.violin_ax.set_ylabel('Words Per Minute')
+
+        # Chart 4: User Activity Heatmap
+        self.activity_image = self.activity_ax.imshow(np.zeros((7, 24)), cmap='YlOrRd', aspect='auto')
+        self.activity_labels = [[self.activity_ax.text(hour, day, '', ha='center', va='center', fontsize=6)
+                                 for hour in range(24)] for day in range(7)]
+        figure.colorbar(self.activity_image, ax=self.activity_ax, label='Tests')
+        self.activity_ax.set_yticks(range(7), DAY_NAMES)
+        self.activity_ax.set_xticks(range(0, 24, 2))
+        self.activity_ax.grid(False)
+        self.activity_ax.set_title('User Activity Heatmap', fontweight='bold', fontsize=12)
+        self.activity_ax.set_xlabel('Hour of Day')
+        self.activity_ax.set_ylabel('Day of Week')
+
+    def update(self, data):
+        """Show ``prepare_comparison_data`` output"""
+        names, averages = data['top_users'], data['top_avg_wpm']
+        for i, bar in enumerate(self.top_bars):
+            bar.set_width(averages[i] if i < len(names) else 0)
+            bar.set_visible(i < len(names))
+        self.top_ax.set_yticks(range(len(names)), names)
+        self.top_ax.set_ylim(TOP_USERS - 0.5, -0.5)
+        self.top_ax.set_xlim(0, max(averages.max() if len(averages) else 0, 1) * 1.1)
+
+        avg_wpm, avg_accuracy = data['avg_wpm'], data['avg_accuracy']
+        self.scatter.set_offsets(np.column_stack([avg_wpm, avg_accuracy]))
+        self.scatter.set_sizes(data['test_count'] * 20)
+        self.scatter.set_array(avg_wpm)
+        self.scatter.set_clim(avg_wpm.min(), max(avg_wpm.max(), avg_wpm.min() + 1))
+        self.scatter_ax.set_xlim(*padded_limits(avg_wpm.min(), avg_wpm.max(), fraction=0.1))
+        self.scatter_ax.set_ylim(*padded_limits(avg_accuracy.min(), avg_accuracy.max(), fraction=0.1))
+
+        distributions = data['distributions']
+        medians, low, high = [], math.inf, -math.inf
+        for position, violin in enumerate(self.violins):
+            if position >= len(distributions):
+                violin.set_xy(np.zeros((0, 2)))
+                continue
+            values, counts = distributions[position][1].T
+            low, high = min(low, values[0]), max(high, values[-1])
+            grid = np.linspace(values[0], values[-1], KDE_POINTS) if len(values) > 1 else values
+            density = kde_curve(values, grid, counts)
+            half_width = 0.4 * density / density.max() if density.max() > 0 else np.full_like(grid, 0.05)
+            violin.set_xy(np.concatenate([np.column_stack([position - half_width, grid]),
+                                          np.column_stack([position + half_width, grid])[::-1]]))
+            medians.append(weighted_median(values, counts))
+        self.medians.set_data(np.arange(len(medians)), medians)
+        self.violin_ax.set_xticks(range(len(distributions)), [name for name, _ in distributions], rotation=45)
+        self.violin_ax.set_xlim(-0.6, max(len(distributions), 1) - 0.4)
+        if distributions:
+            self.violin_ax.set_ylim(*padded_limits(low, high, fraction=0.1))
+
+        activity = data['activity']
+        self.activity_image.set_data(activity)
+        self.activity_image.set_clim(0, max(activity.max(), 1))
+        for day in range(7):
+            for hour in range(24):
+                count = activity[day, hour]
+                self.activity_labels[day][hour].set_text(str(count) if count else '')
+
+        self.lay_out()
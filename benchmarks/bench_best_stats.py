@@ -0,0 +1,81 @@
+"""Benchmark get_user_best_stats on a large user_stats table.
+
+Fills a scratch database with synthetic results and reports the latency
+of the user_summary lookup used by the app, and of the equivalent
+aggregate over user_stats with and without the schema's indexes:
+
+    python benchmarks/bench_best_stats.py --rows 1000000 --users 2000 --output best_stats.json
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from suite import add_result_arguments, fill_stats_database, finish, print_result, summarize
+from stats_db import StatsDatabase
+
+AGGREGATE_QUERY = '''
+    SELECT MAX(wpm), MAX(accuracy), AVG(wpm), COUNT(*) FROM user_stats
+    WHERE user_id = (SELECT id FROM users WHERE username = ?)
+'''
+
+
+def user_id_indexes(conn):
+    """Names of the user_stats indexes that start with user_id"""
+    return [name for (name,) in conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = 'user_stats'
+          AND (SELECT name FROM pragma_index_info(sqlite_master.name) WHERE seqno = 0) = 'user_id'
+    ''')]
+
+
+def time_lookups(lookup, usernames, lookups, seed=1):
+    """Return per-lookup latencies in milliseconds"""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(lookups):
+        username = rng.choice(usernames)
+        start = time.perf_counter()
+        lookup(username)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=500)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        start = time.perf_counter()
+        usernames = fill_stats_database(path, args.rows, args.users)
+        print(f"Inserted {args.rows:,} rows for {args.users:,} users in {time.perf_counter() - start:.1f} s")
+        db = StatsDatabase(path)
+
+        def aggregate(username):
+            return db.conn.execute(AGGREGATE_QUERY, (username,)).fetchone()
+
+        prefix = f'best_stats.{args.rows}'
+        results[f'{prefix}.summary'] = summarize(time_lookups(db.get_user_best_stats, usernames, args.lookups))
+        results[f'{prefix}.indexed'] = summarize(time_lookups(aggregate, usernames, args.lookups))
+
+        # Every index that can serve user_id = ?, whichever migration added it
+        for index in user_id_indexes(db.conn):
+            db.conn.execute(f'DROP INDEX {index}')
+        results[f'{prefix}.unindexed'] = summarize(time_lookups(aggregate, usernames, min(args.lookups, 20)))
+        db.close()
+
+    for name, summary in results.items():
+        print_result(name, summary)
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
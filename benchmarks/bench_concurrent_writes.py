@@ -0,0 +1,100 @@
+"""Benchmark several processes writing to one stats database.
+
+Each writer process saves results through StatsDatabase while a reader
+process keeps querying best stats and the first statistics page. Reports
+insert throughput and reader latency for the default rollback journal with
+one commit per result, and for WAL mode with batched commits:
+
+    python benchmarks/bench_concurrent_writes.py --writers 8 --results 500 --output writes.json
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from suite import add_result_arguments, finish, print_result, summarize
+from stats_db import StatsDatabase
+
+
+def write_results(path, wal, batch_size, results, seed, start_event):
+    db = StatsDatabase(path, wal=wal, batch_size=batch_size)
+    rng = random.Random(seed)
+    start_event.wait()
+    for _ in range(results):
+        wpm = rng.randint(10, 120)
+        db.queue_test_result(f"user{rng.randrange(200):03d}", wpm, rng.randint(60, 100), wpm * 5,
+                             wpm * 5, 0, wpm * 5, 60)
+    db.close()  # Writes whatever is still queued
+
+
+def read_stats(path, wal, stop_event, start_event, latencies):
+    db = StatsDatabase(path, wal=wal)
+    rng = random.Random(0)
+    start_event.wait()
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        db.get_user_best_stats(f"user{rng.randrange(200):03d}")
+        db.get_stats_page(limit=100)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.001)
+    db.close()
+
+
+def run(name, label, wal, batch_size, args):
+    """Time one configuration; returns {name: summary}"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        StatsDatabase(path, wal=wal).close()
+
+        manager = multiprocessing.Manager()
+        latencies = manager.list()
+        start_event, stop_event = multiprocessing.Event(), multiprocessing.Event()
+        reader = multiprocessing.Process(target=read_stats, args=(path, wal, stop_event, start_event, latencies))
+        writers = [multiprocessing.Process(target=write_results,
+                                           args=(path, wal, batch_size, args.results, seed, start_event))
+                   for seed in range(args.writers)]
+        for process in [reader, *writers]:
+            process.start()
+        time.sleep(0.5)  # Let every process open its connection
+
+        start = time.perf_counter()
+        start_event.set()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        reader.join()
+
+        latencies = list(latencies)
+        manager.shutdown()
+    total = args.writers * args.results
+    print(f"\n{label}: {total / elapsed:.0f} inserts/s, {len(latencies)} reads")
+    results = {
+        # Wall time per insert across all writers, so a baseline comparison tracks throughput
+        f'writes.{name}.insert': summarize([elapsed * 1000 / total]),
+        f'writes.{name}.reader': summarize(latencies),
+    }
+    print_result('reader', results[f'writes.{name}.reader'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--results', type=int, default=500, help="results saved by each writer")
+    parser.add_argument('--batch-size', type=int, default=50)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    results.update(run('rollback_batch1', 'rollback journal, batch 1', False, 1, args))
+    results.update(run('wal_batch1', 'WAL, batch 1', True, 1, args))
+    results.update(run(f'wal_batch{args.batch_size}', f'WAL, batch {args.batch_size}', True, args.batch_size, args))
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Benchmark the app's database reads and analytics at 10^4 to 10^7 rows.
+
+For each ``--rows`` size, fills a scratch database and times the work
+behind the Statistics and Analytics tabs for one user and for everyone:
+
+- get_user_stats: every row of one user, newest first
+- get_user_best_stats: the name box lookup (no cache)
+- show_all_stats: the overall summary plus the first page of the table
+- generate_analytics: a user's history, prepared and drawn offscreen
+- generate_comparison_analytics: the comparison queries, prepared and drawn
+
+    python benchmarks/bench_database.py --rows 10000 100000 1000000 --output db.json
+    python benchmarks/bench_database.py --rows 10000 100000 1000000 --baseline db.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from suite import (add_result_arguments, fill_stats_database, finish, print_result, summarize,
+                   time_call)
+import analytics
+from stats_db import StatsDatabase, DEFAULT_SORT
+
+# Rows on the first page of the Statistics tab
+STATS_PAGE_SIZE = 100
+
+
+def bench_size(path, rows, users, repeat, draw_repeat):
+    """Time every operation against one database; returns {name: summary}"""
+    start = time.perf_counter()
+    usernames = fill_stats_database(path, rows, users)
+    print(f"\n{rows:,} rows for {users:,} users, filled in {time.perf_counter() - start:.1f} s "
+          f"({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+
+    db = StatsDatabase(path)
+    username = usernames[len(usernames) // 2]
+    user_view = analytics.UserAnalyticsView(analytics.create_figure())
+    user_canvas = FigureCanvasAgg(user_view.figure)
+    comparison_view = analytics.ComparisonAnalyticsView(analytics.create_figure())
+    comparison_canvas = FigureCanvasAgg(comparison_view.figure)
+
+    def show_all_stats():
+        db.get_overall_summary()
+        db.get_stats_page(None, DEFAULT_SORT, True, limit=STATS_PAGE_SIZE)
+
+    def generate_analytics():
+        data = analytics.prepare_user_data(db.get_user_history(username))
+        user_view.update(username, data)
+        analytics.user_summary_text(username, data)
+        user_canvas.draw()
+
+    def generate_comparison_analytics():
+        overall, user_summaries, *aggregates = analytics.query_comparison_data(db)
+        data = analytics.prepare_comparison_data(user_summaries, *aggregates)
+        comparison_view.update(data)
+        analytics.comparison_summary_text(data, overall)
+        comparison_canvas.draw()
+
+    operations = [
+        ('get_user_stats', lambda: db.get_user_stats(username), repeat),
+        ('get_user_best_stats', lambda: db.get_user_best_stats(username), repeat),
+        ('show_all_stats', show_all_stats, repeat),
+        ('generate_analytics', generate_analytics, draw_repeat),
+        ('generate_comparison_analytics', generate_comparison_analytics, draw_repeat),
+    ]
+    results = {}
+    for name, function, runs in operations:
+        summary = summarize(time_call(function, runs))
+        results[f'db.{rows}.{name}'] = summary
+        print_result(name, summary)
+    db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="database sizes to test (default: %(default)s)")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per query")
+    parser.add_argument('--draw-repeat', type=int, default=5, help="timed runs per analytics generator")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f'bench-{rows}.db')
+            results.update(bench_size(path, rows, min(args.users, rows), args.repeat, args.draw_repeat))
+            os.remove(path)
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Benchmark passage generation from a large weighted vocabulary.
+
+Builds a Zipf-weighted vocabulary of ``--words`` entries, then times
+building the alias index once and drawing ``--passages`` passages:
+
+    python benchmarks/bench_passages.py --words 100000 --output passages.json
+"""
+import argparse
+import sys
+import time
+
+from suite import add_result_arguments, finish, print_result, summarize, time_call
+from passages import PassageGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=100000, help="vocabulary size")
+    parser.add_argument('--passages', type=int, default=10000)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    vocabulary = {f"word{rank}": 1.0 / rank for rank in range(1, args.words + 1)}
+    start = time.perf_counter()
+    generator = PassageGenerator(vocabulary, seed=0)
+    build = time.perf_counter() - start
+
+    passage_latencies = time_call(generator.passage, args.passages)
+
+    results = {
+        f'passages.{args.words}.build_index': summarize([build * 1000]),
+        f'passages.{args.words}.passage': summarize(passage_latencies),
+    }
+    print(f"{args.words} words: index built in {build * 1000:.1f} ms")
+    for name, summary in results.items():
+        print_result(name, summary)
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Benchmark the typing input path by replaying synthetic keystrokes.
+
+Types passages into a real TypingTest window at each ``--wpm`` with
+``--error-rate`` mistakes (each corrected with a backspace) and times
+every key from press to the end of its repaint, plus the per-method
+histograms of the app's profiler. Keys are replayed as fast as the app
+takes them unless ``--realtime`` paces them at the typing speed.
+
+The window needs a display; on a headless machine run it under Xvfb
+(``xvfb-run python benchmarks/bench_replay.py``). Without a display, or
+with ``--headless``, only the Tk-free part of the path (scoring,
+keystroke log and live metrics) is replayed; those results are named
+``scoring.*`` rather than ``replay.*`` so a baseline comparison never
+sets them against window timings.
+
+    python benchmarks/bench_replay.py --wpm 40 80 120 --error-rate 0.05 --output replay.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tkinter as tk
+from types import SimpleNamespace
+
+from suite import add_result_arguments, finish, print_result, summarize, synthetic_keystrokes
+from keylog import KeystrokeLog
+from passages import PassageGenerator
+from scoring import BACKSPACE, TypingScorer, key_statistics
+from profiling import Profiler
+import typingtest
+
+
+def replay_window(app, keystrokes, realtime):
+    """Type ``keystrokes`` into the app; returns per-key latencies in ms.
+
+    A key's time runs until the repaint it caused has finished, including
+    one ``schedule_render`` deferred to the next frame.
+    """
+    app.name_entry.delete(0, tk.END)
+    app.name_entry.insert(0, 'bench')
+    app.start_test()
+    app.root.update()
+    latencies = []
+    started = time.perf_counter()
+    for offset, char in keystrokes:
+        if offset >= app.test_duration - 1:
+            break  # Stop short of the end-of-test dialog
+        if realtime:
+            while time.perf_counter() - started < offset:
+                app.root.update()
+        event = SimpleNamespace(char=char)
+        start = time.perf_counter()
+        # What Tk does for a key: the widget's KeyPress binding, the Text
+        # class binding that edits the text, then KeyRelease, then idle work
+        app.on_key_press(event)
+        if char == BACKSPACE:
+            app.user_input.delete('insert -1 chars')
+        else:
+            app.user_input.insert(tk.INSERT, char)
+        app.on_key_release(event)
+        app.root.update()
+        while app.render_job is not None:
+            app.root.update()
+        latencies.append((time.perf_counter() - start) * 1000)
+    app.reset_test()
+    return latencies
+
+
+def replay_headless(text, keystrokes):
+    """Replay the Tk-free work done per key; returns (per-key ms, key_statistics ms)"""
+    scorer = TypingScorer(text)
+    log = KeystrokeLog()
+    log.start()
+    latencies = []
+    started = time.perf_counter()
+    for offset, char in keystrokes:
+        start = time.perf_counter()
+        log.record(len(scorer.typed_text), char)
+        scorer.feed(char)
+        scorer.live_metrics(time.perf_counter() - started)
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    key_statistics(text, log.events())
+    return latencies, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wpm', type=int, nargs='+', default=[40, 80, 120])
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--passages', type=int, default=3, help="passages typed per speed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--realtime', action='store_true', help="pace keys at the typing speed")
+    parser.add_argument('--headless', action='store_true', help="skip the Tk window")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    generator = PassageGenerator(seed=args.seed)
+    passages = [generator.passage() for _ in range(args.passages)]
+    results = {}
+
+    app = None
+    if not args.headless:
+        tmp = tempfile.TemporaryDirectory()
+        try:
+            app = typingtest.TypingTest(db_path=os.path.join(tmp.name, 'bench.db'), prewarm_analytics=False)
+        except tk.TclError as error:
+            print(f"No display ({error}); replaying headless")
+            tmp.cleanup()
+
+    for wpm in args.wpm:
+        streams = [synthetic_keystrokes(text, wpm, args.error_rate, seed=args.seed + i)
+                   for i, text in enumerate(passages)]
+        if app is not None:
+            app.profiler = Profiler()
+            app.profiler.instrument(app, typingtest.PROFILED_METHODS)
+            latencies = []
+            for text, keystrokes in zip(passages, streams):
+                app.test_text = text
+                app.display_text()
+                latencies.extend(replay_window(app, keystrokes, args.realtime))
+            prefix = f'replay.tk.{wpm}wpm'
+            results[f'{prefix}.key_to_frame'] = summarize(latencies)
+            for name, summary in app.profiler.summaries().items():
+                results[f'{prefix}.{name}'] = {
+                    'runs': summary['count'], 'median_ms': summary['p50_ms'], 'p95_ms': summary['p95_ms'],
+                    'min_ms': summary['min_ms'], 'max_ms': summary['max_ms'],
+                }
+            # Undo the instrumentation before the next speed
+            for name in typingtest.PROFILED_METHODS:
+                delattr(app, name)
+        else:
+            prefix = f'scoring.{wpm}wpm'
+            latencies, statistics_ms = [], []
+            for text, keystrokes in zip(passages, streams):
+                keys, elapsed = replay_headless(text, keystrokes)
+                latencies.extend(keys)
+                statistics_ms.append(elapsed)
+            results[f'{prefix}.keystroke'] = summarize(latencies)
+            results[f'{prefix}.key_statistics'] = summarize(statistics_ms)
+
+        print(f"\n{wpm} WPM, {args.error_rate:.0%} errors, {sum(map(len, streams))} keys")
+        for name, summary in results.items():
+            if name.startswith(prefix + '.'):
+                print_result(name[len(prefix) + 1:], summary)
+
+    if app is not None:
+        app.on_closing()
+        tmp.cleanup()
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
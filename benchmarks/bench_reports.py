@@ -0,0 +1,46 @@
+"""Benchmark offscreen report rendering throughput.
+
+Builds a database with ``--users`` users and about ``--tests`` results
+each, then renders every user's PNG report with report.render_reports for
+each worker count and prints users per second:
+
+    python benchmarks/bench_reports.py --users 200 --tests 500 --workers 1 2 4 --output reports.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from suite import add_result_arguments, fill_stats_database, finish, summarize
+from report import render_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--tests', type=int, default=500, help="results per user")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--format', nargs='+', default=['png'], dest='formats')
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        fill_stats_database(path, args.users * args.tests, args.users)
+        print(f"{args.users} users x {args.tests} tests, formats: {' '.join(args.formats)}")
+        for workers in args.workers:
+            out_dir = os.path.join(tmp, f'reports-{workers}')
+            start = time.perf_counter()
+            _, reports = render_reports(path, out_dir, formats=tuple(args.formats), workers=workers,
+                                        comparison=False)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:3d} workers: {len(reports) / elapsed:8.2f} users/s   ({elapsed:.1f} s)")
+            # Wall time per user, so a baseline comparison tracks throughput
+            results[f'reports.{workers}workers.per_user'] = summarize([elapsed * 1000 / len(reports)])
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
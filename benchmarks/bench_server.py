@@ -0,0 +1,110 @@
+"""Benchmark the results server under many concurrent submitting clients.
+
+Starts ``server.py`` in a subprocess on a scratch database, then opens
+``--clients`` keep-alive connections that each submit ``--results`` single
+results (one request per result, as a station does) with a best-stats
+read after every ``--read-every`` submissions. Prints submissions per
+second and request latencies:
+
+    python benchmarks/bench_server.py --clients 200 --results 20 --output server.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from suite import add_result_arguments, finish, print_result, summarize
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def request(reader, writer, path, payload):
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = (await reader.readline()).split()[1]
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    response = json.loads(await reader.readexactly(length))
+    if status != b'200':
+        raise RuntimeError(response.get('error'))
+    return response
+
+
+async def run_client(port, client, results, read_every, submit_latencies, read_latencies):
+    rng = random.Random(client)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    username = f"station{client:04d}"
+    for number in range(1, results + 1):
+        wpm = rng.randint(10, 120)
+        result = {'username': username, 'wpm': wpm, 'accuracy': rng.randint(60, 100), 'total_chars': wpm * 5,
+                  'correct_chars': wpm * 5, 'incorrect_chars': 0, 'cpm': wpm * 5, 'duration': 60}
+        start = time.perf_counter()
+        await request(reader, writer, '/results', {'results': [result]})
+        submit_latencies.append((time.perf_counter() - start) * 1000)
+        if read_every and number % read_every == 0:
+            start = time.perf_counter()
+            await request(reader, writer, '/call/get_user_best_stats', {'args': [username]})
+            read_latencies.append((time.perf_counter() - start) * 1000)
+    writer.close()
+
+
+async def run_load(port, clients, results, read_every):
+    submit_latencies, read_latencies = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(port, client, results, read_every, submit_latencies, read_latencies)
+                           for client in range(clients)))
+    return time.perf_counter() - start, submit_latencies, read_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200, help="concurrent connections")
+    parser.add_argument('--results', type=int, default=20, help="results submitted per client")
+    parser.add_argument('--read-every', type=int, default=5, help="best-stats reads per N submissions (0: none)")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, 'server.py', '--db', os.path.join(tmp, 'bench.db'),
+                                   '--port', str(port)], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()  # Listening
+            elapsed, submit_latencies, read_latencies = asyncio.run(
+                run_load(port, args.clients, args.results, args.read_every))
+        finally:
+            server.terminate()
+            server.wait()
+
+    submissions = args.clients * args.results
+    print(f"{args.clients} clients x {args.results} results: {submissions / elapsed:.0f} submissions/s "
+          f"({elapsed:.1f} s)")
+    results = {'server.submit': summarize(submit_latencies)}
+    if read_latencies:
+        results['server.get_user_best_stats'] = summarize(read_latencies)
+    for name, summary in results.items():
+        print_result(name, summary)
+    # Wall time per submission across all clients, so a baseline comparison tracks throughput too
+    results['server.throughput'] = summarize([elapsed * 1000 / submissions])
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Benchmark cold start time-to-interactive of the typing test window.
+
+Each run starts a fresh interpreter, builds TypingTest against a scratch
+database and stops once the first frame has been drawn and the event loop
+is idle. Needs a display (run under Xvfb on headless machines); without
+one only the module import is timed. The cost of the analytics stack,
+which is now imported after the first frame, is reported separately:
+
+    python benchmarks/bench_startup.py --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from suite import add_result_arguments, finish, print_result, summarize
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = r'''
+import json, sys, time, tkinter
+launched = float(sys.argv[2])  # time.time() in the parent just before launch
+timings = {'interpreter': time.time() - launched}
+start = time.perf_counter()
+import typingtest
+timings['import'] = time.perf_counter() - start
+try:
+    app = typingtest.TypingTest(db_path=sys.argv[1], prewarm_analytics=False)
+except tkinter.TclError as error:
+    timings['error'] = str(error)
+else:
+    timings['construct'] = time.perf_counter() - start
+    app.root.update()  # Map the window and draw the first frame
+    timings['interactive'] = time.perf_counter() - start
+    timings['launch_to_interactive'] = time.time() - launched
+    app.on_closing()
+load_start = time.perf_counter()
+typingtest.load_analytics_stack()
+timings['analytics_stack'] = time.perf_counter() - load_start
+print(json.dumps(timings))
+'''
+
+
+def measure(db_path):
+    output = subprocess.run([sys.executable, '-c', CHILD, db_path, repr(time.time())], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [measure(os.path.join(tmp, 'bench.db')) for _ in range(args.runs)]
+
+    if 'error' in runs[0]:
+        print(f"No display ({runs[0]['error']}); timing the import only")
+    results = {}
+    for stage in ('interpreter', 'import', 'construct', 'interactive', 'launch_to_interactive', 'analytics_stack'):
+        values = [run[stage] * 1000 for run in runs if stage in run]
+        if values:
+            results[f'startup.{stage}'] = summarize(values)
+            print_result(stage, results[f'startup.{stage}'])
+    return finish(args, results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Compare two benchmark result files written with ``--output``.
+
+Exits with status 1 if any median in CURRENT is slower than in BASELINE
+by more than the threshold:
+
+    python benchmarks/compare.py baseline.json current.json --threshold 0.1
+"""
+import argparse
+import sys
+
+from suite import DEFAULT_THRESHOLD, compare_results, load_results, print_comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    rows = compare_results(load_results(args.current), load_results(args.baseline), args.threshold)
+    print_comparison(rows)
+    return 1 if any(status == 'regression' for *_, status in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Shared pieces of the benchmark suite: synthetic data and result files.
+
+Benchmarks that take ``--output FILE`` write their timings as JSON::
+
+    {"version": 1, "meta": {...}, "results": {"name": {"median_ms": ..., ...}}}
+
+and with ``--baseline FILE`` compare them against an earlier run, exiting
+with status 1 if any median got slower by more than ``--threshold``.
+``python benchmarks/compare.py BASELINE CURRENT`` does the same for two
+saved files.
+"""
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scoring import BACKSPACE, CHARS_PER_WORD
+from stats_db import StatsDatabase
+
+RESULTS_VERSION = 1
+# Relative slowdown of a median that counts as a regression
+DEFAULT_THRESHOLD = 0.10
+# 2024-01-01 00:00:00 UTC
+YEAR_START = 1704067200
+FILL_BATCH = 100_000
+
+
+def synthetic_keystrokes(text, wpm, error_rate=0.0, seed=0, jitter=0.25):
+    """Key presses typing ``text`` at about ``wpm``: [(seconds, char), ...].
+
+    Each character is mistyped with probability ``error_rate``; a mistake
+    is a wrong letter followed by a backspace, then the right character.
+    Gaps between keys vary by +/- ``jitter`` around the mean interval.
+    """
+    rng = random.Random(seed)
+    interval = 60 / (wpm * CHARS_PER_WORD)
+    letters = string.ascii_lowercase
+    events, now = [], 0.0
+    for char in text:
+        if rng.random() < error_rate:
+            now += interval * rng.uniform(1 - jitter, 1 + jitter)
+            events.append((now, rng.choice(letters.replace(char.lower(), ''))))
+            now += interval * rng.uniform(1 - jitter, 1 + jitter)
+            events.append((now, BACKSPACE))
+        now += interval * rng.uniform(1 - jitter, 1 + jitter)
+        events.append((now, char))
+    return events
+
+
+def fill_stats_database(path, rows, users, seed=0):
+    """Create a database at ``path`` with ``rows`` results over ``users`` users.
+
+    Rows go straight into user_stats in large transactions (the summary
+    triggers still run), spread evenly over one year. Returns the usernames.
+    """
+    rng = random.Random(seed)
+    usernames = [f"user{i:05d}" for i in range(users)]
+    db = StatsDatabase(path)
+
+    def generate(first, count):
+        for i in range(first, first + count):
+            wpm = rng.randint(10, 120)
+            accuracy = rng.randint(60, 100)
+            total = wpm * 5 + rng.randint(0, 50)
+            correct = total * accuracy // 100
+            test_at = YEAR_START + i * 365 * 86400 // rows + rng.randrange(3600)
+            yield (rng.randint(1, users), wpm, accuracy, total, correct, total - correct, total, 60, test_at, 0)
+
+    with db.conn:
+        db.conn.executemany('INSERT INTO users (id, username) VALUES (?, ?)', enumerate(usernames, 1))
+    for first in range(0, rows, FILL_BATCH):
+        with db.conn:
+            db.conn.executemany('''
+                INSERT INTO user_stats (user_id, wpm, accuracy, total_chars, correct_chars, incorrect_chars,
+                                        chars_per_minute, test_duration, test_at, utc_offset)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', generate(first, min(FILL_BATCH, rows - first)))
+    db.conn.execute('ANALYZE')
+    db.close()
+    return usernames
+
+
+def time_call(function, repeat, warmup=1):
+    """Call ``function()`` ``warmup + repeat`` times; return the timed runs in ms"""
+    for _ in range(warmup):
+        function()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    """Runs, median, p95, min and max of a list of milliseconds"""
+    latencies = sorted(latencies)
+    return {
+        'runs': len(latencies),
+        'median_ms': statistics.median(latencies),
+        'p95_ms': latencies[math.ceil(len(latencies) * 0.95) - 1],  # Nearest rank
+        'min_ms': latencies[0],
+        'max_ms': latencies[-1],
+    }
+
+
+def print_result(name, summary):
+    print(f"{name:<48} median {summary['median_ms']:10.3f} ms   p95 {summary['p95_ms']:10.3f} ms   "
+          f"max {summary['max_ms']:10.3f} ms")
+
+
+def add_result_arguments(parser):
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare results against an earlier --output file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown counted as a regression (default: %(default)s)")
+
+
+def write_results(path, results, args=None):
+    report = {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'argv': sys.argv[1:],
+            'args': vars(args) if args is not None else {},
+        },
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as file:
+        report = json.load(file)
+    if report.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {report.get('version')!r}")
+    return report['results']
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare medians; returns [(name, baseline_ms, current_ms, status)].
+
+    ``status`` is 'regression', 'improvement', 'ok', 'new' or 'missing'.
+    """
+    rows = []
+    for name in sorted(set(results) | set(baseline)):
+        if name not in baseline:
+            rows.append((name, None, results[name]['median_ms'], 'new'))
+        elif name not in results:
+            rows.append((name, baseline[name]['median_ms'], None, 'missing'))
+        else:
+            before, after = baseline[name]['median_ms'], results[name]['median_ms']
+            if after > before * (1 + threshold):
+                status = 'regression'
+            elif after < before * (1 - threshold):
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append((name, before, after, status))
+    return rows
+
+
+def print_comparison(rows):
+    for name, before, after, status in rows:
+        change = f"{(after / before - 1) * 100:+7.1f}%" if before and after is not None else ' ' * 8
+        before = f"{before:10.3f}" if before is not None else ' ' * 10
+        after = f"{after:10.3f}" if after is not None else ' ' * 10
+        print(f"{name:<48} {before} -> {after} ms {change}  {status}")
+
+
+def finish(args, results):
+    """Write ``--output`` and check ``--baseline``; returns the exit status"""
+    if args.output:
+        write_results(args.output, results, args)
+    if not args.baseline:
+        return 0
+    rows = compare_results(results, load_results(args.baseline), args.threshold)
+    print(f"\nAgainst {args.baseline} (threshold {args.threshold:.0%}):")
+    print_comparison(rows)
+    return 1 if any(status == 'regression' for *_, status in rows) else 0
@@ -0,0 +1,233 @@
+"""Passage generation for the typing test.
+
+Word lists are deduplicated and turned into a Walker/Vose alias table once,
+so each word of a passage is drawn in O(1) with one random number,
+whatever the size of the vocabulary or the shape of its frequency weights.
+
+A word list file has one word per line, optionally followed by a weight
+(e.g. a corpus frequency count) separated by whitespace or a comma::
+
+    the 23135851162
+    of, 13151942776
+    typing
+
+Words without a weight get weight 1. Blank lines and lines starting with
+``#`` are skipped.
+"""
+import math
+import queue
+import random
+import threading
+
+# Built-in vocabulary, used when no word list files are given
+DEFAULT_WORDS = (
+    # Common words
+    "the", "and", "for", "are", "but", "not", "you", "all", "can", "had", "her", "was", "one", "our", "out",
+    "day", "get", "has", "him", "his", "how", "man", "new", "now", "old", "see", "two", "way", "who", "boy",
+    "did", "its", "let", "put", "say", "she", "too", "use", "dad", "mom", "red", "big", "box", "yes", "yet",
+    "run", "sun", "fun", "cat", "dog", "car", "eat", "got", "lot", "hot", "sit", "bit", "hit", "fit", "win",
+    "end", "far", "off", "own", "try", "why", "ask", "men", "cut", "job", "eye", "oil", "six", "war", "lay",
+    "may", "few", "pop", "top", "bad", "bag", "bed", "leg", "egg", "add", "age", "ago", "air", "arm", "art",
+
+    # Additional common words for better practice
+    "about", "after", "again", "against", "among", "another", "any", "around", "because", "before",
+    "being", "between", "both", "came", "come", "could", "each", "even", "every", "first", "from",
+    "give", "going", "good", "great", "group", "hand", "hard", "have", "here", "high", "home", "into",
+    "just", "know", "large", "last", "left", "life", "like", "line", "little", "long", "look", "made",
+    "make", "many", "most", "move", "much", "must", "name", "need", "next", "night", "number", "only",
+    "open", "order", "other", "over", "part", "people", "place", "point", "right", "said", "same",
+    "school", "seem", "several", "should", "show", "since", "small", "some", "still", "such", "system",
+    "take", "than", "them", "there", "these", "they", "thing", "think", "this", "those", "three",
+    "through", "time", "today", "together", "turn", "under", "until", "very", "water", "well", "went",
+    "were", "what", "when", "where", "which", "while", "will", "with", "without", "work", "world",
+    "would", "write", "year", "young", "your", "house", "never", "found", "help", "want"
+)
+
+SENTENCES = 8
+MIN_SENTENCE_WORDS = 4
+MAX_SENTENCE_WORDS = 8
+# Ready passages kept by a PassagePool
+POOL_SIZE = 8
+# Practice mode: how strongly weak keys and bigrams raise a word's weight,
+# and how many attempts at the user's average rates every sequence starts with
+PRACTICE_STRENGTH = 4.0
+PRACTICE_PRIOR_ATTEMPTS = 5
+
+
+def read_word_list(path):
+    """Read (word, weight) pairs from a word list file"""
+    entries = []
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            fields = line.replace(',', ' ').split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            try:
+                weight = float(fields[1]) if len(fields) > 1 else 1.0
+            except ValueError:
+                raise ValueError(f"{path}:{number}: invalid weight {fields[1]!r}") from None
+            entries.append((fields[0], weight))
+    return entries
+
+
+def merge_words(entries):
+    """Deduplicate (word, weight) pairs, keeping each word's largest weight.
+
+    A word listed twice is not made twice as likely; lists given in order
+    keep the position of each word's first appearance.
+    """
+    weights = {}
+    for word, weight in entries:
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Invalid weight {weight!r} for {word!r}")
+        weights[word] = max(weight, weights.get(word, weight))
+    return {word: weight for word, weight in weights.items() if weight > 0}
+
+
+def build_alias_table(weights):
+    """Vose's alias method: return (probabilities, aliases) for ``weights``"""
+    count = len(weights)
+    total = sum(weights)
+    scaled = [weight * count / total for weight in weights]
+    probabilities = [1.0] * count
+    aliases = list(range(count))
+    small = [i for i, value in enumerate(scaled) if value < 1.0]
+    large = [i for i, value in enumerate(scaled) if value >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    # Whatever is left is 1 up to rounding error
+    return probabilities, aliases
+
+
+def weakness_scores(key_stats, prior=PRACTICE_PRIOR_ATTEMPTS):
+    """Score each key and bigram against the user's average (1.0).
+
+    ``key_stats`` maps sequences to (attempts, errors, latency_total,
+    latency_count) totals. The score is the mean of the error rate ratio
+    and the latency ratio, each smoothed toward the average so a few
+    attempts cannot make a sequence look very weak.
+    """
+    keys = [totals for sequence, totals in key_stats.items() if len(sequence) == 1]
+    attempts = sum(totals[0] for totals in keys)
+    timed = sum(totals[3] for totals in keys)
+    error_rate = sum(totals[1] for totals in keys) / attempts if attempts else 0.0
+    latency = sum(totals[2] for totals in keys) / timed if timed else 0.0
+
+    scores = {}
+    for sequence, (attempts, errors, latency_total, latency_count) in key_stats.items():
+        error_ratio = (errors + prior * error_rate) / (attempts + prior) / error_rate if error_rate else 1.0
+        latency_ratio = (latency_total + prior * latency) / (latency_count + prior) / latency if latency else 1.0
+        scores[sequence] = (error_ratio + latency_ratio) / 2
+    return scores
+
+
+class PassageGenerator:
+    """Draws weighted random words and passages from a fixed vocabulary.
+
+    ``words`` is a mapping of word to weight or an iterable of words
+    (equal weights); words with weight 0 are left out, and negative or
+    non-finite weights are a ValueError. ``seed`` makes the sequence of
+    passages reproducible.
+    """
+
+    def __init__(self, words=DEFAULT_WORDS, seed=None):
+        if isinstance(words, dict):
+            words = merge_words(words.items())
+        else:
+            words = merge_words((word, 1.0) for word in words)
+        if not words:
+            raise ValueError("The word list is empty")
+        self.vocabulary = list(words)
+        self.weights = list(words.values())
+        probabilities, aliases = build_alias_table(self.weights)
+        self.probabilities = probabilities
+        self.alias_words = [self.vocabulary[alias] for alias in aliases]
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_files(cls, paths, seed=None):
+        """Build a generator from one or more word list files"""
+        entries = []
+        for path in paths:
+            entries.extend(read_word_list(path))
+        return cls(merge_words(entries), seed=seed)
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def practice(self, key_stats, strength=PRACTICE_STRENGTH, seed=None):
+        """A generator over the same words, biased toward a user's weak keys and bigrams.
+
+        Each word's weight is multiplied by 1 + ``strength`` times how far
+        its characters and bigrams score above average. The new alias table
+        is built here once, so drawing practice passages costs the same.
+        """
+        excess = {sequence: score - 1 for sequence, score in weakness_scores(key_stats).items() if score > 1}
+        weights = {}
+        for word, weight in zip(self.vocabulary, self.weights):
+            extra = (sum(excess.get(char, 0) for char in word)
+                     + sum(excess.get(word[i:i + 2], 0) for i in range(len(word) - 1)))
+            weights[word] = weight * (1 + strength * extra)
+        return PassageGenerator(weights, seed=seed)
+
+    def seed(self, seed=None):
+        self.rng.seed(seed)
+
+    def sample(self, count):
+        """Draw ``count`` words, each in O(1)"""
+        size = len(self.vocabulary)
+        random = self.rng.random
+        draws = [random() * size for _ in range(count)]
+        vocabulary, probabilities, alias_words = self.vocabulary, self.probabilities, self.alias_words
+        # The integer part picks a column, the fraction picks its word or its alias
+        return [vocabulary[i] if draw - i < probabilities[i] else alias_words[i]
+                for draw, i in zip(draws, map(int, draws))]
+
+    def passage(self, sentences=SENTENCES, min_words=MIN_SENTENCE_WORDS, max_words=MAX_SENTENCE_WORDS):
+        """Return a passage of ``sentences`` sentences of random words"""
+        randint = self.rng.randint
+        lengths = [randint(min_words, max_words) for _ in range(sentences)]
+        words = self.sample(sum(lengths))
+        parts = []
+        start = 0
+        for length in lengths:
+            sentence = ' '.join(words[start:start + length])
+            parts.append(sentence[0].upper() + sentence[1:] + '.')
+            start += length
+        return ' '.join(parts)
+
+
+class PassagePool:
+    """Bounded queue of ready passages, kept full by a background thread.
+
+    Passages come out in the order the generator made them, so a seeded
+    generator still gives a reproducible sequence.
+    """
+
+    def __init__(self, generator, size=POOL_SIZE):
+        self.generator = generator
+        self.passages = queue.Queue(maxsize=size)
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.fill, name='passage-pool', daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        while not self.closed.is_set():
+            self.passages.put(self.generator.passage())  # Blocks while the pool is full
+
+    def get(self):
+        """Return the next passage, waiting only if the pool has run dry"""
+        return self.passages.get()
+
+    def close(self):
+        """Stop refilling the pool"""
+        self.closed.set()
+        try:
+            self.passages.get_nowait()  # Frees a slot if the thread is blocked on a full pool
+        except queue.Empty:
+            pass
+        self.thread.join()
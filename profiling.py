@@ -0,0 +1,177 @@
+"""Opt-in latency profiling for the typing test.
+
+A Profiler keeps one LatencyHistogram per measured call. Recording is a
+couple of integer operations into log-spaced buckets, so it can stay on
+the input path, and percentiles come out of the buckets with at most
+~6% error whatever the number of samples.
+
+    profiler = Profiler()
+    profiler.instrument(app, ('on_key_release', 'update_stats'))
+    ...
+    profiler.export('session.json')   # or .csv
+"""
+import csv
+import functools
+import json
+import platform
+import threading
+import time
+
+# Each power of two is split into 2 ** SUB_BUCKET_BITS buckets
+SUB_BUCKET_BITS = 3
+PERCENTILES = (50, 95, 99)
+EXPORT_FORMATS = ('json', 'csv')
+CSV_COLUMNS = ('name', 'count', 'mean_ms', 'min_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+
+
+def bucket_index(ns):
+    """Bucket of a duration in nanoseconds: exact below 16 ns, then 8 per power of two"""
+    shift = ns.bit_length() - SUB_BUCKET_BITS - 1
+    if shift <= 0:
+        return ns
+    return (shift << SUB_BUCKET_BITS) + (ns >> shift)
+
+
+def bucket_bounds(index):
+    """[low, high) nanoseconds covered by a bucket"""
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    if shift <= 0:
+        return index, index + 1
+    top = index - (shift << SUB_BUCKET_BITS)
+    return top << shift, (top + 1) << shift
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in nanoseconds"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, ns):
+        index = bucket_index(ns)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, percent):
+        """Approximate ``percent`` percentile in nanoseconds (0 without samples)"""
+        if not self.count:
+            return 0
+        rank = percent / 100 * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, min, percentiles and max in milliseconds"""
+        summary = {
+            'count': self.count,
+            'mean_ms': self.total / self.count / 1e6 if self.count else 0.0,
+            'min_ms': (self.min or 0) / 1e6,
+        }
+        for percent in PERCENTILES:
+            summary[f'p{percent}_ms'] = self.percentile(percent) / 1e6
+        summary['max_ms'] = self.max / 1e6
+        return summary
+
+
+class Profiler:
+    """Named latency histograms and counters for one session, safe to record from any thread"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, name, ns):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(ns)
+
+    def add_count(self, name, count=1):
+        """Add to a named event counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def timed(self, name, function):
+        """Wrap ``function`` so every call is recorded under ``name``"""
+        perf_counter_ns = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, perf_counter_ns() - start)
+        return wrapper
+
+    def instrument(self, obj, method_names):
+        """Replace methods on the instance ``obj`` with timed wrappers.
+
+        Only this instance is affected, so an app that is not profiled pays
+        nothing. Call it before the methods are bound as callbacks.
+        """
+        for method_name in method_names:
+            setattr(obj, method_name, self.timed(method_name, getattr(obj, method_name)))
+
+    def summaries(self):
+        """{name: histogram summary}, sorted by name"""
+        with self.lock:
+            return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def export(self, path):
+        """Write the summaries to ``path``, as CSV if it ends in .csv, else JSON"""
+        summaries = self.summaries()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_COLUMNS)
+                for name, summary in summaries.items():
+                    writer.writerow([name] + [summary[column] for column in CSV_COLUMNS[1:]])
+                # Counters have a count and no latencies
+                for name, count in sorted(self.counters.items()):
+                    writer.writerow([name, count] + [''] * (len(CSV_COLUMNS) - 2))
+        else:
+            with self.lock:
+                buckets = {name: {str(bucket_bounds(index)[0]): count
+                                  for index, count in sorted(histogram.counts.items())}
+                           for name, histogram in self.histograms.items()}
+            report = {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'duration_s': time.time() - self.started,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'metrics': summaries,
+                'counters': dict(sorted(self.counters.items())),
+                # Bucket lower bound (ns) -> samples, to merge or re-analyse sessions
+                'buckets': buckets,
+            }
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+
+    def overlay_text(self, names=None):
+        """One line per measurement for an on-screen overlay"""
+        lines = []
+        for name, summary in self.summaries().items():
+            if names is None or name in names:
+                lines.append(f"{name:<28} n={summary['count']:<6} p50 {summary['p50_ms']:6.2f}  "
+                             f"p95 {summary['p95_ms']:6.2f}  p99 {summary['p99_ms']:6.2f} ms")
+        if self.counters:
+            lines.append('  '.join(f"{name} {count}" for name, count in sorted(self.counters.items())))
+        return '\n'.join(lines) or "No samples yet"
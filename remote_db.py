@@ -0,0 +1,205 @@
+"""Client for the shared results server (``server.py``).
+
+RemoteStatsDatabase has the methods of StatsDatabase that the app uses, so
+a DatabaseWorker can run the same jobs against a server instead of a
+local file. Results are queued and sent in batches like local writes;
+the server deduplicates batches by id, so resending one whose answer was
+lost does not store it twice. Only the standard library is used: one
+keep-alive ``http.client`` connection, reopened once if the server
+closed it.
+"""
+import base64
+import http.client
+import json
+import time
+import uuid
+from urllib.parse import quote, urlsplit
+
+from server import MAX_READ_LIMIT
+from stats_db import BATCH_SIZE, DEFAULT_SORT, local_utc_offset
+
+# Seconds to wait for the server before a call fails
+REQUEST_TIMEOUT = 10
+
+
+class ServerError(Exception):
+    """The results server answered with an error status"""
+
+
+def parse_server_url(url):
+    """Split a results server URL into (host, port); ValueError if it is not one"""
+    parts = urlsplit(url if '://' in url else f'http://{url}')
+    if parts.scheme != 'http' or not parts.hostname:
+        raise ValueError(f"Unsupported server URL {url!r}")
+    return parts.hostname, parts.port or 80
+
+
+class RemoteStatsDatabase:
+    """StatsDatabase look-alike that reads and writes through a results server.
+
+    Best stats are not cached here: results from other stations would not
+    invalidate the entries. The server caches them per user instead.
+    """
+
+    def __init__(self, url, batch_size=BATCH_SIZE, timeout=REQUEST_TIMEOUT):
+        self.host, self.port = parse_server_url(url)
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.pending_results = []
+        # The first unsent_count pending results were sent as batch unsent_batch_id
+        # without an answer; they are resent first, under the same id
+        self.unsent_batch_id = None
+        self.unsent_count = 0
+        self.conn = None
+        self.request('GET', '/health')  # Fail now if the server is unreachable
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = json.loads(response.read() or b'{}')
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # An idle keep-alive connection the server dropped; retry once on a new one
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+            except Exception:
+                self.conn.close()
+                self.conn = None
+                raise
+        if response.status != 200:
+            raise ServerError(data.get('error', f"HTTP {response.status}"))
+        return data
+
+    def call(self, method, *args):
+        return self.request('POST', f'/call/{quote(method)}', {'args': list(args)})['result']
+
+    def close(self):
+        """Send queued results and close the connection"""
+        try:
+            self.flush_writes()
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+
+    def queue_test_result(self, username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                          keystroke_log=None, key_stats=None, test_at=None, utc_offset=None):
+        """Queue a test result for the next batch sent to the server"""
+        test_at = int(time.time() if test_at is None else test_at)
+        result = {
+            'username': username, 'wpm': wpm, 'accuracy': accuracy, 'total_chars': total_chars,
+            'correct_chars': correct_chars, 'incorrect_chars': incorrect_chars, 'cpm': cpm, 'duration': duration,
+            # The server stores this station's local time, not its own
+            'test_at': test_at, 'utc_offset': local_utc_offset(test_at) if utc_offset is None else utc_offset,
+        }
+        if key_stats:
+            result['key_stats'] = key_stats
+        if keystroke_log is not None:
+            result['keystroke_log'] = [base64.b64encode(blob).decode('ascii') for blob in keystroke_log.to_blobs()]
+        self.pending_results.append(result)
+        if len(self.pending_results) >= self.batch_size:
+            self.flush_writes()
+
+    def flush_writes(self):
+        """Send all queued results and return their ids.
+
+        Each batch goes with a random id that the server deduplicates. A
+        batch whose request fails keeps its id and is resent before newer
+        results, so if the server did store it, the resend only fetches
+        the ids. Results the server answers with an error stay queued, in
+        a new batch, and ServerError is raised once the rest are sent.
+        """
+        test_ids, failed, errors = [], [], []
+        try:
+            while self.pending_results:
+                if self.unsent_batch_id is None:
+                    self.unsent_batch_id, self.unsent_count = uuid.uuid4().hex, len(self.pending_results)
+                batch = self.pending_results[:self.unsent_count]
+                answer = self.request('POST', '/results', {'batch_id': self.unsent_batch_id, 'results': batch})
+                del self.pending_results[:self.unsent_count]
+                self.unsent_batch_id = None
+                for result, test_id, error in zip(batch, answer['ids'], answer.get('errors') or [None] * len(batch)):
+                    if error is None:
+                        test_ids.append(test_id)
+                    else:
+                        failed.append(result)
+                        errors.append(error)
+        finally:
+            self.pending_results.extend(failed)
+        if errors:
+            raise ServerError(f"{len(errors)} of the results could not be stored: {errors[0]}")
+        return test_ids
+
+    def save_test_result(self, username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                         keystroke_log=None, key_stats=None, test_at=None):
+        self.queue_test_result(username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                               keystroke_log=keystroke_log, key_stats=key_stats, test_at=test_at)
+        return self.flush_writes()[-1]
+
+    def get_user_best_stats(self, username):
+        return self.call('get_user_best_stats', username)
+
+    # Rows come back as JSON arrays; the app expects tuples like sqlite3 returns.
+    # The server answers at most MAX_READ_LIMIT rows per call, so whole
+    # histories and user lists are read a page at a time
+
+    def get_user_history(self, username, start=None, end=None):
+        rows = []
+        while True:
+            page = self.call('get_user_history', username, start, end, MAX_READ_LIMIT, len(rows))
+            rows += [tuple(row) for row in page]
+            if len(page) < MAX_READ_LIMIT:
+                return rows
+
+    def get_stats_page(self, username=None, sort_columns=DEFAULT_SORT, descending=True,
+                       after=None, backwards=False, limit=100):
+        rows = self.call('get_stats_page', username, list(sort_columns), descending,
+                         list(after) if after is not None else None, backwards, limit)
+        return [tuple(row) for row in rows]
+
+    def get_key_stats(self, username):
+        return {sequence: tuple(totals) for sequence, totals in self.call('get_key_stats', username).items()}
+
+    def get_user_summary(self, username):
+        return self.call('get_user_summary', username)
+
+    def get_user_summaries(self):
+        summaries = []
+        while True:
+            after = summaries[-1]['username'] if summaries else None
+            page = self.call('get_user_summaries', after, MAX_READ_LIMIT)
+            summaries += page
+            if len(page) < MAX_READ_LIMIT:
+                return summaries
+
+    def get_top_users(self, limit=10):
+        return self.call('get_top_users', limit)
+
+    def get_most_active_user(self):
+        return self.call('get_most_active_user')
+
+    def get_leaderboard(self, board='avg_wpm', limit=10):
+        return self.call('get_leaderboard', board, limit)
+
+    def get_leaders(self):
+        return self.call('get_leaders')
+
+    def get_user_rank(self, username, board='avg_wpm'):
+        return self.call('get_user_rank', username, board)
+
+    def get_wpm_distributions(self, usernames):
+        return {username: [tuple(pair) for pair in pairs]
+                for username, pairs in self.call('get_wpm_distributions', list(usernames)).items()}
+
+    def get_activity(self):
+        return [tuple(row) for row in self.call('get_activity')]
+
+    def get_overall_summary(self):
+        return self.call('get_overall_summary')
@@ -0,0 +1,183 @@
+"""Render analytics reports to files without Tk.
+
+Draws the same charts as the Analytics tab with matplotlib's Agg backend,
+so it runs on headless servers (e.g. from a nightly cron job). Users are
+spread across a pool of worker processes; each worker opens its own
+database connection and reuses one figure for all of its users.
+
+    python report.py --db typing_test_stats.db --out reports --format png html --workers 4
+"""
+import argparse
+import base64
+import hashlib
+import html
+import io
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import analytics
+from stats_db import StatsDatabase, DATABASE_PATH
+
+FORMATS = ('png', 'svg', 'html')
+REPORT_DPI = 100
+COMPARISON_REPORT = 'comparison'
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<h1>{title}</h1>
+<img src="data:image/png;base64,{image}" alt="{title}">
+<pre>{summary}</pre>
+</body>
+</html>
+"""
+
+
+def report_name(username):
+    """File name (without extension) for a user's report"""
+    name = re.sub(r'[^\w.-]', '_', username)
+    if name != username:
+        # Keep names that only differ in replaced characters apart
+        name += '-' + hashlib.sha1(username.encode()).hexdigest()[:8]
+    return f'user-{name}'
+
+
+class ReportRenderer:
+    """Renders user and comparison reports from one database connection"""
+
+    def __init__(self, db_path, out_dir, formats=('png',)):
+        self.db = StatsDatabase(db_path)
+        self.out_dir = out_dir
+        self.formats = formats
+        self.user_view = None
+        self.comparison_view = None
+
+    def close(self):
+        self.db.close()
+
+    def save(self, view, name, title, summary):
+        """Write a view's figure in every requested format and return the paths"""
+        paths = []
+        for fmt in self.formats:
+            path = os.path.join(self.out_dir, f'{name}.{fmt}')
+            if fmt == 'html':
+                image = io.BytesIO()
+                view.figure.savefig(image, format='png', dpi=REPORT_DPI)
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(HTML_TEMPLATE.format(title=html.escape(title),
+                                                    image=base64.b64encode(image.getvalue()).decode('ascii'),
+                                                    summary=html.escape(summary.strip())))
+            else:
+                view.figure.savefig(path, format=fmt, dpi=REPORT_DPI)
+            paths.append(path)
+        return paths
+
+    def render_user(self, username):
+        """Write one user's report; returns the paths, or [] without any tests"""
+        history = self.db.get_user_history(username)
+        if not history:
+            return []
+        if self.user_view is None:
+            self.user_view = analytics.UserAnalyticsView(analytics.create_figure())
+            FigureCanvasAgg(self.user_view.figure)
+        data = analytics.prepare_user_data(history)
+        self.user_view.update(username, data)
+        return self.save(self.user_view, report_name(username), f'Performance Analytics for {username}',
+                         analytics.user_summary_text(username, data))
+
+    def render_comparison(self):
+        """Write the platform comparison report; returns the paths"""
+        overall, user_summaries, *aggregates = analytics.query_comparison_data(self.db)
+        if not overall['total_tests']:
+            return []
+        if self.comparison_view is None:
+            self.comparison_view = analytics.ComparisonAnalyticsView(analytics.create_figure())
+            FigureCanvasAgg(self.comparison_view.figure)
+        data = analytics.prepare_comparison_data(user_summaries, *aggregates)
+        self.comparison_view.update(data)
+        return self.save(self.comparison_view, COMPARISON_REPORT, 'User Comparison Analytics',
+                         analytics.comparison_summary_text(data, overall))
+
+
+# Each pool process keeps one renderer for all the users it is given
+worker_renderer = None
+
+
+def init_worker(db_path, out_dir, formats):
+    global worker_renderer
+    worker_renderer = ReportRenderer(db_path, out_dir, formats)
+
+
+def render_user_report(username):
+    return username, worker_renderer.render_user(username)
+
+
+def render_reports(db_path, out_dir, users=None, formats=('png',), workers=None, comparison=True):
+    """Render reports for ``users`` (default: everyone).
+
+    Returns (comparison report paths, {username: report paths}).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    renderer = ReportRenderer(db_path, out_dir, formats)  # Also applies pending migrations
+    try:
+        if users is None:
+            users = sorted(summary['username'] for summary in renderer.db.get_user_summaries())
+        reports = {}
+        comparison_paths = renderer.render_comparison() if comparison else []
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(users) < 2:
+            for username in users:
+                reports[username] = renderer.render_user(username)
+        else:
+            chunksize = max(len(users) // (workers * 4), 1)
+            with ProcessPoolExecutor(workers, initializer=init_worker,
+                                     initargs=(db_path, out_dir, formats)) as pool:
+                reports.update(pool.map(render_user_report, users, chunksize=chunksize))
+    finally:
+        renderer.close()
+
+    if 'html' in formats:
+        write_index(out_dir, comparison_paths, reports)
+    return comparison_paths, reports
+
+
+def write_index(out_dir, comparison_paths, reports):
+    """Write index.html linking every HTML report"""
+    entries = [('User Comparison', comparison_paths), *reports.items()]
+    links = [f'<li><a href="{html.escape(os.path.basename(path))}">{html.escape(name)}</a></li>'
+             for name, paths in entries for path in paths if path.endswith('.html')]
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as file:
+        file.write('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>Typing Test Reports</title></head>\n'
+                   '<body>\n<h1>Typing Test Reports</h1>\n<ul>\n' + '\n'.join(links) + '\n</ul>\n</body>\n</html>\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render typing test analytics reports to files")
+    parser.add_argument('--db', default=DATABASE_PATH, help="database file (default: %(default)s)")
+    parser.add_argument('--out', default='reports', help="output directory (default: %(default)s)")
+    parser.add_argument('--users', nargs='+', help="users to report on (default: all)")
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['png'], dest='formats',
+                        help="output formats (default: png)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--no-comparison', action='store_false', dest='comparison',
+                        help="skip the platform comparison report")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _, reports = render_reports(args.db, args.out, args.users, tuple(args.formats), args.workers, args.comparison)
+    elapsed = time.perf_counter() - start
+    user_reports = sum(1 for paths in reports.values() if paths)
+    print(f"Rendered {user_reports} user reports to {args.out} in {elapsed:.1f} s "
+          f"({user_reports / elapsed:.1f} users/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Headless scoring engine for the typing test.
+
+Nothing in this module touches Tk, so the same scoring rules used by the
+desktop app can run in CI, on servers without an X display, or over
+thousands of recorded sessions at once.
+
+A keystroke stream is an iterable of strings as reported by Tk's
+``event.char``: ``'\\b'`` deletes the last character and anything else is
+inserted as typed (a multi-character string is treated as a paste).
+"""
+from operator import eq
+
+BACKSPACE = '\b'
+CHARS_PER_WORD = 5
+TEST_DURATION = 60
+# Longer gaps between key presses are pauses, not key latency
+MAX_KEY_LATENCY = 2.0
+
+
+def common_prefix_length(old_text, new_text):
+    """Return the length of the common prefix of two strings"""
+    # Typing and backspace only touch the end of the text
+    if new_text.startswith(old_text):
+        return len(old_text)
+    if old_text.startswith(new_text):
+        return len(new_text)
+
+    # Edits in the middle (paste over a selection, etc.): binary search
+    # with slice comparisons so the scan runs in C, not per character
+    low, high = 0, min(len(old_text), len(new_text))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old_text[:mid] == new_text[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def calculate_wpm(correct_chars, elapsed_time):
+    """Words per minute from correct characters (5 characters per word)"""
+    if elapsed_time <= 0:
+        return 0
+    # One division, so a full 60 second test gives exactly int(correct_chars / 5)
+    return int(correct_chars * 60 / (CHARS_PER_WORD * elapsed_time))
+
+
+def calculate_accuracy(correct_chars, total_chars, empty=100):
+    """Accuracy percentage; ``empty`` is returned when nothing was typed"""
+    if total_chars <= 0:
+        return empty
+    return int((correct_chars / total_chars) * 100)
+
+
+def calculate_cpm(total_chars, elapsed_time):
+    """Characters per minute over the whole test"""
+    if elapsed_time <= 0:
+        return 0
+    return int((total_chars / elapsed_time) * 60)
+
+
+def final_metrics(correct_chars, incorrect_chars, total_chars, duration=TEST_DURATION):
+    """Metrics saved for a finished test, as computed by ``submit_test``"""
+    return {
+        'wpm': calculate_wpm(correct_chars, duration),
+        'accuracy': calculate_accuracy(correct_chars, total_chars, empty=0),
+        'cpm': calculate_cpm(total_chars, duration),
+        'total_chars': total_chars,
+        'correct_chars': correct_chars,
+        'incorrect_chars': incorrect_chars,
+        'duration': duration
+    }
+
+
+def apply_keystrokes(keystrokes, typed_text=""):
+    """Replay a keystroke stream and return the resulting typed text"""
+    chars = list(typed_text)
+    for key in keystrokes:
+        if key == BACKSPACE:
+            if chars:
+                chars.pop()
+        elif len(key) == 1:
+            chars.append(key)
+        else:
+            chars.extend(key)
+    return ''.join(chars)
+
+
+def count_chars(test_text, typed_text):
+    """Return (correct, incorrect) for typed text against the target text"""
+    correct = sum(map(eq, test_text, typed_text))
+    return correct, min(len(typed_text), len(test_text)) - correct
+
+
+def score_text(test_text, typed_text, duration=TEST_DURATION):
+    """Score a finished test from the final typed text"""
+    correct, incorrect = count_chars(test_text, typed_text)
+    return final_metrics(correct, incorrect, len(typed_text), duration)
+
+
+def score_session(test_text, keystrokes, duration=TEST_DURATION):
+    """Score a finished test from its keystroke stream"""
+    return score_text(test_text, apply_keystrokes(keystrokes), duration)
+
+
+def score_batch(sessions, duration=TEST_DURATION):
+    """Score many recorded sessions.
+
+    ``sessions`` is an iterable of ``(test_text, keystrokes)`` pairs, or
+    ``(test_text, keystrokes, duration)`` triples. Results are yielded in
+    order so arbitrarily large histories can be streamed.
+    """
+    for session in sessions:
+        if len(session) == 3:
+            test_text, keystrokes, session_duration = session
+        else:
+            (test_text, keystrokes), session_duration = session, duration
+        yield score_session(test_text, keystrokes, session_duration)
+
+
+def key_statistics(test_text, events):
+    """Per-key and per-bigram error and latency totals for one test.
+
+    ``events`` are (timestamp, position, char) tuples as produced by
+    ``KeystrokeLog.events()``. Each typed printable character is an attempt
+    at the character the passage expects at its position, and at the bigram
+    ending there; its latency is the time since the previous one. Backspace,
+    Tab, Delete, control characters and keys without a character (Shift
+    and other modifiers) are neither attempts nor latency baselines. Returns
+    {sequence: [attempts, errors, latency_total, latency_count]} where a
+    sequence is one character (a key) or two (a bigram).
+    """
+    stats = {}
+    previous_time = None
+    for timestamp, position, char in events:
+        if len(char) == 1 and char.isprintable() and position < len(test_text):
+            error = char != test_text[position]
+            latency = timestamp - previous_time if previous_time is not None else None
+            timed = latency is not None and latency <= MAX_KEY_LATENCY
+            sequences = (test_text[position], test_text[position - 1:position + 1]) if position else (test_text[0],)
+            for sequence in sequences:
+                entry = stats.setdefault(sequence, [0, 0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += error
+                if timed:
+                    entry[2] += latency
+                    entry[3] += 1
+            previous_time = timestamp
+    return stats
+
+
+class TypingScorer:
+    """Incremental scorer for one passage.
+
+    Keeps the previously scored typed text so each update only re-examines
+    the changed suffix and adjusts the counters by delta.
+    """
+
+    def __init__(self, test_text=""):
+        self.reset(test_text)
+
+    def reset(self, test_text=None):
+        """Start scoring from scratch, optionally against a new passage"""
+        if test_text is not None:
+            self.test_text = test_text
+        self.typed_text = ""
+        self.correct_chars = 0
+        self.incorrect_chars = 0
+
+    @property
+    def total_chars_typed(self):
+        return len(self.typed_text)
+
+    def update(self, typed_text):
+        """Score new typed text and return the first position that changed"""
+        old_text = self.typed_text
+        test_text = self.test_text
+        text_length = len(test_text)
+        start = common_prefix_length(old_text, typed_text)
+
+        # Undo the contribution of the old suffix, then add the new one
+        for i in range(start, min(len(old_text), text_length)):
+            if old_text[i] == test_text[i]:
+                self.correct_chars -= 1
+            else:
+                self.incorrect_chars -= 1
+        for i in range(start, min(len(typed_text), text_length)):
+            if typed_text[i] == test_text[i]:
+                self.correct_chars += 1
+            else:
+                self.incorrect_chars += 1
+
+        self.typed_text = typed_text
+        return start
+
+    def feed(self, key):
+        """Apply a single keystroke and return the first position that changed"""
+        if key == BACKSPACE:
+            return self.update(self.typed_text[:-1])
+        return self.update(self.typed_text + key)
+
+    def live_metrics(self, elapsed_time):
+        """WPM and accuracy as shown while the test is running"""
+        return {
+            'wpm': calculate_wpm(self.correct_chars, elapsed_time),
+            'accuracy': calculate_accuracy(self.correct_chars, self.total_chars_typed),
+            'total_chars': self.total_chars_typed
+        }
+
+    def final_metrics(self, duration=TEST_DURATION):
+        """Metrics for the finished test"""
+        return final_metrics(self.correct_chars, self.incorrect_chars,
+                             self.total_chars_typed, duration)
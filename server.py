@@ -0,0 +1,476 @@
+"""Shared results server for typing test stations.
+
+Many TypingTest clients (``python typingtest.py --server http://HOST:8765``)
+submit results to and read stats from one database through this server:
+
+    python server.py --db typing_test_stats.db --host 0.0.0.0 --port 8765
+
+The protocol is JSON over HTTP/1.1 with keep-alive:
+
+- ``POST /results`` with ``{"results": [{...}, ...]}`` queues results and
+  answers ``{"ids": [...]}`` once they are committed. If only some of them
+  could be stored, the answer is ``{"ids": [...], "errors": [...]}`` with
+  ``null`` for the id of each failed result and for the error of each
+  stored one. An optional ``"batch_id"`` string makes the request safe to
+  resend: a batch id seen recently answers with the outcome of its first
+  submission instead of inserting the results again
+- ``POST /call/<method>`` with ``{"args": [...]}`` runs one of the
+  ``StatsDatabase`` read methods in ``READ_METHODS`` and answers
+  ``{"result": ...}``
+- ``GET /health`` answers ``{"status": "ok"}``
+
+The event loop only parses requests. Writes go to one writer connection
+on its own thread; results that arrive while a batch is being committed
+form the next batch, so the commit rate, not the request rate, bounds
+the number of transactions. Reads run on a pool of reader connections
+(the database is in WAL mode, so readers never wait for the writer).
+Best stats are cached per user until that user's next commit; the
+comparison aggregates are cached for ``AGGREGATE_TTL`` seconds, for at
+most ``AGGREGATE_CACHE_SIZE`` distinct calls. Clients may read at most
+``MAX_READ_LIMIT`` rows per call.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from keylog import KeystrokeLog
+from stats_db import StatsDatabase, LRUCache, DATABASE_PATH, MAX_UTC_OFFSET
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+READER_CONNECTIONS = 4
+# Results written per transaction at most
+MAX_WRITE_BATCH = 500
+MAX_BODY_BYTES = 16 * 2 ** 20
+BEST_STATS_CACHE_SIZE = 4096
+# Recent batch ids remembered for deduplicating resent submissions
+SUBMISSION_CACHE_SIZE = 10000
+MAX_BATCH_ID_LENGTH = 64
+# Seconds the comparison aggregates may lag behind new results
+AGGREGATE_TTL = 1.0
+# Distinct aggregate calls cached at once (their arguments come from clients)
+AGGREGATE_CACHE_SIZE = 256
+# Most rows a client may ask one read method for
+MAX_READ_LIMIT = 1000
+
+# Read methods clients may call, and whether their answers are cached for AGGREGATE_TTL
+READ_METHODS = {
+    'get_user_best_stats': False,  # Cached per user instead
+    'get_user_history': False,
+    'get_stats_page': False,
+    'get_key_stats': False,
+    'get_user_summary': False,
+    'get_user_summaries': True,
+    'get_top_users': True,
+    'get_most_active_user': True,
+    'get_leaderboard': True,
+    'get_leaders': True,
+    'get_user_rank': False,
+    'get_wpm_distributions': True,
+    'get_activity': True,
+    'get_overall_summary': True,
+}
+
+# Read method -> position of its row limit argument, which clients must pass
+LIMIT_ARGUMENTS = {'get_top_users': 0, 'get_leaderboard': 1, 'get_user_history': 3, 'get_stats_page': 5,
+                   'get_user_summaries': 1}
+# Read method -> position of its row offset argument
+OFFSET_ARGUMENTS = {'get_user_history': 4}
+
+RESULT_FIELDS = ('username', 'wpm', 'accuracy', 'total_chars', 'correct_chars', 'incorrect_chars', 'cpm', 'duration')
+# Latest accepted test time (Unix seconds, the end of the year 9999)
+MAX_TEST_AT = 253402300799
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+               500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """A request the server answers with an HTTP error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def is_number(value, limit=2 ** 63):
+    """A finite JSON number below ``limit`` in size (SQLite integers are 64-bit); booleans are not numbers"""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value) and abs(value) < limit)
+
+
+def is_integer(value):
+    """A JSON integer; booleans are not integers"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_result(data):
+    """Turn one submitted result into (args, kwargs) for ``queue_test_result``.
+
+    Everything the writer would choke on is rejected here with a 400, since
+    the writer commits many stations' results in one transaction.
+    """
+    if not isinstance(data, dict):
+        raise RequestError(400, "Result must be an object")
+    try:
+        args = [data[field] for field in RESULT_FIELDS]
+    except KeyError as error:
+        raise RequestError(400, f"Result is missing {error.args[0]!r}") from None
+    if not isinstance(args[0], str) or not args[0].strip():
+        raise RequestError(400, "Result needs a username")
+    if not all(is_number(value) for value in args[1:]):
+        raise RequestError(400, "Result values must be numbers")
+    test_at, utc_offset = data.get('test_at'), data.get('utc_offset')
+    if test_at is not None and not (is_number(test_at) and 0 <= test_at <= MAX_TEST_AT):
+        raise RequestError(400, "test_at must be a Unix time in seconds")
+    if utc_offset is not None and not (is_number(utc_offset, MAX_UTC_OFFSET) and utc_offset == int(utc_offset)):
+        raise RequestError(400, "utc_offset must be whole seconds within a day")
+    kwargs = {'test_at': test_at, 'utc_offset': utc_offset}
+    key_stats = data.get('key_stats')
+    if key_stats:
+        # {sequence: [attempts, errors, latency_total, latency_count]}, as scoring.key_statistics returns
+        if not (isinstance(key_stats, dict) and all(
+                isinstance(totals, list) and len(totals) == 4 and all(is_number(value) for value in totals)
+                for totals in key_stats.values())):
+            raise RequestError(400, "Invalid key_stats")
+        kwargs['key_stats'] = key_stats
+    if data.get('keystroke_log'):
+        try:
+            blobs = [base64.b64decode(blob, validate=True) for blob in data['keystroke_log']]
+            kwargs['keystroke_log'] = KeystrokeLog.from_blobs(*blobs)
+        except (TypeError, ValueError):
+            raise RequestError(400, "Invalid keystroke log") from None
+    return args, kwargs
+
+
+class ResultStore:
+    """Pooled, batched access to the stats database for the server.
+
+    One writer thread owns the only writing connection; ``readers`` threads
+    each own a reading connection. Coroutines hand work to them and await
+    the outcome, so the event loop never blocks on SQLite.
+    """
+
+    def __init__(self, path=DATABASE_PATH, readers=READER_CONNECTIONS, max_batch=MAX_WRITE_BATCH,
+                 aggregate_ttl=AGGREGATE_TTL):
+        self.path = path
+        self.reader_count = readers
+        self.max_batch = max_batch
+        self.aggregate_ttl = aggregate_ttl
+        self.local = threading.local()
+        # The writer opens the database first so migrations run once, before any reader
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix='results-writer',
+                                         initializer=self.open_connection)
+        self.writer.submit(lambda: None).result()
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix='results-reader',
+                                          initializer=self.open_connection)
+        self.pending = []  # (args, kwargs, future) waiting for the next batch
+        self.write_task = None
+        self.user_generations = {}  # username -> commits so far, for best stats cache validity
+        self.best_stats = LRUCache(BEST_STATS_CACHE_SIZE)
+        self.aggregates = LRUCache(AGGREGATE_CACHE_SIZE)  # (method, args) -> (expiry, future)
+        self.submissions = OrderedDict()  # batch_id -> task committing that batch, oldest first
+        self.committed = 0
+        self.batches = 0
+
+    def open_connection(self):
+        # Batches are flushed explicitly by write(), never by size
+        self.local.db = StatsDatabase(self.path, wal=True, batch_size=float('inf'))
+
+    async def submit(self, results, batch_id=None):
+        """Queue decoded results and wait until they are committed.
+
+        Returns an id or the exception for each result, or raises if none
+        was stored. A ``batch_id`` that was already submitted waits for (or
+        returns) the first submission's outcome, so a client resending a
+        batch whose answer it lost does not store it twice.
+        """
+        if batch_id is None:
+            return self.outcomes_or_error(await self.queue_results(results))
+        task = self.submissions.get(batch_id)
+        if task is None:
+            task = self.submissions[batch_id] = asyncio.ensure_future(self.queue_results(results))
+            while len(self.submissions) > SUBMISSION_CACHE_SIZE:
+                self.submissions.popitem(last=False)
+        outcomes = await asyncio.shield(task)
+        if all(isinstance(outcome, BaseException) for outcome in outcomes) and self.submissions.get(batch_id) is task:
+            # Nothing was stored, so a resend should try again
+            del self.submissions[batch_id]
+        return self.outcomes_or_error(outcomes)
+
+    @staticmethod
+    def outcomes_or_error(outcomes):
+        if outcomes and all(isinstance(outcome, BaseException) for outcome in outcomes):
+            raise outcomes[0]
+        return outcomes
+
+    async def queue_results(self, results):
+        """Queue results for the writer; returns an id or the exception for each"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for args, kwargs in results:
+            future = loop.create_future()
+            self.pending.append((args, kwargs, future))
+            futures.append(future)
+        if self.write_task is None:
+            self.write_task = loop.create_task(self.write_batches())
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    async def write_batches(self):
+        """Write pending results until none are left; later arrivals join the next batch"""
+        loop = asyncio.get_running_loop()
+        try:
+            while self.pending:
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                try:
+                    ids = await loop.run_in_executor(self.writer, self.write, [entry[:2] for entry in batch])
+                except Exception as error:
+                    for *_, future in batch:
+                        if not future.done():  # Cancelled if the client went away
+                            future.set_exception(error)
+                    continue
+                for (args, _, future), test_id in zip(batch, ids):
+                    if isinstance(test_id, Exception):
+                        if not future.done():
+                            future.set_exception(test_id)
+                        continue
+                    self.user_generations[args[0]] = self.user_generations.get(args[0], 0) + 1
+                    if not future.done():
+                        future.set_result(test_id)
+                    self.committed += 1
+                self.batches += 1
+        finally:
+            self.write_task = None
+
+    def write(self, batch):
+        """Writer thread: one transaction for the whole batch.
+
+        If it fails, each result is retried in a transaction of its own so
+        one bad result fails only its own submission; returns an id or the
+        exception for each result.
+        """
+        try:
+            return self.write_transaction(batch)
+        except Exception as error:
+            if len(batch) == 1:
+                return [error]
+        outcomes = []
+        for entry in batch:
+            try:
+                outcomes.extend(self.write_transaction([entry]))
+            except Exception as error:
+                outcomes.append(error)
+        return outcomes
+
+    def write_transaction(self, batch):
+        db = self.local.db
+        try:
+            for args, kwargs in batch:
+                db.queue_test_result(*args, **kwargs)
+            return db.flush_writes()
+        except Exception:
+            db.pending_results.clear()  # Reported to the submitters, not retried
+            raise
+
+    def read(self, method, args):
+        """Reader thread: call a StatsDatabase read method"""
+        return getattr(self.local.db, method)(*args)
+
+    async def call(self, method, args):
+        """Run a read method, from cache when possible"""
+        loop = asyncio.get_running_loop()
+        if method == 'get_user_best_stats':
+            username = args[0]
+            generation = self.user_generations.get(username, 0)
+            cached = self.best_stats.get(username)
+            if cached is not None and cached[0] == generation:
+                return cached[1]
+            stats = await loop.run_in_executor(self.readers, self.read, method, args)
+            self.best_stats.put(username, (generation, stats))
+            return stats
+
+        if READ_METHODS[method]:
+            # Concurrent requests for the same aggregate share one query
+            key = (method, json.dumps(args))
+            now = time.monotonic()
+            entry = self.aggregates.get(key)
+            if entry is None or entry[0] < now:
+                future = loop.run_in_executor(self.readers, self.read, method, args)
+                entry = (now + self.aggregate_ttl, future)
+                self.aggregates.put(key, entry)
+            try:
+                return await asyncio.shield(entry[1])
+            except Exception:
+                self.aggregates.invalidate(key)
+                raise
+
+        return await loop.run_in_executor(self.readers, self.read, method, args)
+
+    def close(self):
+        """Close every reader connection, then the writer's (which checkpoints the WAL)"""
+        # Connections belong to their threads, so each reader closes its own:
+        # one job per thread, held at a barrier so no thread takes two
+        barrier = threading.Barrier(self.reader_count)
+
+        def close_reader():
+            barrier.wait()
+            self.local.db.close()
+
+        for future in [self.readers.submit(close_reader) for _ in range(self.reader_count)]:
+            future.result()
+        self.readers.shutdown()
+        self.writer.submit(lambda: self.local.db.close()).result()
+        self.writer.shutdown()
+
+
+class ResultsServer:
+    """Minimal HTTP/1.1 JSON front end for a ResultStore"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    # The body's end is unknown, so the connection can't be reused
+                    await self.respond(writer, 400, {'error': "Invalid Content-Length"}, keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except RequestError as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception as error:
+                    status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError:
+            # readline's StreamReader limit: a request or header line too long to buffer
+            try:
+                await self.respond(writer, 400, {'error': "Request line or header too long"}, keep_alive=False)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        path = target.split('?', 1)[0]
+        if method == 'GET' and path == '/health':
+            return {'status': 'ok', 'committed': self.store.committed, 'batches': self.store.batches}
+        if method != 'POST':
+            raise RequestError(404, f"No route for {method} {path}")
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError(400, "Body is not valid JSON") from None
+
+        if path == '/results':
+            results = request.get('results')
+            if not isinstance(results, list):
+                raise RequestError(400, "Expected {\"results\": [...]}")
+            batch_id = request.get('batch_id')
+            if batch_id is not None and not (isinstance(batch_id, str) and 0 < len(batch_id) <= MAX_BATCH_ID_LENGTH):
+                raise RequestError(400, "batch_id must be a short string")
+            outcomes = await self.store.submit([decode_result(result) for result in results], batch_id)
+            failed = [isinstance(outcome, BaseException) for outcome in outcomes]
+            answer = {'ids': [None if error else outcome for outcome, error in zip(outcomes, failed)]}
+            if any(failed):
+                answer['errors'] = [f"{type(outcome).__name__}: {outcome}" if error else None
+                                    for outcome, error in zip(outcomes, failed)]
+            return answer
+        if path.startswith('/call/'):
+            name = unquote(path[len('/call/'):])
+            if name not in READ_METHODS:
+                raise RequestError(404, f"Unknown method {name!r}")
+            args = request.get('args', [])
+            if not isinstance(args, list):
+                raise RequestError(400, "Expected {\"args\": [...]}")
+            if name in LIMIT_ARGUMENTS:
+                index = LIMIT_ARGUMENTS[name]
+                if not (len(args) > index and is_integer(args[index]) and 0 < args[index] <= MAX_READ_LIMIT):
+                    raise RequestError(400, f"limit must be an integer from 1 to {MAX_READ_LIMIT}")
+            if name in OFFSET_ARGUMENTS:
+                index = OFFSET_ARGUMENTS[name]
+                if len(args) > index and not (is_integer(args[index]) and 0 <= args[index] < 2 ** 63):
+                    raise RequestError(400, "offset must be a non-negative integer")
+            try:
+                return {'result': await self.store.call(name, args)}
+            except (TypeError, ValueError) as error:
+                raise RequestError(400, str(error)) from None
+        raise RequestError(404, f"No route for {method} {path}")
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+async def serve(db_path=DATABASE_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=READER_CONNECTIONS,
+                ready=None):
+    """Run the server until cancelled; ``ready(port)`` is called once it is listening"""
+    store = ResultStore(db_path, readers)
+    server = await asyncio.start_server(ResultsServer(store).handle_connection, host, port)
+    try:
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared results server for typing test clients")
+    parser.add_argument('--db', default=DATABASE_PATH, help="database file (default: %(default)s)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port (default: %(default)s)")
+    parser.add_argument('--readers', type=int, default=READER_CONNECTIONS,
+                        help="reader connections (default: %(default)s)")
+    args = parser.parse_args()
+
+    def ready(port):
+        print(f"Serving {args.db} on http://{args.host}:{port}", flush=True)
+
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.readers, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,880 @@
+"""SQLite storage for typing test results.
+
+The schema is versioned with ``PRAGMA user_version``: ``SCHEMA`` creates the
+original tables and each entry in ``MIGRATIONS`` upgrades an existing
+database by one version, so old ``typing_test_stats.db`` files are brought
+up to date the first time they are opened.
+"""
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from keylog import KeystrokeLog
+
+DATABASE_PATH = 'typing_test_stats.db'
+
+# Seconds a connection waits for another process's write lock
+BUSY_TIMEOUT = 10
+# Queued results written per transaction, and the longest a queued
+# result waits on the worker before it is written
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 0.5
+# Longest wait between retries of an idle flush that keeps failing
+MAX_FLUSH_RETRY_INTERVAL = 30
+# WAL pages between automatic checkpoints (SQLite's default is 1000)
+WAL_AUTOCHECKPOINT_PAGES = 4000
+# Largest difference between a test's local time and UTC, in seconds
+MAX_UTC_OFFSET = 86400
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        wpm INTEGER NOT NULL,
+        accuracy INTEGER NOT NULL,
+        total_chars INTEGER NOT NULL,
+        correct_chars INTEGER NOT NULL,
+        incorrect_chars INTEGER NOT NULL,
+        chars_per_minute INTEGER NOT NULL,
+        test_duration INTEGER NOT NULL,
+        test_date TEXT NOT NULL,
+        test_time TEXT NOT NULL
+    )
+    ''',
+    # Per-keystroke timing, stored as packed arrays next to the result row
+    '''
+    CREATE TABLE IF NOT EXISTS keystroke_logs (
+        test_id INTEGER PRIMARY KEY REFERENCES user_stats(id),
+        event_count INTEGER NOT NULL,
+        timestamps BLOB NOT NULL,
+        positions BLOB NOT NULL,
+        keys BLOB NOT NULL
+    )
+    ''',
+]
+
+# Running per-user totals; count, sums, sums of squares and extremes are
+# enough for mean, variance, best and worst without touching user_stats
+SUMMARY_COLUMNS = (
+    'username', 'test_count', 'wpm_sum', 'wpm_sq_sum', 'wpm_max', 'wpm_min',
+    'accuracy_sum', 'accuracy_sq_sum', 'accuracy_max', 'accuracy_min', 'total_chars_sum'
+)
+
+# Kept current in the same transaction as every insert, whoever writes it
+SUMMARY_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_summary AFTER INSERT ON user_stats
+    BEGIN
+        INSERT INTO user_summary (username, test_count, wpm_sum, wpm_sq_sum, wpm_max, wpm_min,
+                                  accuracy_sum, accuracy_sq_sum, accuracy_max, accuracy_min, total_chars_sum)
+        VALUES ({username}, 1, NEW.wpm, NEW.wpm * NEW.wpm, NEW.wpm, NEW.wpm,
+                NEW.accuracy, NEW.accuracy * NEW.accuracy, NEW.accuracy, NEW.accuracy, NEW.total_chars)
+        ON CONFLICT (username) DO UPDATE SET
+            test_count = test_count + 1,
+            wpm_sum = wpm_sum + excluded.wpm_sum,
+            wpm_sq_sum = wpm_sq_sum + excluded.wpm_sq_sum,
+            wpm_max = MAX(wpm_max, excluded.wpm_max),
+            wpm_min = MIN(wpm_min, excluded.wpm_min),
+            accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+            accuracy_sq_sum = accuracy_sq_sum + excluded.accuracy_sq_sum,
+            accuracy_max = MAX(accuracy_max, excluded.accuracy_max),
+            accuracy_min = MIN(accuracy_min, excluded.accuracy_min),
+            total_chars_sum = total_chars_sum + excluded.total_chars_sum;
+    END
+'''
+
+SUMMARY_REBUILD = '''
+    INSERT INTO user_summary (username, test_count, wpm_sum, wpm_sq_sum, wpm_max, wpm_min,
+                              accuracy_sum, accuracy_sq_sum, accuracy_max, accuracy_min, total_chars_sum)
+    SELECT username, COUNT(*), SUM(wpm), SUM(wpm * wpm), MAX(wpm), MIN(wpm),
+           SUM(accuracy), SUM(accuracy * accuracy), MAX(accuracy), MIN(accuracy), SUM(total_chars)
+    FROM {rows} GROUP BY username
+'''
+
+ACTIVITY_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_activity AFTER INSERT ON user_stats
+    BEGIN
+        INSERT INTO activity_summary (day_of_week, hour, test_count)
+        VALUES ({day}, {hour}, 1)
+        ON CONFLICT (day_of_week, hour) DO UPDATE SET test_count = test_count + 1;
+    END
+'''
+
+ACTIVITY_REBUILD = '''
+    INSERT INTO activity_summary (day_of_week, hour, test_count)
+    SELECT {day}, {hour}, COUNT(*) FROM user_stats GROUP BY 1, 2
+'''
+
+# Day of week (Monday = 0) and hour of a row in the text date/time layout
+# used before version 5
+ACTIVITY_DAY = "(CAST(strftime('%w', {row}test_date) AS INTEGER) + 6) % 7"
+ACTIVITY_HOUR = "CAST(substr({row}test_time, 1, 2) AS INTEGER)"
+
+# user_stats rows with their usernames, from version 5 on
+USER_STATS_ROWS = 'user_stats JOIN users ON users.id = user_stats.user_id'
+
+# Leaderboard name -> the per-user value it ranks by, highest first. Each
+# has an index on user_summary in that order (ties by username), which the
+# summary trigger updates with every insert, so the top K is the first K
+# index entries rather than a sort over all users
+LEADERBOARDS = {
+    'avg_wpm': 'CAST(wpm_sum AS REAL) / test_count',
+    'best_wpm': 'wpm_max',
+    'accuracy': 'CAST(accuracy_sum AS REAL) / test_count',
+    'activity': 'test_count',
+}
+
+REBUILD_SUMMARY = ['DELETE FROM user_summary', SUMMARY_REBUILD.format(rows=USER_STATS_ROWS)]
+REBUILD_ACTIVITY = ['DELETE FROM activity_summary', ACTIVITY_REBUILD.format(day='day_of_week', hour='hour')]
+
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1
+MIGRATIONS = [
+    [
+        # Covers the best/average/count aggregate without touching the table
+        'CREATE INDEX IF NOT EXISTS idx_user_stats_user_perf ON user_stats (username, wpm, accuracy)',
+        # Per-user and global history in date order
+        'CREATE INDEX IF NOT EXISTS idx_user_stats_user_date ON user_stats (username, test_date, test_time)',
+        'CREATE INDEX IF NOT EXISTS idx_user_stats_date ON user_stats (test_date, test_time)',
+    ],
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS user_summary (
+            username TEXT PRIMARY KEY,
+            test_count INTEGER NOT NULL,
+            wpm_sum INTEGER NOT NULL,
+            wpm_sq_sum INTEGER NOT NULL,
+            wpm_max INTEGER NOT NULL,
+            wpm_min INTEGER NOT NULL,
+            accuracy_sum INTEGER NOT NULL,
+            accuracy_sq_sum INTEGER NOT NULL,
+            accuracy_max INTEGER NOT NULL,
+            accuracy_min INTEGER NOT NULL,
+            total_chars_sum INTEGER NOT NULL
+        )
+        ''',
+        SUMMARY_TRIGGER.format(username='NEW.username'),
+    ] + ['DELETE FROM user_summary', SUMMARY_REBUILD.format(rows='user_stats')],
+    [
+        # Tests per (day of week, hour of day) for the activity heatmap
+        '''
+        CREATE TABLE IF NOT EXISTS activity_summary (
+            day_of_week INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            test_count INTEGER NOT NULL,
+            PRIMARY KEY (day_of_week, hour)
+        ) WITHOUT ROWID
+        ''',
+        ACTIVITY_TRIGGER.format(day=ACTIVITY_DAY.format(row='NEW.'), hour=ACTIVITY_HOUR.format(row='NEW.')),
+    ] + ['DELETE FROM activity_summary',
+         ACTIVITY_REBUILD.format(day=ACTIVITY_DAY.format(row=''), hour=ACTIVITY_HOUR.format(row=''))],
+    [
+        # Per-user attempts, errors and latency for every key and bigram,
+        # added to after each test (sequence is 1 or 2 characters)
+        '''
+        CREATE TABLE IF NOT EXISTS key_stats (
+            username TEXT NOT NULL,
+            sequence TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            latency_total REAL NOT NULL,
+            latency_count INTEGER NOT NULL,
+            PRIMARY KEY (username, sequence)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    [
+        # Each username is stored once; results and key stats refer to it by id
+        'CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT NOT NULL UNIQUE)',
+        'INSERT INTO users (username) SELECT username FROM user_stats GROUP BY username ORDER BY MIN(id)',
+        'INSERT OR IGNORE INTO users (username) SELECT DISTINCT username FROM key_stats',
+        # A test's time is one integer, seconds since the Unix epoch (UTC), plus
+        # the local UTC offset when it was taken. The local date, time, day of
+        # week and hour are virtual columns computed from them on read.
+        '''
+        CREATE TABLE user_stats_v5 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            wpm INTEGER NOT NULL,
+            accuracy INTEGER NOT NULL,
+            total_chars INTEGER NOT NULL,
+            correct_chars INTEGER NOT NULL,
+            incorrect_chars INTEGER NOT NULL,
+            chars_per_minute INTEGER NOT NULL,
+            test_duration INTEGER NOT NULL,
+            test_at INTEGER NOT NULL,
+            utc_offset INTEGER NOT NULL,
+            local_at INTEGER GENERATED ALWAYS AS (test_at + utc_offset),
+            test_date TEXT GENERATED ALWAYS AS (date(test_at + utc_offset, 'unixepoch')),
+            test_time TEXT GENERATED ALWAYS AS (time(test_at + utc_offset, 'unixepoch')),
+            -- 1970-01-01 was a Thursday (Monday = 0)
+            day_of_week INTEGER GENERATED ALWAYS AS (((test_at + utc_offset) / 86400 + 3) % 7),
+            hour INTEGER GENERATED ALWAYS AS ((test_at + utc_offset) % 86400 / 3600)
+        )
+        ''',
+        # Old rows were saved in local time; the offset is this machine's for that date
+        '''
+        INSERT INTO user_stats_v5 (id, user_id, wpm, accuracy, total_chars, correct_chars, incorrect_chars,
+                                   chars_per_minute, test_duration, test_at, utc_offset)
+        SELECT id, (SELECT users.id FROM users WHERE users.username = user_stats.username),
+               wpm, accuracy, total_chars, correct_chars, incorrect_chars, chars_per_minute, test_duration,
+               CAST(strftime('%s', test_date || ' ' || test_time, 'utc') AS INTEGER),
+               CAST(strftime('%s', test_date || ' ' || test_time) AS INTEGER)
+               - CAST(strftime('%s', test_date || ' ' || test_time, 'utc') AS INTEGER)
+        FROM user_stats
+        ''',
+        # Also drops the old indexes and triggers; keystroke_logs rows keep their test ids
+        'DROP TABLE user_stats',
+        'ALTER TABLE user_stats_v5 RENAME TO user_stats',
+        'CREATE INDEX idx_user_stats_user_perf ON user_stats (user_id, wpm, accuracy)',
+        # Per-user and global history in time order, and time range queries
+        'CREATE INDEX idx_user_stats_user_time ON user_stats (user_id, test_at)',
+        'CREATE INDEX idx_user_stats_time ON user_stats (test_at)',
+        SUMMARY_TRIGGER.format(username='(SELECT username FROM users WHERE id = NEW.user_id)'),
+        ACTIVITY_TRIGGER.format(day='NEW.day_of_week', hour='NEW.hour'),
+        '''
+        CREATE TABLE key_stats_v5 (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            sequence TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            errors INTEGER NOT NULL,
+            latency_total REAL NOT NULL,
+            latency_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, sequence)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO key_stats_v5 (user_id, sequence, attempts, errors, latency_total, latency_count)
+        SELECT users.id, sequence, attempts, errors, latency_total, latency_count
+        FROM key_stats JOIN users ON users.username = key_stats.username
+        ''',
+        'DROP TABLE key_stats',
+        'ALTER TABLE key_stats_v5 RENAME TO key_stats',
+    ],
+    [
+        f'CREATE INDEX IF NOT EXISTS idx_user_summary_{board} ON user_summary ({value} DESC, username)'
+        for board, value in LEADERBOARDS.items()
+    ],
+    # Histories are plotted in local time, which is not always in test_at
+    # order (clocks going back, stations in other time zones)
+    ['CREATE INDEX IF NOT EXISTS idx_user_stats_user_local ON user_stats (user_id, local_at)'],
+    # The stats table's Time column sorts by time of day; the rowid ending
+    # each entry is the id tiebreak, so a page walks the index
+    ['CREATE INDEX IF NOT EXISTS idx_user_stats_time_of_day ON user_stats (test_time)'],
+    # The same for the table's other columns. Sorting by username walks the
+    # users index and each user's rows through (user_id), in id order
+    ['CREATE INDEX IF NOT EXISTS idx_user_stats_user ON user_stats (user_id)'] + [
+        f'CREATE INDEX IF NOT EXISTS idx_user_stats_{column} ON user_stats ({column})'
+        for column in ('wpm', 'accuracy', 'total_chars', 'correct_chars', 'incorrect_chars', 'chars_per_minute')
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Columns of the rows returned by get_user_stats and get_stats_page: the
+# original layout (local date and time as text) followed by the epoch time
+USER_STATS_COLUMNS = (
+    'id', 'username', 'wpm', 'accuracy', 'total_chars', 'correct_chars', 'incorrect_chars',
+    'chars_per_minute', 'test_duration', 'test_date', 'test_time', 'test_at'
+)
+USER_STATS_SELECT = 'SELECT user_stats.id, username, ' + ', '.join(USER_STATS_COLUMNS[2:]) + ' FROM ' + USER_STATS_ROWS
+
+# The same rows, read in username order from the users index
+USERNAME_ORDER_ROWS = 'users CROSS JOIN user_stats ON user_stats.user_id = users.id'
+
+# Newest first, served straight from the test_at indexes
+DEFAULT_SORT = ('test_at',)
+
+
+def local_utc_offset(timestamp):
+    """Seconds this machine's local time is ahead of UTC at a Unix time"""
+    return int(datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds())
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache.
+
+    With ``ttl``, entries expire that many seconds after they are put, for
+    values that other processes can change without invalidating them.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expiry or None, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl if self.ttl is not None else None, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class StatsDatabase:
+    """Connection to the user stats database with the app's queries.
+
+    ``cache`` is an optional LRUCache of per-user best stats. Connections
+    to the same file can share one, and saving a result invalidates the
+    user it writes for.
+
+    With ``wal`` the database is switched to write-ahead logging so readers
+    in other processes are not blocked by writers, with ``synchronous=NORMAL``
+    (commits survive an app crash; the last ones may be lost on power loss
+    until the next checkpoint). Results added with ``queue_test_result`` are
+    written together in one transaction once ``batch_size`` are pending or
+    ``flush_writes`` is called.
+    """
+
+    def __init__(self, path=DATABASE_PATH, cache=None, wal=False, batch_size=BATCH_SIZE):
+        self.path = path
+        self.cache = cache
+        self.wal = wal
+        self.batch_size = batch_size
+        self.pending_results = []
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        if wal:
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.conn.execute('PRAGMA synchronous = NORMAL')
+            self.conn.execute(f'PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT_PAGES}')
+        self.init_schema()
+
+    def init_schema(self):
+        """Create missing tables and apply pending migrations"""
+        cursor = self.conn.cursor()
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        self.conn.commit()
+        self.migrate()
+
+    def migrate(self):
+        """Upgrade the schema to SCHEMA_VERSION, one version per transaction"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        for number in range(version, SCHEMA_VERSION):
+            with self.conn:
+                # Explicitly, so CREATE and DROP statements are part of the transaction too
+                self.conn.execute('BEGIN')
+                for statement in MIGRATIONS[number]:
+                    self.conn.execute(statement)
+                self.conn.execute(f'PRAGMA user_version = {number + 1}')
+
+    def close(self):
+        """Write queued results durably and close the connection"""
+        self.flush_writes()
+        if self.wal:
+            # Fold the WAL back into the main file with a full sync
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.conn.close()
+
+    def queue_test_result(self, username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                          keystroke_log=None, key_stats=None, test_at=None, utc_offset=None):
+        """Queue a test result for the next batched write.
+
+        ``key_stats`` is the test's ``scoring.key_statistics``; it is added
+        to the user's running per-key totals in the same transaction.
+        ``test_at`` is the test's Unix time (default: now) and ``utc_offset``
+        the seconds local time was ahead of UTC (default: this machine's).
+        """
+        test_at = int(time.time() if test_at is None else test_at)
+        if utc_offset is None:
+            utc_offset = local_utc_offset(test_at)
+        row = (username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration, test_at, utc_offset)
+        log = (len(keystroke_log), *keystroke_log.to_blobs()) if keystroke_log is not None else None
+        self.pending_results.append((row, log, key_stats))
+        if len(self.pending_results) >= self.batch_size:
+            self.flush_writes()
+
+    def flush_writes(self):
+        """Write all queued results in one transaction and return their ids"""
+        if not self.pending_results:
+            return []
+        pending, self.pending_results = self.pending_results, []
+
+        test_ids = []
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                for row, log, key_stats in pending:
+                    cursor.execute('INSERT INTO users (username) VALUES (?) ON CONFLICT (username) DO NOTHING',
+                                   (row[0],))
+                    cursor.execute('''
+                        INSERT INTO user_stats (user_id, wpm, accuracy, total_chars, correct_chars, incorrect_chars,
+                                              chars_per_minute, test_duration, test_at, utc_offset)
+                        VALUES ((SELECT id FROM users WHERE username = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', row)
+                    test_ids.append(cursor.lastrowid)
+                    if log is not None:
+                        cursor.execute('''
+                            INSERT INTO keystroke_logs (test_id, event_count, timestamps, positions, keys)
+                            VALUES (?, ?, ?, ?, ?)
+                        ''', (cursor.lastrowid, *log))
+                    if key_stats:
+                        cursor.executemany('''
+                            INSERT INTO key_stats (user_id, sequence, attempts, errors, latency_total, latency_count)
+                            VALUES ((SELECT id FROM users WHERE username = ?), ?, ?, ?, ?, ?)
+                            ON CONFLICT (user_id, sequence) DO UPDATE SET
+                                attempts = attempts + excluded.attempts,
+                                errors = errors + excluded.errors,
+                                latency_total = latency_total + excluded.latency_total,
+                                latency_count = latency_count + excluded.latency_count
+                        ''', [(row[0], sequence, *totals) for sequence, totals in key_stats.items()])
+        except sqlite3.Error:
+            # Rolled back; keep the results queued for the next attempt
+            self.pending_results[:0] = pending
+            raise
+
+        if self.cache is not None:
+            for row, log, key_stats in pending:
+                self.cache.invalidate(row[0])
+        return test_ids
+
+    def save_test_result(self, username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                         keystroke_log=None, key_stats=None, test_at=None):
+        """Save test result (and optionally its keystroke log and key stats) to database"""
+        self.queue_test_result(username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration,
+                               keystroke_log=keystroke_log, key_stats=key_stats, test_at=test_at)
+        return self.flush_writes()[-1]
+
+    def get_user_stats(self, username=None):
+        """Get user statistics from database"""
+        cursor = self.conn.cursor()
+
+        if username:
+            cursor.execute(f'''
+                {USER_STATS_SELECT} WHERE username = ? ORDER BY test_at DESC, user_stats.id DESC
+            ''', (username,))
+        else:
+            cursor.execute(f'''
+                {USER_STATS_SELECT} ORDER BY test_at DESC, user_stats.id DESC
+            ''')
+
+        return cursor.fetchall()
+
+    def get_user_history(self, username, start=None, end=None, limit=None, offset=0):
+        """Get (timestamp, wpm, accuracy, total_chars, cpm) rows for a user in local time order.
+
+        The timestamp is the test's local time in seconds since the epoch;
+        rows are sorted by it so charts can bisect and bucket them.
+        ``start`` and ``end`` limit the rows to Unix times in [start, end),
+        read as a range of the (user_id, local_at) index widened by the
+        largest UTC offset. ``limit`` and ``offset`` return one page of them.
+        """
+        conditions = ['user_id = (SELECT id FROM users WHERE username = ?)']
+        params = [username]
+        if start is not None:
+            conditions.append('local_at >= ? AND test_at >= ?')
+            params += [int(start) - MAX_UTC_OFFSET, int(start)]
+        if end is not None:
+            conditions.append('local_at < ? AND test_at < ?')
+            params += [int(end) + MAX_UTC_OFFSET, int(end)]
+
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT local_at, wpm, accuracy, total_chars, chars_per_minute
+            FROM user_stats WHERE {' AND '.join(conditions)} ORDER BY local_at, id LIMIT ? OFFSET ?
+        ''', (*params, -1 if limit is None else limit, offset))
+        return cursor.fetchall()
+
+    def get_stats_page(self, username=None, sort_columns=DEFAULT_SORT, descending=True,
+                       after=None, backwards=False, limit=100):
+        """Get one page of user_stats rows using keyset pagination.
+
+        Rows are ordered by ``sort_columns`` then ``id``. ``after`` is the
+        ``stats_sort_key`` of the row bordering the page: the page starts
+        right after it, or ends right before it when ``backwards`` is set.
+        Cost depends on the page size, not on the table size or the offset.
+        """
+        key_columns = (*sort_columns, 'id')
+        if not set(key_columns) <= set(USER_STATS_COLUMNS):
+            raise ValueError(f"Unknown sort columns: {sort_columns}")
+
+        # Walking backwards is the same query in the opposite order
+        reverse = descending != backwards
+        direction = 'DESC' if reverse else 'ASC'
+        conditions, params = [], []
+        if username:
+            conditions.append('user_id = (SELECT id FROM users WHERE username = ?)')
+            params.append(username)
+        # users also has an id column
+        key_sql = [f'user_stats.{column}' if column == 'id' else column for column in key_columns]
+        if after is not None:
+            conditions.append(f"({', '.join(key_sql)}) {'<' if reverse else '>'} "
+                              f"({', '.join('?' * len(key_columns))})")
+            params.extend(after)
+
+        # SQLite keeps the left table of a CROSS JOIN outermost; without it
+        # a username sort scans user_stats and sorts every row
+        select = USER_STATS_SELECT
+        if 'username' in sort_columns:
+            select = select.replace(USER_STATS_ROWS, USERNAME_ORDER_ROWS)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            {select} {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY {', '.join(f'{column} {direction}' for column in key_sql)} LIMIT ?
+        ''', (*params, limit))
+        rows = cursor.fetchall()
+        if backwards:
+            rows.reverse()
+        return rows
+
+    @staticmethod
+    def stats_sort_key(row, sort_columns=DEFAULT_SORT):
+        """Keyset position of a user_stats row for ``get_stats_page``"""
+        return tuple(row[USER_STATS_COLUMNS.index(column)] for column in sort_columns) + (row[0],)
+
+    def get_keystroke_log(self, test_id):
+        """Get the keystroke log saved with a test, or None"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT timestamps, positions, keys FROM keystroke_logs WHERE test_id = ?', (test_id,))
+        row = cursor.fetchone()
+        return KeystrokeLog.from_blobs(*row) if row else None
+
+    def get_key_stats(self, username):
+        """Get {sequence: (attempts, errors, latency_total, latency_count)} for a user"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT sequence, attempts, errors, latency_total, latency_count
+            FROM key_stats WHERE user_id = (SELECT id FROM users WHERE username = ?)
+        ''', (username,))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def rebuild_summary(self):
+        """Recompute user_summary and activity_summary from every row in user_stats"""
+        with self.conn:
+            for statement in REBUILD_SUMMARY + REBUILD_ACTIVITY:
+                self.conn.execute(statement)
+
+    @staticmethod
+    def summary_from_row(row):
+        """Turn a user_summary row into a dict with means and variances"""
+        summary = dict(zip(SUMMARY_COLUMNS, row))
+        count = summary['test_count']
+        for metric in ('wpm', 'accuracy'):
+            mean = summary[f'{metric}_sum'] / count
+            summary[f'avg_{metric}'] = mean
+            summary[f'{metric}_variance'] = max(summary[f'{metric}_sq_sum'] / count - mean * mean, 0.0)
+        return summary
+
+    def get_user_summary(self, username):
+        """Get the running totals for one user, or None if they have no tests"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {", ".join(SUMMARY_COLUMNS)} FROM user_summary WHERE username = ?', (username,))
+        row = cursor.fetchone()
+        return self.summary_from_row(row) if row else None
+
+    def get_user_summaries(self, after=None, limit=None):
+        """Get the running totals for every user, by username.
+
+        ``after`` and ``limit`` return one keyset page: at most ``limit``
+        users whose names sort after ``after``.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(SUMMARY_COLUMNS)} FROM user_summary
+            WHERE username > ? ORDER BY username LIMIT ?
+        ''', ('' if after is None else after, -1 if limit is None else limit))
+        return [self.summary_from_row(row) for row in cursor.fetchall()]
+
+    def get_leaderboard(self, board='avg_wpm', limit=10):
+        """Get the summaries of the top ``limit`` users on a leaderboard.
+
+        Reads the first ``limit`` entries of the board's index, so the cost
+        does not grow with the number of users.
+        """
+        if board not in LEADERBOARDS:
+            raise ValueError(f"Unknown leaderboard {board!r}")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(SUMMARY_COLUMNS)} FROM user_summary
+            ORDER BY {LEADERBOARDS[board]} DESC, username LIMIT ?
+        ''', (limit,))
+        return [self.summary_from_row(row) for row in cursor.fetchall()]
+
+    def get_leaders(self):
+        """Get {board: summary of the user in first place, or None} for every leaderboard"""
+        return {board: next(iter(self.get_leaderboard(board, 1)), None) for board in LEADERBOARDS}
+
+    def get_user_rank(self, username, board='avg_wpm'):
+        """Get a user's 1-based place on a leaderboard, or None if they have no tests"""
+        if board not in LEADERBOARDS:
+            raise ValueError(f"Unknown leaderboard {board!r}")
+        value = LEADERBOARDS[board]
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT {value} FROM user_summary WHERE username = ?', (username,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        # Counts the users ahead with a range scan of the board's index
+        cursor.execute(f'''
+            SELECT COUNT(*) + 1 FROM user_summary
+            WHERE {value} > ? OR ({value} = ? AND username < ?)
+        ''', (row[0], row[0], username))
+        return cursor.fetchone()[0]
+
+    def get_top_users(self, limit=10):
+        """Get the summaries of the users with the highest average WPM"""
+        return self.get_leaderboard('avg_wpm', limit)
+
+    def get_most_active_user(self):
+        """Get the summary of the user with the most tests, or None"""
+        return next(iter(self.get_leaderboard('activity', 1)), None)
+
+    def get_wpm_distributions(self, usernames):
+        """Get {username: [(wpm, count), ...]} for the given users.
+
+        WPM is an integer, so a user's whole history collapses to at most a
+        few hundred (value, count) pairs, read from the covering
+        (user_id, wpm, accuracy) index.
+        """
+        distributions = {}
+        cursor = self.conn.cursor()
+        for username in usernames:
+            cursor.execute('''
+                SELECT wpm, COUNT(*) FROM user_stats
+                WHERE user_id = (SELECT id FROM users WHERE username = ?) GROUP BY wpm ORDER BY wpm
+            ''', (username,))
+            distributions[username] = cursor.fetchall()
+        return distributions
+
+    def get_activity(self):
+        """Get (day_of_week, hour, test_count) rows, Monday = 0"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT day_of_week, hour, test_count FROM activity_summary ORDER BY day_of_week, hour')
+        return cursor.fetchall()
+
+    def get_overall_summary(self):
+        """Get platform-wide totals, computed from the per-user summaries"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT SUM(test_count), COUNT(*), SUM(wpm_sum), SUM(accuracy_sum), SUM(total_chars_sum)
+            FROM user_summary
+        ''')
+        total_tests, unique_users, wpm_sum, accuracy_sum, total_chars = cursor.fetchone()
+        total_tests = total_tests or 0
+        return {
+            'total_tests': total_tests,
+            'unique_users': unique_users,
+            'avg_wpm': wpm_sum / total_tests if total_tests else 0,
+            'avg_accuracy': accuracy_sum / total_tests if total_tests else 0,
+            'total_chars': total_chars or 0
+        }
+
+    def get_user_best_stats(self, username):
+        """Get user's best statistics"""
+        if self.cache is not None:
+            cached = self.cache.get(username)
+            if cached is not None:
+                return dict(cached)
+
+        summary = self.get_user_summary(username)
+        if summary is None:
+            best_stats = {'best_wpm': 0, 'best_accuracy': 0, 'avg_wpm': 0, 'total_tests': 0}
+        else:
+            best_stats = {
+                'best_wpm': summary['wpm_max'],
+                'best_accuracy': summary['accuracy_max'],
+                'avg_wpm': round(summary['avg_wpm'], 1),
+                'total_tests': summary['test_count']
+            }
+
+        if self.cache is not None:
+            self.cache.put(username, dict(best_stats))
+        return best_stats
+
+
+class DatabaseWorker:
+    """Runs database jobs on a dedicated thread with its own connection.
+
+    A job is a function called as ``function(db, *args)`` with the worker's
+    StatsDatabase, or the name of a method to call on it, e.g.
+    ``submit('get_user_best_stats', name)``. With ``server`` (a results
+    server URL) the worker talks to a ``remote_db.RemoteStatsDatabase``
+    instead of opening ``path``; it has the same methods.
+    Results are not delivered from the worker thread: they wait in a queue
+    until the owning thread calls ``process_results``, which the Tk app does
+    from a ``root.after`` loop so callbacks always run on the Tk thread.
+
+    Jobs submitted with ``write=True`` may leave results queued in the
+    connection; they are written as a batch when ``flush_interval`` passes
+    without new jobs, before the next read job, and on ``close``.
+    If the database or server cannot be opened, every job gets the error
+    while opening is retried with the same backoff as a failing flush.
+
+    With a ``profiling.Profiler``, the time each job spends on the worker
+    is recorded as ``db.<name>`` (the function's name unless ``name`` is
+    given to ``submit``).
+    """
+
+    def __init__(self, path=DATABASE_PATH, cache=None, error_handler=None, wal=False,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, profiler=None, server=None):
+        self.path = path
+        self.server = server
+        self.profiler = profiler
+        self.cache = cache
+        self.error_handler = error_handler
+        self.wal = wal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='stats-db', daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, callback=None, errback=None, write=False, name=None):
+        """Queue a job; ``callback(result)`` or ``errback(error)`` runs later"""
+        if name is None:
+            name = function if isinstance(function, str) else function.__name__
+        self.jobs.put((function, args, callback, errback or self.error_handler, write, name))
+
+    def open_database(self):
+        if self.server:
+            from remote_db import RemoteStatsDatabase
+            # No best stats cache: other stations' results would leave it stale,
+            # and the server keeps one that sees every commit
+            return RemoteStatsDatabase(self.server, batch_size=self.batch_size)
+        return StatsDatabase(self.path, cache=self.cache, wal=self.wal, batch_size=self.batch_size)
+
+    def run(self):
+        try:
+            db, open_error = self.open_database(), None
+        except Exception as error:
+            # Reported to every job below rather than ending the thread, which
+            # would leave their callbacks waiting forever
+            db, open_error = None, error
+
+        # An idle flush that fails, or a failed open (e.g. a server started
+        # after this station), is retried with doubling gaps, and only the
+        # first failure of a run is reported, so a database or server that
+        # stays unavailable does not raise an error every flush_interval
+        retry_interval = self.flush_interval
+        open_retry_at = time.monotonic() + retry_interval
+        flush_failing = False
+        while True:
+            # Checked before every job, not only when idle, so a steady
+            # stream of jobs cannot put the next attempt off
+            if db is None and time.monotonic() >= open_retry_at:
+                try:
+                    db, open_error = self.open_database(), None
+                    retry_interval = self.flush_interval
+                except Exception as error:
+                    open_error = error
+                    retry_interval = min(retry_interval * 2, MAX_FLUSH_RETRY_INTERVAL)
+                    open_retry_at = time.monotonic() + retry_interval
+
+            if db is None:
+                timeout = max(open_retry_at - time.monotonic(), 0)
+            else:
+                timeout = retry_interval if db.pending_results else None
+            try:
+                job = self.jobs.get(timeout=timeout)
+            except queue.Empty:
+                if db is None:
+                    continue
+                if self.run_job(db.flush_writes, None, None if flush_failing else self.error_handler, 'flush_writes'):
+                    retry_interval, flush_failing = self.flush_interval, False
+                else:
+                    retry_interval = min(retry_interval * 2, MAX_FLUSH_RETRY_INTERVAL)
+                    flush_failing = True
+                continue
+            if job is None:
+                break
+
+            function, args, callback, errback, write, name = job
+            if db is None:
+                if errback is not None:
+                    self.results.put((errback, open_error))
+                continue
+            if not write and db.pending_results:
+                # Reads must see every write queued before them
+                if not self.run_job(db.flush_writes, None, errback, 'flush_writes'):
+                    continue
+                retry_interval, flush_failing = self.flush_interval, False
+            if isinstance(function, str):
+                self.run_job(lambda: getattr(db, function)(*args), callback, errback, name)
+            else:
+                self.run_job(lambda: function(db, *args), callback, errback, name)
+
+        if db is not None:
+            self.run_job(db.close, None, self.error_handler)
+
+    def run_job(self, function, callback, errback, name=None):
+        """Call ``function()`` and queue its outcome; return True on success"""
+        start = time.perf_counter_ns()
+        try:
+            result = function()
+        except Exception as error:
+            if errback is not None:
+                self.results.put((errback, error))
+            return False
+        finally:
+            if self.profiler is not None and name is not None:
+                self.profiler.record(f'db.{name}', time.perf_counter_ns() - start)
+        if callback is not None:
+            self.results.put((callback, result))
+        return True
+
+    def process_results(self):
+        """Run the callbacks of finished jobs on the calling thread"""
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                return
+            callback(value)
+
+    def close(self, timeout=None):
+        """Finish queued jobs, flush queued writes, close the connection and stop the thread.
+
+        Returns False if the thread is still running after ``timeout`` seconds.
+        """
+        self.jobs.put(None)
+        self.thread.join(timeout)
+        self.process_results()
+        return not self.thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands for the typing test database")
+    parser.add_argument('command', choices=['migrate', 'rebuild-summary', 'vacuum', 'leaderboard'])
+    parser.add_argument('--db', default=DATABASE_PATH, help="database file (default: %(default)s)")
+    parser.add_argument('--board', choices=list(LEADERBOARDS), default='avg_wpm',
+                        help="leaderboard to print (default: %(default)s)")
+    parser.add_argument('--limit', type=int, default=10, help="users on the leaderboard (default: %(default)s)")
+    args = parser.parse_args()
+
+    db = StatsDatabase(args.db)  # Opening applies any pending migrations
+    if args.command == 'rebuild-summary':
+        db.rebuild_summary()
+    elif args.command == 'vacuum':
+        # Migrations that rewrite a table leave its old pages free in the file
+        db.conn.execute('VACUUM')
+    elif args.command == 'leaderboard':
+        # Tab-separated, for pasting into a spreadsheet or piping elsewhere
+        print('rank\tusername\ttests\tavg_wpm\tbest_wpm\tavg_accuracy')
+        for rank, user in enumerate(db.get_leaderboard(args.board, args.limit), 1):
+            print(f"{rank}\t{user['username']}\t{user['test_count']}\t{user['avg_wpm']:.1f}\t"
+                  f"{user['wpm_max']}\t{user['avg_accuracy']:.1f}")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
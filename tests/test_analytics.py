@@ -0,0 +1,128 @@
+"""Tests for the analytics data preparation (bucketing, downsampling, history arrays)"""
+import calendar
+import unittest
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('matplotlib')
+pytest.importorskip('seaborn')
+
+import matplotlib.dates as mdates
+
+import analytics
+
+
+def date_numbers(*stamps):
+    """Matplotlib date numbers of ISO date/time strings"""
+    return mdates.date2num(np.array(stamps, dtype='datetime64[s]'))
+
+
+def day(stamp):
+    return date_numbers(stamp)[0]
+
+
+class BucketKeysTest(unittest.TestCase):
+    def test_days(self):
+        dates = date_numbers('2024-12-31T00:00', '2024-12-31T23:59', '2025-01-01T00:01')
+        self.assertEqual(list(analytics.bucket_keys(dates, 'day')),
+                         [day('2024-12-31'), day('2024-12-31'), day('2025-01-01')])
+
+    def test_weeks_start_on_monday_across_new_year(self):
+        # 2024-12-30 is a Monday; its week runs into 2025
+        dates = date_numbers('2024-12-29T12:00', '2024-12-30T00:00', '2025-01-01T08:00', '2025-01-05T23:59',
+                             '2025-01-06T00:00')
+        self.assertEqual(list(analytics.bucket_keys(dates, 'week')),
+                         [day('2024-12-23'), day('2024-12-30'), day('2024-12-30'), day('2024-12-30'),
+                          day('2025-01-06')])
+
+    def test_months_across_new_year(self):
+        dates = date_numbers('2023-12-31T23:59', '2024-01-01T00:00', '2024-02-29T12:00', '2024-03-01T00:00')
+        self.assertEqual(list(analytics.bucket_keys(dates, 'month')),
+                         [day('2023-12-01'), day('2024-01-01'), day('2024-02-01'), day('2024-03-01')])
+
+
+class AggregateTest(unittest.TestCase):
+    def test_runs_of_equal_keys(self):
+        dates = np.array([1.0, 2.0, 3.0, 10.0, 20.0])
+        keys = np.array([0, 0, 0, 7, 14])
+        wpm = np.array([10.0, 20.0, 60.0, 5.0, 7.0])
+        buckets = analytics.aggregate(dates, keys, [wpm])
+        self.assertEqual(list(buckets['dates']), [2.0, 10.0, 20.0])
+        self.assertEqual(list(buckets['count']), [3, 1, 1])
+        self.assertEqual(list(buckets['mean'][0]), [30.0, 5.0, 7.0])
+        self.assertEqual(list(buckets['min'][0]), [10.0, 5.0, 7.0])
+        self.assertEqual(list(buckets['max'][0]), [60.0, 5.0, 7.0])
+
+
+class LttbTest(unittest.TestCase):
+    def test_keeps_first_and_last_points(self):
+        rng = np.random.default_rng(3)
+        x = np.arange(1000, dtype=float)
+        y = rng.normal(size=1000)
+        for threshold in (3, 10, 99, 500):
+            with self.subTest(threshold=threshold):
+                selected = analytics.lttb(x, y, threshold)
+                self.assertEqual(len(selected), threshold)
+                self.assertEqual((selected[0], selected[-1]), (0, 999))
+                self.assertTrue(np.all(np.diff(selected) > 0))
+
+    def test_keeps_a_spike(self):
+        x = np.arange(300, dtype=float)
+        y = np.zeros(300)
+        y[137] = 100
+        self.assertIn(137, analytics.lttb(x, y, 20))
+
+    def test_short_series_are_kept_whole(self):
+        x = np.arange(5, dtype=float)
+        self.assertEqual(list(analytics.lttb(x, x, 5)), [0, 1, 2, 3, 4])
+        self.assertEqual(list(analytics.lttb(x, x, 2)), [0, 1, 2, 3, 4])
+
+
+class DownsampleTest(unittest.TestCase):
+    def series(self, start, count, step_days):
+        dates = day(start) + np.arange(count) * step_days
+        return dates, [np.arange(count, dtype=float)]
+
+    def test_short_history_is_not_downsampled(self):
+        dates, series = self.series('2024-01-01', 50, 1)
+        self.assertIsNone(analytics.downsample(dates, series, 50))
+
+    def test_finest_bucket_that_fits(self):
+        # Four tests a day for 10 weeks: 70 days, 10 weeks, 3 months
+        dates, series = self.series('2024-01-01', 280, 0.25)
+        self.assertEqual(analytics.downsample(dates, series, 100)['bucket'], 'day')
+        self.assertEqual(analytics.downsample(dates, series, 20)['bucket'], 'week')
+        buckets = analytics.downsample(dates, series, 5)
+        self.assertEqual(buckets['bucket'], 'month')
+        self.assertEqual(buckets['count'].sum(), 280)
+
+    def test_lttb_over_months_keeps_both_ends(self):
+        # Ten years of tests, one every 5 days: 120 monthly buckets for 30 points
+        dates, series = self.series('2015-01-01', 731, 5)
+        buckets = analytics.downsample(dates, series, 30)
+        self.assertEqual(buckets['bucket'], 'month')
+        self.assertEqual(len(buckets['dates']), 30)
+        months = analytics.aggregate(dates, analytics.bucket_keys(dates, 'month'), series)
+        self.assertEqual(buckets['dates'][0], months['dates'][0])
+        self.assertEqual(buckets['dates'][-1], months['dates'][-1])
+
+
+class PrepareUserDataTest(unittest.TestCase):
+    def test_arrays_and_summary(self):
+        local_at = calendar.timegm((2024, 3, 10, 14, 30, 0))
+        history = [(local_at, 40, 90, 200, 200), (local_at + 86400, 55, 97, 280, 280),
+                   (local_at + 2 * 86400, 50, 95, 250, 250)]
+        data = analytics.prepare_user_data(history)
+        self.assertEqual(list(data['dates']), list(date_numbers('2024-03-10T14:30', '2024-03-11T14:30',
+                                                                '2024-03-12T14:30')))
+        self.assertEqual(list(data['wpm']), [40, 55, 50])
+        summary = data['summary']
+        self.assertEqual((summary['total_tests'], summary['best_wpm'], summary['best_accuracy']), (3, 55, 97))
+        self.assertAlmostEqual(summary['avg_wpm'], 145 / 3)
+        self.assertEqual(summary['total_chars'], 730)
+        self.assertTrue(summary['improving'])
+
+
+if __name__ == '__main__':
+    unittest.main()
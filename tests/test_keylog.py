@@ -0,0 +1,51 @@
+"""Tests for the array-backed keystroke log"""
+import unittest
+
+from keylog import NO_KEY, KeystrokeLog
+from scoring import BACKSPACE
+
+
+def recorded(events, start_time=100.0):
+    """A log with (seconds after start, position, char) events"""
+    log = KeystrokeLog()
+    log.start(start_time)
+    for offset, position, char in events:
+        log.record(position, char, start_time + offset)
+    return log
+
+
+class KeystrokeLogTest(unittest.TestCase):
+    # Shift (no character), a capital, a backspace, a non-ASCII key and a space
+    EVENTS = [(0.0, 0, ''), (0.125, 0, 'T'), (0.25, 1, 'x'), (0.5, 2, BACKSPACE), (0.75, 1, 'é'), (1.0, 2, ' ')]
+
+    def test_blob_round_trip(self):
+        log = recorded(self.EVENTS)
+        blobs = log.to_blobs()
+        self.assertEqual([len(blob) for blob in blobs], [4 * len(self.EVENTS)] * 3)
+        restored = KeystrokeLog.from_blobs(*blobs)
+        # The offsets are exact in single precision
+        self.assertEqual(list(restored.events()), self.EVENTS)
+        self.assertEqual(restored.keys[0], NO_KEY)
+        self.assertEqual(restored.keystrokes(), ['T', 'x', BACKSPACE, 'é', ' '])
+        self.assertEqual(restored.nbytes, 12 * len(self.EVENTS))
+
+    def test_start_clears_the_log(self):
+        log = recorded(self.EVENTS)
+        log.start(5.0)
+        self.assertEqual(len(log), 0)
+        log.record(0, 'a', 5.5)
+        self.assertEqual(list(log.events()), [(0.5, 0, 'a')])
+
+    def test_copy_is_independent(self):
+        log = recorded(self.EVENTS)
+        copy = log.copy()
+        log.record(3, 'z', 102.0)
+        self.assertEqual(len(log), len(self.EVENTS) + 1)
+        self.assertEqual(list(copy.events()), self.EVENTS)
+        log.start()
+        self.assertEqual(list(copy.events()), self.EVENTS)
+        self.assertEqual(copy.start_time, 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Tests for the weighted passage generator and its alias table"""
+import time
+import unittest
+from collections import Counter
+
+from passages import PassageGenerator, PassagePool, build_alias_table, weakness_scores
+
+
+def alias_distribution(probabilities, aliases):
+    """The probability of each index that an alias table samples"""
+    count = len(probabilities)
+    distribution = [0.0] * count
+    for i, (probability, alias) in enumerate(zip(probabilities, aliases)):
+        distribution[i] += probability / count
+        distribution[alias] += (1 - probability) / count
+    return distribution
+
+
+class AliasTableTest(unittest.TestCase):
+    def test_table_matches_weights(self):
+        for weights in ([1], [1, 1, 1], [5, 1], [0.5, 3, 0, 10, 1.5], [1e9, 1, 1], list(range(1, 50))):
+            with self.subTest(weights=weights):
+                total = sum(weights)
+                distribution = alias_distribution(*build_alias_table(weights))
+                for expected, actual in zip(weights, distribution):
+                    self.assertAlmostEqual(actual, expected / total, places=9)
+
+    def test_sampling_frequencies(self):
+        weights = {'rare': 1, 'common': 10, 'middle': 4, 'never': 0}
+        generator = PassageGenerator(weights, seed=7)
+        draws = 150_000
+        counts = Counter(generator.sample(draws))
+        self.assertNotIn('never', counts)
+        total = sum(weights.values())
+        for word, weight in weights.items():
+            expected = draws * weight / total
+            # More than five standard deviations of a binomial count
+            self.assertLess(abs(counts[word] - expected), 5 * (expected + 1) ** 0.5 + 1, word)
+
+
+class PassageGeneratorTest(unittest.TestCase):
+    def test_seeded_passages_repeat(self):
+        first = PassageGenerator(seed=42)
+        second = PassageGenerator(seed=42)
+        self.assertEqual([first.passage() for _ in range(5)], [second.passage() for _ in range(5)])
+        first.seed(3)
+        second.seed(3)
+        self.assertEqual(first.sample(100), second.sample(100))
+        self.assertNotEqual(PassageGenerator(seed=1).sample(100), PassageGenerator(seed=2).sample(100))
+
+    def test_passage_shape(self):
+        passage = PassageGenerator(seed=5).passage(sentences=3, min_words=2, max_words=4)
+        sentences = passage.split('. ')
+        self.assertEqual(len(sentences), 3)
+        self.assertTrue(passage.endswith('.'))
+        for sentence in sentences:
+            self.assertTrue(sentence[0].isupper())
+            self.assertTrue(2 <= len(sentence.rstrip('.').split()) <= 4)
+
+    def test_invalid_weights(self):
+        for weights in ({'a': 1, 'b': -1}, {'a': float('nan')}, {'a': float('inf'), 'b': 1}):
+            with self.subTest(weights=weights):
+                with self.assertRaises(ValueError):
+                    PassageGenerator(weights)
+        with self.assertRaises(ValueError):
+            PassageGenerator({'a': 0, 'b': 0})  # Nothing left to draw
+        self.assertEqual(PassageGenerator({'a': 0, 'b': 2}).sample(20), ['b'] * 20)
+
+
+class PracticeTest(unittest.TestCase):
+    # {sequence: (attempts, errors, latency_total, latency_count)}: 'q' is error-prone,
+    # the bigram 'th' is slow and everything else is average
+    KEY_STATS = {
+        'q': (40, 20, 8.0, 40), 'a': (40, 2, 8.0, 40), 'e': (40, 2, 8.0, 40), 't': (40, 2, 8.0, 40),
+        'h': (40, 2, 8.0, 40), 'th': (40, 2, 24.0, 40), 'ea': (40, 2, 8.0, 40),
+    }
+
+    def test_weak_sequences_score_above_average(self):
+        scores = weakness_scores(self.KEY_STATS)
+        self.assertGreater(scores['q'], 1)
+        self.assertGreater(scores['th'], 1)
+        self.assertLess(scores['a'], 1)
+        self.assertGreater(scores['q'], scores['a'])
+
+    def test_no_stats_means_no_change(self):
+        self.assertEqual(weakness_scores({}), {})
+        generator = PassageGenerator(['queen', 'tea', 'ash'])
+        self.assertEqual(generator.practice({}).weights, generator.weights)
+
+    def test_practice_favours_words_with_weak_keys(self):
+        generator = PassageGenerator(['quay', 'that', 'ease'])
+        weights = dict(zip(generator.vocabulary, generator.practice(self.KEY_STATS).weights))
+        self.assertGreater(weights['quay'], weights['ease'])
+        self.assertGreater(weights['that'], weights['ease'])
+        self.assertEqual(weights['ease'], 1.0)
+
+
+class PassagePoolTest(unittest.TestCase):
+    def test_passages_come_from_the_generator_in_order(self):
+        pool = PassagePool(PassageGenerator(['alpha', 'beta'], seed=9), size=3)
+        try:
+            passages = [pool.get() for _ in range(10)]
+        finally:
+            pool.close()
+        expected = PassageGenerator(['alpha', 'beta'], seed=9)
+        self.assertEqual(passages, [expected.passage() for _ in range(10)])
+
+    def test_close_with_a_full_pool_returns_promptly(self):
+        pool = PassagePool(PassageGenerator(seed=1), size=2)
+        deadline = time.monotonic() + 10
+        while not pool.passages.full():  # The fill thread is now blocked on put()
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        start = time.monotonic()
+        pool.close()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertFalse(pool.thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
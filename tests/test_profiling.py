@@ -0,0 +1,74 @@
+"""Tests for the latency histograms and their export"""
+import csv
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from profiling import CSV_COLUMNS, LatencyHistogram, Profiler, bucket_bounds, bucket_index
+
+
+class BucketTest(unittest.TestCase):
+    def test_bounds_contain_the_value(self):
+        values = list(range(0, 300)) + [2 ** shift + offset for shift in range(8, 45) for offset in (-1, 0, 1)]
+        rng = random.Random(4)
+        values += [rng.randrange(1, 10 ** 12) for _ in range(5000)]
+        for ns in values:
+            low, high = bucket_bounds(bucket_index(ns))
+            self.assertTrue(low <= ns < high, (ns, low, high))
+
+    def test_buckets_are_narrow(self):
+        for ns in (16, 1000, 123_456, 10 ** 9):
+            low, high = bucket_bounds(bucket_index(ns))
+            self.assertLessEqual(high - low, low / 8 + 1)
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_percentiles_within_bucket_error(self):
+        rng = random.Random(5)
+        samples = sorted(int(rng.lognormvariate(13, 1)) for _ in range(20000))
+        histogram = LatencyHistogram()
+        for ns in samples:
+            histogram.record(ns)
+        for percent in (50, 95, 99):
+            exact = samples[int(percent / 100 * len(samples)) - 1]
+            self.assertAlmostEqual(histogram.percentile(percent) / exact, 1, delta=0.07)
+        self.assertEqual((histogram.min, histogram.max, histogram.count), (samples[0], samples[-1], len(samples)))
+        self.assertEqual(LatencyHistogram().percentile(50), 0)
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = Profiler()
+        for ns in (1_000_000, 2_000_000, 3_000_000):
+            self.profiler.record('render', ns)
+        self.profiler.add_count('merged', 4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_json(self):
+        path = os.path.join(self.tmp.name, 'session.json')
+        self.profiler.export(path)
+        with open(path, encoding='utf-8') as file:
+            report = json.load(file)
+        self.assertEqual(report['metrics']['render']['count'], 3)
+        self.assertAlmostEqual(report['metrics']['render']['mean_ms'], 2.0)
+        self.assertEqual(report['counters'], {'merged': 4})
+        self.assertEqual(sum(report['buckets']['render'].values()), 3)
+
+    def test_csv(self):
+        path = os.path.join(self.tmp.name, 'session.csv')
+        self.profiler.export(path)
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(tuple(rows[0]), CSV_COLUMNS)
+        render = dict(zip(CSV_COLUMNS, rows[1]))
+        self.assertEqual((render['name'], render['count'], float(render['max_ms'])), ('render', '3', 3.0))
+        self.assertEqual(rows[2][:2], ['merged', '4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests for the headless scoring engine; no display is needed"""
+import random
+import string
+import unittest
+
+from scoring import (BACKSPACE, TEST_DURATION, TypingScorer, apply_keystrokes, calculate_wpm, final_metrics,
+                     key_statistics, score_batch, score_session)
+
+
+def original_submit_metrics(correct_chars, incorrect_chars, total_chars):
+    """The saved metrics as the app computed them before scoring.py existed"""
+    return {
+        'wpm': int(correct_chars / 5),
+        'accuracy': int((correct_chars / total_chars) * 100) if total_chars > 0 else 0,
+        'cpm': int((total_chars / 60) * 60),
+        'total_chars': total_chars,
+        'correct_chars': correct_chars,
+        'incorrect_chars': incorrect_chars,
+        'duration': 60,
+    }
+
+
+def random_keystrokes(rng, text, count):
+    """Mostly correct keys with typos, backspaces and the odd paste"""
+    keys = []
+    typed = 0
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1 and typed:
+            keys.append(BACKSPACE)
+            typed -= 1
+        elif roll < 0.15:
+            keys.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 6))))
+            typed += len(keys[-1])
+        elif roll < 0.25 or typed >= len(text):
+            keys.append(rng.choice(string.ascii_lowercase + ' '))
+            typed += 1
+        else:
+            keys.append(text[typed])
+            typed += 1
+    return keys
+
+
+class WpmParityTest(unittest.TestCase):
+    def test_full_test_matches_original_formula(self):
+        for correct_chars in range(20000):
+            self.assertEqual(calculate_wpm(correct_chars, TEST_DURATION), int(correct_chars / 5), correct_chars)
+
+    def test_final_metrics_match_original_submit(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            total = rng.randint(0, 3000)
+            correct = rng.randint(0, total)
+            self.assertEqual(final_metrics(correct, total - correct, total),
+                             original_submit_metrics(correct, total - correct, total))
+
+    def test_no_time_elapsed(self):
+        self.assertEqual(calculate_wpm(100, 0), 0)
+
+
+class ScorerParityTest(unittest.TestCase):
+    def test_incremental_scorer_matches_score_session(self):
+        rng = random.Random(1)
+        text = 'the quick brown fox jumps over the lazy dog and keeps running far away'
+        for session in range(200):
+            keystrokes = random_keystrokes(rng, text, rng.randint(0, 120))
+            scorer = TypingScorer(text)
+            for key in keystrokes:
+                scorer.feed(key)
+            self.assertEqual(scorer.typed_text, apply_keystrokes(keystrokes))
+            self.assertEqual(scorer.final_metrics(), score_session(text, keystrokes), session)
+
+    def test_score_batch_yields_score_session_in_order(self):
+        text = 'hello world'
+        sessions = [(text, list('hello')), (text, list('hellp') + [BACKSPACE, 'o'], 30), (text, [])]
+        expected = [score_session(text, list('hello')), score_session(text, list('hello'), 30),
+                    score_session(text, [])]
+        self.assertEqual(list(score_batch(sessions)), expected)
+
+
+class KeyStatisticsTest(unittest.TestCase):
+    def test_attempts_errors_and_latencies(self):
+        events = [(0.0, 0, 'a'), (0.2, 1, 'x'), (0.5, 2, 'c')]
+        stats = key_statistics('abc', events)
+        self.assertEqual(stats['a'], [1, 0, 0.0, 0])  # The first key has no latency
+        self.assertEqual(stats['b'][:2], [1, 1])
+        self.assertEqual(stats['ab'][:2], [1, 1])
+        self.assertAlmostEqual(stats['c'][2], 0.3)
+        self.assertAlmostEqual(stats['bc'][2], 0.3)
+
+    def test_modifiers_do_not_change_latencies(self):
+        plain = [(0.0, 0, 'a'), (0.4, 1, 'b'), (0.8, 2, 'c')]
+        # Shift (no character) pressed just before the capital
+        shifted = [(0.0, 0, 'a'), (0.35, 1, ''), (0.4, 1, 'B'), (0.8, 2, 'c')]
+        plain_stats = key_statistics('abc', plain)
+        shifted_stats = key_statistics('aBc', shifted)
+        self.assertAlmostEqual(shifted_stats['B'][2], plain_stats['b'][2])
+        self.assertAlmostEqual(shifted_stats['c'][2], plain_stats['c'][2])
+
+    def test_control_keys_are_not_attempts(self):
+        events = [(0.0, 0, 'a'), (0.1, 1, '\t'), (0.15, 1, '\x7f'), (0.2, 1, '\x01'), (0.25, 1, BACKSPACE),
+                  (0.5, 1, 'b')]
+        stats = key_statistics('ab', events)
+        self.assertEqual(stats['b'][:2], [1, 0])
+        self.assertEqual(stats['b'][3], 1)
+        self.assertAlmostEqual(stats['b'][2], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+"""Tests for the results server: validation, group commit and caching"""
+import asyncio
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from remote_db import RemoteStatsDatabase, ServerError
+from server import AGGREGATE_CACHE_SIZE, MAX_READ_LIMIT, ResultStore, decode_result, serve
+from stats_db import StatsDatabase
+
+RESULT = {'username': 'alice', 'wpm': 50, 'accuracy': 90, 'total_chars': 250, 'correct_chars': 240,
+          'incorrect_chars': 10, 'cpm': 250, 'duration': 60}
+
+
+def result(**fields):
+    return dict(RESULT, **fields)
+
+
+class ServerTest(unittest.TestCase):
+    """Runs ``serve`` on an ephemeral port with a scratch database"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.port = None
+
+        def on_ready(port):
+            self.port = port
+            ready.set()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.task = self.loop.create_task(serve(os.path.join(self.tmp.name, 'server.db'), port=0,
+                                                    ready=on_ready))
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        self.assertTrue(ready.wait(10), "server did not start")
+        self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+
+    def tearDown(self):
+        self.conn.close()
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(10)
+        self.loop.close()
+        self.tmp.cleanup()
+
+    def post(self, path, payload):
+        self.conn.request('POST', path, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def call(self, method, *args):
+        status, body = self.post(f'/call/{method}', {'args': list(args)})
+        self.assertEqual(status, 200, body)
+        return body['result']
+
+    def test_submit_and_read(self):
+        status, body = self.post('/results', {'results': [result(), result(wpm=70)]})
+        self.assertEqual((status, body), (200, {'ids': [1, 2]}))
+        self.assertEqual(self.call('get_user_best_stats', 'alice')['best_wpm'], 70)
+        self.conn.request('GET', '/health')
+        self.assertEqual(json.loads(self.conn.getresponse().read())['committed'], 2)
+
+    def test_invalid_results_are_rejected(self):
+        for bad in (result(test_at='yesterday'), result(utc_offset=1.5), result(key_stats={'a': [1]}),
+                    result(wpm='fast'), result(username=''), {'username': 'alice'}, 'alice'):
+            status, body = self.post('/results', {'results': [bad]})
+            self.assertEqual(status, 400, bad)
+        self.assertEqual(self.post('/results', {'results': 'alice'})[0], 400)
+        self.assertIsNone(self.call('get_user_summary', 'alice'))
+
+    def test_resent_batch_is_stored_once(self):
+        payload = {'batch_id': 'batch-1', 'results': [result(), result(wpm=60)]}
+        first = self.post('/results', payload)
+        self.assertEqual(self.post('/results', payload), first)
+        self.assertEqual(self.call('get_user_summary', 'alice')['test_count'], 2)
+        self.assertEqual(self.post('/results', dict(payload, batch_id='batch-2'))[1], {'ids': [3, 4]})
+
+    def test_unknown_method(self):
+        self.assertEqual(self.post('/call/conn', {'args': []})[0], 404)
+
+    def test_invalid_content_length(self):
+        with socket.create_connection(('127.0.0.1', self.port), timeout=10) as sock:
+            sock.sendall(b'POST /results HTTP/1.1\r\nContent-Length: -5\r\n\r\n')
+            self.assertTrue(sock.recv(1024).startswith(b'HTTP/1.1 400 '))
+
+    def test_overlong_request_line(self):
+        with socket.create_connection(('127.0.0.1', self.port), timeout=10) as sock:
+            sock.sendall(b'GET /' + b'a' * 2 ** 17 + b' HTTP/1.1\r\n\r\n')
+            self.assertTrue(sock.recv(1024).startswith(b'HTTP/1.1 400 '))
+
+    def test_read_limits(self):
+        for limit in (-1, 0, MAX_READ_LIMIT + 1, 2.5, True, '10'):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.post('/call/get_leaderboard', {'args': ['avg_wpm', limit]})[0], 400)
+        self.assertEqual(self.post('/call/get_top_users', {'args': [-1]})[0], 400)
+        self.assertEqual(self.call('get_leaderboard', 'avg_wpm', MAX_READ_LIMIT), [])
+
+    def test_uncapped_reads_are_rejected(self):
+        self.post('/results', {'results': [result(), result(wpm=60)]})
+        for method, args in (('get_user_history', ['alice']), ('get_user_history', ['alice', None, None, None]),
+                             ('get_user_summaries', []), ('get_stats_page', [None, ['test_at'], True, None, False]),
+                             ('get_user_history', ['alice', None, None, 10, -1])):
+            with self.subTest(method=method, args=args):
+                self.assertEqual(self.post(f'/call/{method}', {'args': args})[0], 400)
+        self.assertEqual(self.post('/call/get_user_stats', {'args': [None]})[0], 404)
+        self.assertEqual([row[1] for row in self.call('get_user_history', 'alice', None, None, 1, 1)], [60])
+        self.assertEqual(len(self.call('get_user_summaries', None, 1)), 1)
+
+    def test_client_resends_only_failed_results(self):
+        queue_test_result = StatsDatabase.queue_test_result
+
+        def reject_mallory(db, username, *args, **kwargs):
+            if username == 'mallory':
+                raise ValueError("rejected")
+            return queue_test_result(db, username, *args, **kwargs)
+
+        db = RemoteStatsDatabase(f'http://127.0.0.1:{self.port}')
+        try:
+            for username in ('alice', 'mallory', 'bob'):
+                db.queue_test_result(username, 50, 90, 250, 240, 10, 250, 60)
+            with mock.patch.object(StatsDatabase, 'queue_test_result', reject_mallory):
+                with self.assertRaises(ServerError):
+                    db.flush_writes()
+            self.assertEqual([result['username'] for result in db.pending_results], ['mallory'])
+            self.assertIsNone(db.unsent_batch_id)
+            # The next flush sends only the failed result, under a new batch id
+            self.assertEqual(len(db.flush_writes()), 1)
+            for username in ('alice', 'mallory', 'bob'):
+                self.assertEqual(self.call('get_user_summary', username)['test_count'], 1)
+        finally:
+            db.close()
+
+    def test_client_reads_every_page(self):
+        self.post('/results', {'results': [result(wpm=wpm) for wpm in (40, 50, 60)] + [result(username='bob')]})
+        db = RemoteStatsDatabase(f'http://127.0.0.1:{self.port}')
+        try:
+            with mock.patch('remote_db.MAX_READ_LIMIT', 2):
+                self.assertEqual([row[1] for row in db.get_user_history('alice')], [40, 50, 60])
+                self.assertEqual([summary['username'] for summary in db.get_user_summaries()], ['alice', 'bob'])
+        finally:
+            db.close()
+
+
+class ResultStoreTest(unittest.TestCase):
+    """The group commit path, driven directly so a write can be made to fail"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ResultStore(os.path.join(self.tmp.name, 'store.db'), readers=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_failed_result_does_not_fail_its_batch(self):
+        good = decode_result(result())
+        other = decode_result(result(username='bob'))
+        # Passes decode_result's checks only because it skips them; the writer rejects it
+        broken = decode_result(result(username='mallory'))
+        broken[1]['key_stats'] = {'a': [1]}
+
+        async def submit_together():
+            return await asyncio.gather(self.store.submit([good]), self.store.submit([broken]),
+                                        self.store.submit([other]), return_exceptions=True)
+
+        ids, error, other_ids = self.run_async(submit_together())
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(len(other_ids), 1)
+        self.assertIsInstance(error, Exception)
+        self.assertEqual(self.store.committed, 2)
+        self.assertEqual(self.store.batches, 1)  # One shared batch, retried row by row
+
+        summaries = self.run_async(self.store.call('get_user_summaries', [None, 10]))
+        self.assertEqual(sorted(summary['username'] for summary in summaries), ['alice', 'bob'])
+
+    def test_resent_partial_batch_keeps_its_outcomes(self):
+        broken = decode_result(result(username='mallory'))
+        broken[1]['key_stats'] = {'a': [1]}
+        batch = [decode_result(result()), broken]
+        first = self.run_async(self.store.submit(batch, 'partial'))
+        self.assertIsInstance(first[0], int)
+        self.assertIsInstance(first[1], Exception)
+        # The stored result is not stored again, and the failure is reported again
+        self.assertEqual(self.run_async(self.store.submit(batch, 'partial')), first)
+        self.assertEqual(self.store.committed, 1)
+
+    def test_best_stats_cache_follows_user_generation(self):
+        async def scenario():
+            await self.store.submit([decode_result(result(wpm=40))])
+            first = await self.store.call('get_user_best_stats', ['alice'])
+            cached = await self.store.call('get_user_best_stats', ['alice'])
+            await self.store.submit([decode_result(result(username='bob', wpm=99))])
+            unaffected = await self.store.call('get_user_best_stats', ['alice'])
+            await self.store.submit([decode_result(result(wpm=80))])
+            return first, cached, unaffected, await self.store.call('get_user_best_stats', ['alice'])
+
+        first, cached, unaffected, updated = self.run_async(scenario())
+        self.assertEqual(first['best_wpm'], 40)
+        self.assertIs(cached, first)  # Served from the cache
+        self.assertIs(unaffected, first)  # Another user's commit keeps alice's entry
+        self.assertEqual((updated['best_wpm'], updated['total_tests']), (80, 2))
+
+    def test_aggregate_cache_is_bounded(self):
+        async def scenario():
+            for n in range(AGGREGATE_CACHE_SIZE + 10):
+                await self.store.call('get_wpm_distributions', [[f'user{n}']])
+
+        self.run_async(scenario())
+        self.assertEqual(len(self.store.aggregates.entries), AGGREGATE_CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
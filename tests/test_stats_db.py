@@ -0,0 +1,407 @@
+"""Tests for the stats database schema and its migrations"""
+import calendar
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from stats_db import LEADERBOARDS, MAX_UTC_OFFSET, SCHEMA_VERSION, DatabaseWorker, LRUCache, StatsDatabase
+from typingtest import STATS_SORT_COLUMNS
+
+# The table the app created before schema versioning existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS user_stats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        wpm INTEGER NOT NULL,
+        accuracy INTEGER NOT NULL,
+        total_chars INTEGER NOT NULL,
+        correct_chars INTEGER NOT NULL,
+        incorrect_chars INTEGER NOT NULL,
+        chars_per_minute INTEGER NOT NULL,
+        test_duration INTEGER NOT NULL,
+        test_date TEXT NOT NULL,
+        test_time TEXT NOT NULL
+    )
+'''
+
+# (id, username, wpm, accuracy, total, correct, incorrect, cpm, duration, local date, local time),
+# with gaps in the ids and tests on both sides of the 2024-03-10 DST change in New York
+BASELINE_ROWS = [
+    (1, 'alice', 40, 90, 220, 200, 20, 220, 60, '2024-03-09', '12:00:00'),
+    (2, 'bob', 55, 95, 290, 275, 15, 290, 60, '2024-03-09', '23:59:59'),
+    (5, 'alice', 48, 92, 260, 240, 20, 260, 60, '2024-03-11', '08:30:15'),
+    (9, 'bob', 61, 97, 314, 305, 9, 314, 60, '2024-07-04', '00:00:01'),
+]
+EST, EDT = -5 * 3600, -4 * 3600
+OFFSETS = {1: EST, 2: EST, 5: EDT, 9: EDT}
+
+
+def local_seconds(date, clock):
+    """A local date and time as seconds since the epoch, read as if it were UTC"""
+    return calendar.timegm(time.strptime(f'{date} {clock}', '%Y-%m-%d %H:%M:%S'))
+
+
+class StatsDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        # The v5 migration converts old local times with the process's time zone
+        self.old_tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'America/New_York'
+        time.tzset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'stats.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        if self.old_tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = self.old_tz
+        time.tzset()
+
+
+class MigrationTest(StatsDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        conn = sqlite3.connect(self.path)
+        conn.execute(BASELINE_SCHEMA)
+        conn.executemany('INSERT INTO user_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', BASELINE_ROWS)
+        conn.commit()
+        conn.close()
+        self.db = StatsDatabase(self.path)
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def test_reaches_current_version(self):
+        self.assertEqual(self.db.conn.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+
+    def test_keeps_ids_values_and_local_times(self):
+        rows = {row[0]: row for row in self.db.get_user_stats()}
+        self.assertEqual(sorted(rows), [1, 2, 5, 9])
+        for old in BASELINE_ROWS:
+            # The original columns come back unchanged, test_date and test_time now generated
+            self.assertEqual(rows[old[0]][:11], old)
+
+    def test_utc_conversion_across_dst(self):
+        for test_id, test_at, utc_offset, local_at in self.db.conn.execute(
+                'SELECT id, test_at, utc_offset, local_at FROM user_stats'):
+            old = next(row for row in BASELINE_ROWS if row[0] == test_id)
+            self.assertEqual(utc_offset, OFFSETS[test_id])
+            self.assertEqual(local_at, local_seconds(old[9], old[10]))
+            self.assertEqual(test_at, local_at - utc_offset)
+            # The same instant as the old local time read in New York
+            self.assertEqual(test_at, int(time.mktime(time.strptime(f'{old[9]} {old[10]}', '%Y-%m-%d %H:%M:%S'))))
+
+    def test_generated_columns(self):
+        for test_id, test_date, test_time, day_of_week, hour in self.db.conn.execute(
+                'SELECT id, test_date, test_time, day_of_week, hour FROM user_stats'):
+            old = next(row for row in BASELINE_ROWS if row[0] == test_id)
+            local = datetime.strptime(f'{old[9]} {old[10]}', '%Y-%m-%d %H:%M:%S')
+            self.assertEqual((test_date, test_time), (old[9], old[10]))
+            self.assertEqual((day_of_week, hour), (local.weekday(), local.hour))
+
+    def test_summaries_match_old_rows(self):
+        alice = self.db.get_user_summary('alice')
+        self.assertEqual((alice['test_count'], alice['wpm_sum'], alice['wpm_max']), (2, 88, 48))
+        self.assertEqual(sum(count for *_, count in self.db.get_activity()), len(BASELINE_ROWS))
+
+    def test_triggers_fire_after_rewrite(self):
+        test_at = local_seconds('2024-05-01', '14:10:00') - EDT  # A Wednesday, 14:00 in New York
+        self.db.queue_test_result('alice', 70, 99, 360, 350, 10, 360, 60, test_at=test_at, utc_offset=EDT)
+        self.db.queue_test_result('carol', 30, 80, 180, 150, 30, 180, 60, test_at=test_at, utc_offset=EDT)
+        self.db.flush_writes()
+
+        alice = self.db.get_user_summary('alice')
+        self.assertEqual((alice['test_count'], alice['wpm_sum'], alice['wpm_max']), (3, 158, 70))
+        self.assertEqual(self.db.get_user_summary('carol')['test_count'], 1)
+        self.assertIn((2, 14, 2), self.db.get_activity())
+        # New rows continue after the highest migrated id
+        self.assertGreater(max(row[0] for row in self.db.get_user_stats('carol')), 9)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(ttl=60)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        expired = LRUCache(ttl=0)
+        expired.put('a', 1)
+        self.assertIsNone(expired.get('a'))
+        self.assertEqual(len(expired.entries), 0)
+
+
+class StatsPageTest(StatsDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = StatsDatabase(self.path)
+        for n in range(6):
+            self.db.queue_test_result('erin', 40 + n, 90, 200, 180, 20, 200, 60,
+                                      test_at=1_700_000_000 + n * 7200 % 86400, utc_offset=0)
+        # Same time of day as the first test, so the id breaks the tie
+        self.db.queue_test_result('erin', 99, 90, 200, 180, 20, 200, 60, test_at=1_700_000_000, utc_offset=0)
+        self.db.flush_writes()
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def test_pages_by_time_of_day(self):
+        pages, after = [], None
+        while True:
+            page = self.db.get_stats_page(sort_columns=('test_time',), descending=False, after=after, limit=3)
+            if not page:
+                break
+            pages.append(page)
+            after = StatsDatabase.stats_sort_key(page[-1], ('test_time',))
+        rows = [row for page in pages for row in page]
+        self.assertEqual([(row[10], row[0]) for row in rows], sorted((row[10], row[0]) for row in rows))
+        self.assertEqual(len(rows), 7)
+
+    def test_every_sort_uses_an_index(self):
+        row = self.db.get_stats_page(limit=1)[0]
+        for heading, sort_columns in STATS_SORT_COLUMNS.items():
+            for descending in (True, False):
+                for after in (None, StatsDatabase.stats_sort_key(row, sort_columns)):
+                    with self.subTest(heading=heading, descending=descending, after=after):
+                        statements = []
+                        self.db.conn.set_trace_callback(statements.append)
+                        self.db.get_stats_page(sort_columns=sort_columns, descending=descending, after=after)
+                        self.db.conn.set_trace_callback(None)
+                        plan = [row[3] for row in self.db.conn.execute('EXPLAIN QUERY PLAN ' + statements[-1])]
+                        self.assertIn('INDEX', plan[0])
+                        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], plan)
+
+    def test_time_of_day_sort_uses_its_index(self):
+        statements = []
+        self.db.conn.set_trace_callback(statements.append)
+        self.db.get_stats_page(sort_columns=('test_time',), after=('12:00:00', 3))
+        self.db.conn.set_trace_callback(None)
+        plan = [row[3] for row in self.db.conn.execute('EXPLAIN QUERY PLAN ' + statements[-1])]
+        self.assertIn('idx_user_stats_time_of_day', ' '.join(plan))
+
+
+class UserHistoryTest(StatsDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = StatsDatabase(self.path)
+        self.base = 1_700_000_000
+        # (seconds after base in UTC, utc_offset, wpm): UTC order differs from local order
+        self.tests = [(0, 9 * 3600, 10), (600, -5 * 3600, 20), (1200, 0, 30), (4000, -3600, 40)]
+        for offset, utc_offset, wpm in self.tests:
+            self.db.queue_test_result('dana', wpm, 90, 100, 90, 10, 100, 60,
+                                      test_at=self.base + offset, utc_offset=utc_offset)
+        self.db.flush_writes()
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def test_sorted_by_local_time(self):
+        history = self.db.get_user_history('dana')
+        self.assertEqual([row[0] for row in history],
+                         sorted(self.base + offset + utc_offset for offset, utc_offset, _ in self.tests))
+        self.assertEqual([row[1] for row in history], [20, 40, 30, 10])
+
+    def test_range_is_in_utc(self):
+        # [base + 500, base + 4000) in UTC holds the 20 and 30 WPM tests, whatever their local times
+        history = self.db.get_user_history('dana', self.base + 500, self.base + 4000)
+        self.assertEqual([row[1] for row in history], [20, 30])
+
+    def test_range_reaches_the_largest_offsets(self):
+        # Local times up to MAX_UTC_OFFSET away from the UTC range are still found
+        edge = self.base + 10_000
+        self.db.queue_test_result('dana', 50, 90, 100, 90, 10, 100, 60, test_at=edge, utc_offset=MAX_UTC_OFFSET - 1)
+        self.db.queue_test_result('dana', 60, 90, 100, 90, 10, 100, 60, test_at=edge + 1, utc_offset=1 - MAX_UTC_OFFSET)
+        self.db.flush_writes()
+        history = self.db.get_user_history('dana', edge, edge + 2)
+        self.assertEqual(sorted(row[1] for row in history), [50, 60])
+
+
+class LeaderboardTest(StatsDatabaseTestCase):
+    # Summary field each board ranks by
+    BOARD_VALUES = {'avg_wpm': 'avg_wpm', 'best_wpm': 'wpm_max', 'accuracy': 'avg_accuracy', 'activity': 'test_count'}
+
+    def setUp(self):
+        super().setUp()
+        self.db = StatsDatabase(self.path)
+        # (username, [(wpm, accuracy), ...]) with ties on every board, broken by username
+        self.users = [
+            ('gus', [(50, 90), (80, 94)]),
+            ('fay', [(60, 92)]),
+            ('eve', [(40, 98), (80, 88)]),
+            ('abe', [(70, 80), (50, 100), (60, 92)]),
+            ('hal', [(30, 70)]),
+            ('cid', [(60, 92)]),
+        ]
+        for username, tests in self.users:
+            for wpm, accuracy in tests:
+                self.db.queue_test_result(username, wpm, accuracy, 300, 270, 30, 300, 60)
+        self.db.flush_writes()
+
+    def tearDown(self):
+        self.db.close()
+        super().tearDown()
+
+    def brute_force(self, board):
+        value = self.BOARD_VALUES[board]
+        return sorted(self.db.get_user_summaries(), key=lambda summary: (-summary[value], summary['username']))
+
+    def test_matches_brute_force_sort(self):
+        self.assertEqual(set(self.BOARD_VALUES), set(LEADERBOARDS))
+        for board in LEADERBOARDS:
+            with self.subTest(board=board):
+                expected = self.brute_force(board)
+                self.assertEqual(self.db.get_leaderboard(board, len(self.users)), expected)
+                self.assertEqual(self.db.get_leaderboard(board, 3), expected[:3])
+                self.assertEqual(self.db.get_leaders()[board], expected[0])
+
+    def test_ties_are_broken_by_username(self):
+        # abe, cid, eve and fay all average 60 WPM; eve and gus share the best of 80
+        self.assertEqual([user['username'] for user in self.db.get_leaderboard('avg_wpm')],
+                         ['gus', 'abe', 'cid', 'eve', 'fay', 'hal'])
+        self.assertEqual([user['username'] for user in self.db.get_leaderboard('best_wpm', 4)],
+                         ['eve', 'gus', 'abe', 'cid'])
+
+    def test_user_rank(self):
+        for board in LEADERBOARDS:
+            with self.subTest(board=board):
+                for place, summary in enumerate(self.brute_force(board), 1):
+                    self.assertEqual(self.db.get_user_rank(summary['username'], board), place)
+        self.assertIsNone(self.db.get_user_rank('nobody'))
+        with self.assertRaises(ValueError):
+            self.db.get_user_rank('abe', 'fastest')
+
+    def test_boards_read_their_index(self):
+        for board in LEADERBOARDS:
+            with self.subTest(board=board):
+                statements = []
+                self.db.conn.set_trace_callback(statements.append)
+                self.db.get_leaderboard(board, 3)
+                self.db.conn.set_trace_callback(None)
+                plan = [row[3] for row in self.db.conn.execute('EXPLAIN QUERY PLAN ' + statements[-1])]
+                self.assertIn(f'idx_user_summary_{board}', ' '.join(plan))
+                self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], plan)
+
+
+class DatabaseWorkerTest(StatsDatabaseTestCase):
+    """Drives the worker thread directly, polling its results like the Tk loop does"""
+
+    def setUp(self):
+        super().setUp()
+        self.errors = []
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.close(timeout=10)
+        super().tearDown()
+
+    def start_worker(self, path=None, flush_interval=60):
+        worker = DatabaseWorker(path or self.path, error_handler=self.errors.append, flush_interval=flush_interval)
+        self.workers.append(worker)
+        return worker
+
+    def wait_for(self, worker, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "worker did not answer")
+            worker.process_results()
+            time.sleep(0.01)
+
+    def queue_result(self, worker, username='alice'):
+        worker.submit(lambda db: db.queue_test_result(username, 50, 90, 250, 240, 10, 250, 60), write=True)
+
+    def test_read_sees_queued_write(self):
+        worker = self.start_worker()  # No idle flush during the test
+        self.queue_result(worker)
+        summaries = []
+        worker.submit('get_user_summary', 'alice', callback=summaries.append)
+        self.wait_for(worker, lambda: summaries)
+        self.assertEqual(summaries[0]['test_count'], 1)
+        self.assertEqual(self.errors, [])
+
+    def test_failing_flush_is_reported_once(self):
+        worker = self.start_worker(flush_interval=0.02)
+        blocker = sqlite3.connect(self.path)
+        self.addCleanup(blocker.close)
+        worker.submit('get_user_summaries', callback=lambda _: None)  # Wait for the schema
+        self.wait_for(worker, lambda: worker.results.empty() and worker.jobs.empty())
+        with blocker:
+            blocker.execute("CREATE TRIGGER reject BEFORE INSERT ON user_stats BEGIN SELECT RAISE(ABORT, 'full'); END")
+
+        self.queue_result(worker)
+        # The idle flush keeps failing with growing gaps, reported the first time only
+        self.wait_for(worker, lambda: self.errors)
+        time.sleep(0.5)
+        worker.process_results()
+        self.assertEqual(len(self.errors), 1)
+
+        # A read's flush fails into the read's own errback, and the read is skipped
+        read_errors, summaries = [], []
+        worker.submit('get_user_summary', 'alice', callback=summaries.append, errback=read_errors.append)
+        self.wait_for(worker, lambda: read_errors)
+        time.sleep(0.1)
+        worker.process_results()
+        self.assertEqual((len(read_errors), summaries, len(self.errors)), (1, [], 1))
+
+        # The result stayed queued and is written once the database accepts it
+        with blocker:
+            blocker.execute('DROP TRIGGER reject')
+        worker.submit('get_user_summary', 'alice', callback=summaries.append)
+        self.wait_for(worker, lambda: summaries)
+        self.assertEqual(summaries[0]['test_count'], 1)
+
+    def test_close_writes_pending_results(self):
+        worker = self.start_worker()
+        for username in ('alice', 'bob', 'alice'):
+            self.queue_result(worker, username)
+        self.assertTrue(worker.close(timeout=10))
+        db = StatsDatabase(self.path)
+        try:
+            self.assertEqual(db.get_user_summary('alice')['test_count'], 2)
+            self.assertEqual(db.get_user_summary('bob')['test_count'], 1)
+        finally:
+            db.close()
+
+    def test_open_error_reaches_every_job(self):
+        worker = self.start_worker(path=os.path.join(self.tmp.name, 'missing', 'stats.db'))
+        first, second = [], []
+        worker.submit('get_user_summaries', errback=first.append)
+        self.queue_result(worker)  # Reported to the error handler
+        worker.submit('get_overall_summary', errback=second.append)
+        self.wait_for(worker, lambda: first and second and self.errors)
+        self.assertIsInstance(first[0], sqlite3.OperationalError)
+        self.assertIs(second[0], first[0])
+        self.assertEqual(len(self.errors), 1)
+
+    def test_open_is_retried_until_it_succeeds(self):
+        directory = os.path.join(self.tmp.name, 'later')
+        worker = self.start_worker(path=os.path.join(directory, 'stats.db'), flush_interval=0.01)
+        failed = []
+        worker.submit('get_user_summaries', errback=failed.append)
+        self.wait_for(worker, lambda: failed)
+        os.mkdir(directory)
+        summaries = []
+
+        def read_when_open():
+            worker.submit('get_user_summaries', callback=summaries.append, errback=lambda error: read_when_open())
+
+        read_when_open()
+        self.wait_for(worker, lambda: summaries)
+        self.assertEqual(summaries[0], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
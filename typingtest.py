@@ -1,148 +1,158 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-import random
 import time
+import math
+import argparse
+import os
 import threading
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
-import numpy as np
+from scoring import (TypingScorer, common_prefix_length, calculate_wpm, calculate_accuracy,
+                     final_metrics, key_statistics, TEST_DURATION)
+from keylog import KeystrokeLog
+from passages import PassageGenerator, PassagePool
+from stats_db import StatsDatabase, DatabaseWorker, LRUCache, DATABASE_PATH
+from profiling import Profiler
+
+# matplotlib, seaborn, pandas and numpy take longer to import than the rest
+# of startup and only the Analytics tab needs them. load_analytics_stack()
+# fills these in, either from a background thread shortly after the window
+# appears or, at the latest, when analytics are first drawn.
+analytics = FigureCanvasTkAgg = NavigationToolbar2Tk = None
+analytics_lock = threading.Lock()
+
+# Delay (ms) after the first frame before the analytics stack is pre-warmed
+ANALYTICS_PREWARM_DELAY_MS = 500
+
+
+def load_analytics_stack():
+    """Import the plotting and data analysis modules (safe to call repeatedly)"""
+    global analytics, FigureCanvasTkAgg, NavigationToolbar2Tk
+    with analytics_lock:
+        if analytics is not None:
+            return
+        import matplotlib
+        matplotlib.use('TkAgg')
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as canvas_class
+        from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk as toolbar_class
+        import analytics as analytics_module
+        FigureCanvasTkAgg, NavigationToolbar2Tk = canvas_class, toolbar_class
+        analytics = analytics_module  # Set last: non-None means everything is loaded
+
+# Statistics table paging: rows per keyset query, rows kept in the Treeview,
+# and how close (as a fraction of the window) to either end a fetch triggers
+STATS_PAGE_SIZE = 100
+STATS_WINDOW_SIZE = 300
+STATS_PREFETCH_MARGIN = 0.2
+
+# How often (ms) the Tk thread picks up finished database jobs
+DB_POLL_INTERVAL_MS = 20
+# Longest wait (s) on exit for the database worker to write out queued results
+DB_CLOSE_TIMEOUT = 5
+
+# Environment variable naming a results server (see server.py) to use instead of a local database
+SERVER_ENV_VAR = 'TYPINGTEST_SERVER'
+
+# Pause in typing (ms) before the name box looks up the user's stats
+NAME_LOOKUP_DELAY_MS = 300
+# Seconds a user's cached best stats are shown before they are read again;
+# results saved by other instances sharing the database don't invalidate them
+BEST_STATS_CACHE_TTL = 5
+
+# Methods timed when profiling is on. The stats and analytics requests only
+# queue database jobs (which the worker times), so the callbacks that draw
+# their results are timed instead
+PROFILED_METHODS = ('on_key_press', 'on_key_release', 'render', 'update_text_highlighting', 'update_stats',
+                    'show_overall_summary', 'show_stats_page', 'show_user_analytics', 'show_comparison_analytics')
+# How often (ms) the latency overlay is redrawn
+PROFILE_OVERLAY_INTERVAL_MS = 500
+
+# Treeview column -> user_stats columns it sorts by
+STATS_SORT_COLUMNS = {
+    'Username': ('username',), 'WPM': ('wpm',), 'Accuracy': ('accuracy',), 'Total Chars': ('total_chars',),
+    'Correct': ('correct_chars',), 'Incorrect': ('incorrect_chars',), 'CPM': ('chars_per_minute',),
+    'Date': ('test_at',), 'Time': ('test_time',)
+}
 
 class TypingTest:
-    def __init__(self):
+    def __init__(self, refresh_rate=10, frame_rate=60, db_path=DATABASE_PATH, wal=False,
+                 prewarm_analytics=True, passage_generator=None, seed=None, profile_path=None, profile_overlay=False,
+                 server=None):
         self.root = tk.Tk()
         self.root.title("Advanced 60 Second Typing Test - Continuous Mode")
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize database
+        # Opt-in latency histograms, exported to profile_path on close
+        self.profile_path = profile_path
+        self.profile_overlay = profile_overlay
+        self.profiler = Profiler() if profile_path or profile_overlay else None
+        if self.profiler is not None:
+            self.profiler.instrument(self, PROFILED_METHODS)
+        
+        # Initialize database (or a results server shared by several stations)
+        self.db_path = db_path
+        self.wal = wal
+        self.server = server
+        self.prewarm_analytics = prewarm_analytics
         self.init_database()
         
-        # Enhanced word list with common words
-        self.words = [
-            # Common words
-            "the", "and", "for", "are", "but", "not", "you", "all", "can", "had", "her", "was", "one", "our", "out",
-            "day", "get", "has", "him", "his", "how", "man", "new", "now", "old", "see", "two", "way", "who", "boy",
-            "did", "its", "let", "put", "say", "she", "too", "use", "dad", "mom", "red", "big", "box", "yes", "yet",
-            "run", "sun", "fun", "cat", "dog", "car", "eat", "got", "lot", "hot", "sit", "bit", "hit", "fit", "win",
-            "end", "far", "off", "own", "try", "why", "ask", "men", "cut", "job", "eye", "oil", "six", "war", "lay",
-            "may", "few", "pop", "top", "bad", "bag", "bed", "leg", "egg", "add", "age", "ago", "air", "arm", "art",
-            
-            # Additional common words for better practice
-            "about", "after", "again", "against", "among", "another", "any", "around", "because", "before",
-            "being", "between", "both", "came", "come", "could", "each", "even", "every", "first", "from",
-            "give", "going", "good", "great", "group", "hand", "hard", "have", "here", "high", "home", "into",
-            "just", "know", "large", "last", "left", "life", "like", "line", "little", "long", "look", "made",
-            "make", "many", "most", "move", "much", "must", "name", "need", "next", "night", "number", "only",
-            "open", "order", "other", "over", "part", "people", "place", "point", "right", "said", "same",
-            "school", "seem", "several", "should", "show", "since", "small", "some", "still", "such", "system",
-            "take", "than", "them", "there", "these", "they", "thing", "think", "this", "those", "three",
-            "through", "time", "today", "together", "turn", "under", "until", "very", "water", "well", "went",
-            "were", "what", "when", "where", "which", "while", "will", "with", "without", "work", "world",
-            "would", "write", "year", "young", "your", "house", "never", "found", "every", "great", "where",
-            "help", "through", "much", "before", "move", "right", "line", "too", "any", "came", "want"
-        ]
+        # Word lists are loaded and indexed once (by the caller, for --words),
+        # and a background thread keeps the next passages ready so Reset only
+        # has to display one
+        if passage_generator is not None:
+            self.passage_generator = passage_generator
+        else:
+            self.passage_generator = PassageGenerator(seed=seed)
+        self.passage_seed = seed
+        self.practice_builds = 0  # Each practice generator gets its own seed
+        self.passages = PassagePool(self.passage_generator)
         
         self.test_text = ""
         self.typed_text = ""
-        self.start_time = None
-        self.time_left = 60
+        self.highlighted_text = ""  # Typed text the display currently reflects
+        self.start_time = None  # time.perf_counter() when the test started
+        self.test_duration = TEST_DURATION
+        self.time_left = self.test_duration
         self.test_active = False
         self.test_completed = False
-        self.timer_thread = None
+        self.refresh_interval = 1 / refresh_rate  # Seconds between countdown/live WPM updates
+        self.deadline = None
+        self.timer_job = None
+        self.frame_interval = 1 / frame_rate  # Minimum seconds between repaints of the test display
+        self.render_job = None
+        self.last_render_time = 0
+        self.render_count = 0
+        self.skipped_renders = 0  # Keystrokes whose repaint was merged into a pending one
         self.user_name = ""
         
         # For tracking performance
         self.correct_chars = 0
         self.incorrect_chars = 0
         self.total_chars_typed = 0
+        self.scorer = TypingScorer()
+        self.keystroke_log = KeystrokeLog()
         
         self.setup_ui()
         self.generate_text()
         
     def init_database(self):
-        """Initialize SQLite database for storing user stats"""
-        self.conn = sqlite3.connect('typing_test_stats.db')
-        cursor = self.conn.cursor()
-        
-        # Create table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                wpm INTEGER NOT NULL,
-                accuracy INTEGER NOT NULL,
-                total_chars INTEGER NOT NULL,
-                correct_chars INTEGER NOT NULL,
-                incorrect_chars INTEGER NOT NULL,
-                chars_per_minute INTEGER NOT NULL,
-                test_duration INTEGER NOT NULL,
-                test_date TEXT NOT NULL,
-                test_time TEXT NOT NULL
-            )
-        ''')
-        
-        self.conn.commit()
-        
-    def save_test_result(self, username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration):
-        """Save test result to database"""
-        cursor = self.conn.cursor()
-        current_datetime = datetime.now()
-        test_date = current_datetime.strftime("%Y-%m-%d")
-        test_time = current_datetime.strftime("%H:%M:%S")
-        
-        cursor.execute('''
-            INSERT INTO user_stats (username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, 
-                                  chars_per_minute, test_duration, test_date, test_time)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (username, wpm, accuracy, total_chars, correct_chars, incorrect_chars, cpm, duration, test_date, test_time))
-        
-        self.conn.commit()
-        
-    def get_user_stats(self, username=None):
-        """Get user statistics from database"""
-        cursor = self.conn.cursor()
-        
-        if username:
-            cursor.execute('''
-                SELECT * FROM user_stats WHERE username = ? ORDER BY test_date DESC, test_time DESC
-            ''', (username,))
-        else:
-            cursor.execute('''
-                SELECT * FROM user_stats ORDER BY test_date DESC, test_time DESC
-            ''')
-            
-        return cursor.fetchall()
-        
-    def get_user_best_stats(self, username):
-        """Get user's best statistics"""
-        cursor = self.conn.cursor()
-        
-        # Best WPM
-        cursor.execute('SELECT MAX(wpm) FROM user_stats WHERE username = ?', (username,))
-        best_wpm = cursor.fetchone()[0] or 0
-        
-        # Best Accuracy
-        cursor.execute('SELECT MAX(accuracy) FROM user_stats WHERE username = ?', (username,))
-        best_accuracy = cursor.fetchone()[0] or 0
-        
-        # Average WPM
-        cursor.execute('SELECT AVG(wpm) FROM user_stats WHERE username = ?', (username,))
-        avg_wpm = cursor.fetchone()[0] or 0
-        
-        # Total tests
-        cursor.execute('SELECT COUNT(*) FROM user_stats WHERE username = ?', (username,))
-        total_tests = cursor.fetchone()[0] or 0
-        
-        return {
-            'best_wpm': int(best_wpm),
-            'best_accuracy': int(best_accuracy),
-            'avg_wpm': round(avg_wpm, 1),
-            'total_tests': total_tests
-        }
+        """Start the worker that owns the SQLite database for storing user stats"""
+        # The Tk thread never touches SQLite: queries and writes are queued to
+        # the worker and their callbacks are run from poll_database
+        self.best_stats_cache = LRUCache(maxsize=256, ttl=BEST_STATS_CACHE_TTL)
+        self.db = DatabaseWorker(self.db_path, cache=self.best_stats_cache,
+                                 error_handler=self.show_database_error, wal=self.wal, profiler=self.profiler,
+                                 server=self.server)
+        self.name_lookup_job = None
+        self.poll_database()
+        
+    def poll_database(self):
+        """Run callbacks for finished database jobs on the Tk thread"""
+        self.db_poll_job = self.root.after(DB_POLL_INTERVAL_MS, self.poll_database)
+        self.db.process_results()
+        
+    def show_database_error(self, error):
+        """Report a failed database job"""
+        messagebox.showerror("Database Error", f"Could not access the statistics database:\n{error}")
         
     def setup_ui(self):
         # Create notebook for tabs
@@ -165,6 +175,29 @@ class TypingTest:
         self.setup_stats_tab()
         self.setup_analytics_tab()
         
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
+        if self.profile_overlay:
+            self.setup_profile_overlay()
+        
+    def setup_profile_overlay(self):
+        """Show live latency percentiles in the bottom-right corner of the window"""
+        self.overlay_label = tk.Label(self.root, font=('Courier', 9), justify='left', anchor='w',
+                                      bg='#263238', fg='#eceff1', padx=6, pady=4)
+        self.overlay_label.place(relx=1.0, rely=1.0, x=-12, y=-12, anchor='se')
+        self.refresh_profile_overlay()
+        
+    def refresh_profile_overlay(self):
+        """Redraw the overlay; it turns red when a keystroke's p95 exceeds one frame"""
+        self.overlay_job = self.root.after(PROFILE_OVERLAY_INTERVAL_MS, self.refresh_profile_overlay)
+        summaries = self.profiler.summaries()
+        budget_ms = self.frame_interval * 1000
+        slow = any(summaries[name]['p95_ms'] > budget_ms
+                   for name in ('on_key_release', 'render') if name in summaries)
+        self.overlay_label.config(text=f"Frame budget {budget_ms:.1f} ms | this test: {self.render_count} repaints, "
+                                       f"{self.skipped_renders} keystrokes merged\n{self.profiler.overlay_text()}",
+                                  bg='#b71c1c' if slow else '#263238')
+        
     def setup_test_tab(self):
         """Setup the main typing test interface"""
         # Title
@@ -250,6 +283,7 @@ class TypingTest:
         self.user_input.pack(side='left', fill='both', expand=True, padx=5, pady=5)
         input_scrollbar.pack(side='right', fill='y', pady=5)
         
+        self.user_input.bind('<KeyPress>', self.on_key_press)
         self.user_input.bind('<KeyRelease>', self.on_key_release)
         
         # Name input frame
@@ -273,6 +307,11 @@ class TypingTest:
         # Bind name entry to show stats
         self.name_entry.bind('<KeyRelease>', self.on_name_change)
         
+        # Practice mode: passages favour the user's weakest keys and bigrams
+        self.practice_mode = tk.BooleanVar(value=False)
+        tk.Checkbutton(name_frame, text="🎯 Practice weak keys", variable=self.practice_mode,
+                       font=("Arial", 11), bg='#f0f0f0', command=self.on_practice_toggle).pack(side='left', padx=10)
+        
         # Buttons frame
         button_frame = tk.Frame(self.test_frame, bg='#f0f0f0')
         button_frame.pack(pady=15)
@@ -324,21 +363,30 @@ class TypingTest:
         stats_display_frame = tk.Frame(self.stats_frame, bg='white', relief='sunken', bd=2)
         stats_display_frame.pack(pady=20, padx=20, fill='both', expand=True)
         
+        # The table only ever holds a window of rows around the visible ones,
+        # fetched page by page with keyset queries as the user scrolls
+        self.stats_filter = None
+        self.stats_sort_column = 'Date'
+        self.stats_sort_descending = True
+        self.stats_rows = []
+        self.stats_more_above = False
+        self.stats_more_below = False
+        self.stats_window_job = None
+        self.stats_page_pending = False
+        self.stats_generation = 0
+        
         # Create treeview for stats table
         self.stats_tree = ttk.Treeview(stats_display_frame, columns=(
             'Username', 'WPM', 'Accuracy', 'Total Chars', 'Correct', 'Incorrect', 'CPM', 'Date', 'Time'
         ), show='headings', height=15)
         
-        # Define headings
-        self.stats_tree.heading('Username', text='Username')
-        self.stats_tree.heading('WPM', text='WPM')
-        self.stats_tree.heading('Accuracy', text='Accuracy %')
-        self.stats_tree.heading('Total Chars', text='Total Chars')
-        self.stats_tree.heading('Correct', text='Correct')
-        self.stats_tree.heading('Incorrect', text='Incorrect')
-        self.stats_tree.heading('CPM', text='CPM')
-        self.stats_tree.heading('Date', text='Date')
-        self.stats_tree.heading('Time', text='Time')
+        # Define headings; clicking one sorts by that column in SQL
+        self.stats_headings = {
+            'Username': 'Username', 'WPM': 'WPM', 'Accuracy': 'Accuracy %', 'Total Chars': 'Total Chars',
+            'Correct': 'Correct', 'Incorrect': 'Incorrect', 'CPM': 'CPM', 'Date': 'Date', 'Time': 'Time'
+        }
+        for column, heading in self.stats_headings.items():
+            self.stats_tree.heading(column, text=heading, command=lambda c=column: self.sort_stats_by(c))
         
         # Configure column widths
         self.stats_tree.column('Username', width=100)
@@ -352,11 +400,11 @@ class TypingTest:
         self.stats_tree.column('Time', width=70)
         
         # Add scrollbar to treeview
-        stats_scrollbar = ttk.Scrollbar(stats_display_frame, orient='vertical', command=self.stats_tree.yview)
-        self.stats_tree.configure(yscrollcommand=stats_scrollbar.set)
+        self.stats_scrollbar = ttk.Scrollbar(stats_display_frame, orient='vertical', command=self.stats_tree.yview)
+        self.stats_tree.configure(yscrollcommand=self.on_stats_scroll)
         
         self.stats_tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
-        stats_scrollbar.pack(side='right', fill='y', pady=10)
+        self.stats_scrollbar.pack(side='right', fill='y', pady=10)
         
         # Summary frame
         self.summary_frame = tk.Frame(self.stats_frame, bg='#e3f2fd', relief='raised', bd=2)
@@ -397,20 +445,83 @@ class TypingTest:
         # Canvas frame for matplotlib plots
         self.canvas_frame = tk.Frame(self.analytics_frame, bg='white')
         self.canvas_frame.pack(pady=20, padx=20, fill='both', expand=True)
+        self.analytics_views = {}  # name -> (frame, view, canvas, summary label)
         
+    def on_tab_changed(self, event):
+        """Load the analytics stack when the Analytics tab is first opened"""
+        if analytics is None and self.notebook.index('current') == 2:
+            load_analytics_stack()
+            
     def on_name_change(self, event):
-        """Show user's best stats when name is entered"""
+        """Show user's best stats once typing in the name box pauses"""
+        if self.name_lookup_job is not None:
+            self.root.after_cancel(self.name_lookup_job)
+            self.name_lookup_job = None
+            
         username = self.name_entry.get().strip()
         if username and len(username) > 2:  # Show stats after 3 characters
-            stats = self.get_user_best_stats(username)
-            if stats['total_tests'] > 0:
-                text = f"Best: {stats['best_wpm']} WPM, {stats['best_accuracy']}% | Avg: {stats['avg_wpm']} WPM | Tests: {stats['total_tests']}"
-                self.best_stats_label.config(text=text, fg='#2e7d32')
-            else:
-                self.best_stats_label.config(text="New user - no previous tests", fg='#666')
+            self.name_lookup_job = self.root.after(NAME_LOOKUP_DELAY_MS, self.lookup_name_stats)
         else:
             self.best_stats_label.config(text="")
             
+    def lookup_name_stats(self):
+        """Look up the entered user's best stats from the cache or the database worker"""
+        self.name_lookup_job = None
+        username = self.name_entry.get().strip()
+        if self.practice_mode.get():
+            self.load_practice_passages(username)
+        stats = self.best_stats_cache.get(username)
+        if stats is not None:
+            self.show_name_stats(username, stats)
+            return
+            
+        self.db.submit('get_user_best_stats', username,
+                       callback=lambda stats: self.show_name_stats(username, stats))
+        
+    def show_name_stats(self, username, stats):
+        """Show best stats next to the name box, unless the name changed meanwhile"""
+        if username != self.name_entry.get().strip():
+            return
+        if stats['total_tests'] > 0:
+            text = f"Best: {stats['best_wpm']} WPM, {stats['best_accuracy']}% | Avg: {stats['avg_wpm']} WPM | Tests: {stats['total_tests']}"
+            self.best_stats_label.config(text=text, fg='#2e7d32')
+        else:
+            self.best_stats_label.config(text="New user - no previous tests", fg='#666')
+            
+    def on_practice_toggle(self):
+        """Switch between practice passages and the normal word weights"""
+        if not self.practice_mode.get():
+            self.use_passages(self.passage_generator)
+            return
+        username = self.name_entry.get().strip()
+        if not username:
+            messagebox.showwarning("Name Required", "Please enter your name to practice your weak keys.")
+            self.practice_mode.set(False)
+            return
+        self.load_practice_passages(username)
+        
+    def load_practice_passages(self, username):
+        """Reweight the vocabulary from the user's key stats on the database worker"""
+        # Seeded runs stay reproducible without every rebuild repeating the same passages
+        seed = None if self.passage_seed is None else self.passage_seed + self.practice_builds
+        self.practice_builds += 1
+        
+        def build(db):
+            return self.passage_generator.practice(db.get_key_stats(username), seed=seed)
+            
+        self.db.submit(build, callback=self.use_practice_passages, name='practice_passages')
+        
+    def use_practice_passages(self, generator):
+        if self.practice_mode.get():
+            self.use_passages(generator)
+            
+    def use_passages(self, generator):
+        """Draw passages from ``generator`` from now on"""
+        self.passages.close()
+        self.passages = PassagePool(generator)
+        if not self.test_active and not self.test_completed:
+            self.generate_text()
+            
     def show_user_stats(self):
         """Show statistics for specific user"""
         username = self.stats_user_entry.get().strip()
@@ -418,11 +529,12 @@ class TypingTest:
             messagebox.showwarning("Username Required", "Please enter a username to filter stats.")
             return
             
-        stats = self.get_user_stats(username)
-        self.populate_stats_table(stats)
+        self.load_stats_table(username)
+        self.db.submit('get_user_best_stats', username,
+                       callback=lambda best_stats: self.show_user_summary(username, best_stats))
         
-        # Show summary for user
-        best_stats = self.get_user_best_stats(username)
+    def show_user_summary(self, username, best_stats):
+        """Show summary for user"""
         if best_stats['total_tests'] > 0:
             summary_text = f"""
 Stats for {username}:
@@ -435,34 +547,143 @@ Average WPM: {best_stats['avg_wpm']} | Total Tests: {best_stats['total_tests']}
             
     def show_all_stats(self):
         """Show all user statistics"""
-        stats = self.get_user_stats()
-        self.populate_stats_table(stats)
+        self.load_stats_table(None)
+        self.db.submit('get_overall_summary', callback=self.show_overall_summary)
         
-        # Show general summary
-        if stats:
-            total_tests = len(stats)
-            unique_users = len(set(stat[1] for stat in stats))  # Count unique usernames
-            avg_wpm = sum(stat[2] for stat in stats) / total_tests
-            avg_accuracy = sum(stat[3] for stat in stats) / total_tests
-            
+    def show_overall_summary(self, overall):
+        """Show general summary from the per-user running totals"""
+        if overall['total_tests']:
             summary_text = f"""
 Overall Statistics:
-Total Tests: {total_tests} | Unique Users: {unique_users}
-Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
+Total Tests: {overall['total_tests']} | Unique Users: {overall['unique_users']}
+Average WPM: {overall['avg_wpm']:.1f} | Average Accuracy: {overall['avg_accuracy']:.1f}%
             """
             self.summary_label.config(text=summary_text.strip())
         else:
             self.summary_label.config(text="No test records found in database.")
             
+    def load_stats_table(self, username):
+        """Show the first page of stats for a user (or everyone)"""
+        self.stats_filter = username
+        self.stats_generation += 1  # Pages requested for an older view are dropped
+        generation = self.stats_generation
+        sort_columns, descending = self.stats_sort()
+        self.db.submit(lambda db: db.get_stats_page(username, sort_columns, descending, limit=STATS_PAGE_SIZE),
+                       callback=lambda rows: self.show_stats_page(generation, rows), name='get_stats_page')
+        
+    def show_stats_page(self, generation, rows):
+        """Fill the stats table with its first page"""
+        if generation != self.stats_generation:
+            return
+        self.populate_stats_table(rows)
+        self.stats_more_above = False
+        self.stats_more_below = len(rows) == STATS_PAGE_SIZE
+        self.stats_tree.yview_moveto(0)
+        
+    def sort_stats_by(self, column):
+        """Sort the stats table by a column, toggling direction on repeat clicks"""
+        if column == self.stats_sort_column:
+            self.stats_sort_descending = not self.stats_sort_descending
+        else:
+            self.stats_sort_column = column
+            self.stats_sort_descending = column != 'Username'
+            
+        for name, heading in self.stats_headings.items():
+            if name == column:
+                heading += ' ▼' if self.stats_sort_descending else ' ▲'
+            self.stats_tree.heading(name, text=heading)
+        self.load_stats_table(self.stats_filter)
+        
+    def stats_sort(self):
+        """Return (sort_columns, descending) for the current table order"""
+        return STATS_SORT_COLUMNS[self.stats_sort_column], self.stats_sort_descending
+        
+    def on_stats_scroll(self, first, last):
+        """Keep the scrollbar in sync and page in rows near either end"""
+        self.stats_scrollbar.set(first, last)
+        near_top = float(first) < STATS_PREFETCH_MARGIN and self.stats_more_above
+        near_bottom = float(last) > 1 - STATS_PREFETCH_MARGIN and self.stats_more_below
+        if (near_top or near_bottom) and self.stats_window_job is None and not self.stats_page_pending:
+            # Don't modify the tree from inside its own scroll callback
+            self.stats_window_job = self.root.after_idle(self.shift_stats_window)
+            
+    def shift_stats_window(self):
+        """Fetch the page beyond whichever end of the window is in view"""
+        self.stats_window_job = None
+        if not self.stats_rows or self.stats_page_pending:
+            return
+        first, last = (float(f) for f in self.stats_tree.yview())
+        sort_columns, descending = self.stats_sort()
+        
+        if last > 1 - STATS_PREFETCH_MARGIN and self.stats_more_below:
+            backwards = False
+            after = StatsDatabase.stats_sort_key(self.stats_rows[-1], sort_columns)
+        elif first < STATS_PREFETCH_MARGIN and self.stats_more_above:
+            backwards = True
+            after = StatsDatabase.stats_sort_key(self.stats_rows[0], sort_columns)
+        else:
+            return
+            
+        username, generation = self.stats_filter, self.stats_generation
+        self.stats_page_pending = True
+        self.db.submit(lambda db: db.get_stats_page(username, sort_columns, descending, after=after,
+                                                    backwards=backwards, limit=STATS_PAGE_SIZE),
+                       callback=lambda rows: self.extend_stats_window(generation, rows, backwards),
+                       errback=self.on_stats_page_failed, name='get_stats_page')
+        
+    def on_stats_page_failed(self, error):
+        """Report a failed page fetch; scrolling near the end tries again"""
+        self.stats_page_pending = False
+        self.show_database_error(error)
+        
+    def extend_stats_window(self, generation, rows, backwards):
+        """Add a fetched page to one end of the window and drop rows from the other"""
+        self.stats_page_pending = False
+        if generation != self.stats_generation or not self.stats_rows:
+            return
+            
+        # Row to keep in place while rows come and go around it
+        first = float(self.stats_tree.yview()[0])
+        anchor = self.stats_tree.get_children()[int(first * len(self.stats_rows))]
+        
+        if not backwards:
+            self.stats_more_below = len(rows) == STATS_PAGE_SIZE
+            self.insert_stats_rows(rows, 'end')
+            excess = len(self.stats_rows) - STATS_WINDOW_SIZE
+            if excess > 0:
+                self.stats_tree.delete(*self.stats_tree.get_children()[:excess])
+                del self.stats_rows[:excess]
+                self.stats_more_above = True
+        else:
+            self.stats_more_above = len(rows) == STATS_PAGE_SIZE
+            self.insert_stats_rows(rows, 0)
+            excess = len(self.stats_rows) - STATS_WINDOW_SIZE
+            if excess > 0:
+                self.stats_tree.delete(*self.stats_tree.get_children()[-excess:])
+                del self.stats_rows[-excess:]
+                self.stats_more_below = True
+                
+        self.stats_tree.yview_moveto(self.stats_tree.index(anchor) / len(self.stats_rows))
+        
     def populate_stats_table(self, stats):
         """Populate the statistics table with data"""
         # Clear existing data
-        for item in self.stats_tree.get_children():
-            self.stats_tree.delete(item)
-            
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        self.stats_rows = []
+        
         # Insert new data
+        self.insert_stats_rows(stats, 'end')
+        
+    def insert_stats_rows(self, stats, index):
+        """Insert rows at the start (index 0) or end ('end') of the statistics table"""
+        if index == 0:
+            self.stats_rows[:0] = stats
+            stats = reversed(stats)  # Inserting one by one at the top reverses them
+        else:
+            self.stats_rows.extend(stats)
+            
         for stat in stats:
-            self.stats_tree.insert('', 'end', values=(
+            self.stats_tree.insert('', index, values=(
                 stat[1],  # username
                 stat[2],  # wpm
                 f"{stat[3]}%",  # accuracy
@@ -476,14 +697,7 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
             
     def generate_text(self):
         """Generate text for typing test"""
-        # Create sentences from random words
-        sentences = []
-        for _ in range(8):  # 8 sentences
-            sentence_words = random.choices(self.words, k=random.randint(4, 8))
-            sentence = ' '.join(sentence_words) + '.'
-            sentences.append(sentence.capitalize())
-        
-        self.test_text = ' '.join(sentences)
+        self.test_text = self.passages.get()
         self.display_text()
         
     def display_text(self):
@@ -492,6 +706,8 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
         self.text_display.delete(1.0, tk.END)
         self.text_display.insert(tk.END, self.test_text, 'default')
         self.text_display.config(state='disabled')
+        self.highlighted_text = ""
+        self.scorer.reset(self.test_text)
         
     def start_test(self):
         """Start the typing test"""
@@ -502,12 +718,17 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
         self.user_name = self.name_entry.get().strip()
         self.test_active = True
         self.test_completed = False
-        self.start_time = time.time()
-        self.time_left = 60
+        self.start_time = time.perf_counter()
+        self.time_left = self.test_duration
         self.typed_text = ""
         self.correct_chars = 0
         self.incorrect_chars = 0
         self.total_chars_typed = 0
+        self.cancel_render()
+        self.render_count = 0
+        self.skipped_renders = 0
+        self.display_text()  # Clear highlighting left over from a previous test
+        self.keystroke_log.start(self.start_time)
         
         # Enable input and disable start button
         self.user_input.config(state='normal', bg='white')
@@ -521,21 +742,47 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
         self.start_timer()
         
     def start_timer(self):
-        """Start the countdown timer"""
-        def countdown():
-            while self.test_active and self.time_left > 0:
-                self.timer_label.config(text=f"Time: {self.time_left}s")
-                time.sleep(1)
-                self.time_left -= 1
-                
-            if self.test_active and self.time_left <= 0:
-                self.test_active = False
-                self.test_completed = True
-                self.root.after(0, self.enable_submit)
-                
-        self.timer_thread = threading.Thread(target=countdown, daemon=True)
-        self.timer_thread.start()
+        """Start the countdown timer on the Tk event loop.
+
+        Ticks are scheduled against a fixed perf_counter deadline rather than
+        by sleeping a fixed interval, so the countdown never drifts and the
+        test ends on time even if individual callbacks run late.
+        """
+        self.cancel_timer()
+        self.deadline = self.start_time + self.test_duration
+        self.tick_timer()
+        
+    def tick_timer(self):
+        """Refresh the countdown and live stats, then schedule the next tick"""
+        self.timer_job = None
+        if not self.test_active:
+            return
+            
+        now = time.perf_counter()
+        self.time_left = max(self.deadline - now, 0)
+        if self.time_left <= 0:
+            self.test_active = False
+            self.test_completed = True
+            self.update_stats()
+            self.record_render_counts()
+            self.enable_submit()
+            return
+            
+        self.timer_label.config(text=f"Time: {self.time_left:.1f}s")
+        self.update_stats()
         
+        # Next tick on the refresh grid measured from the start, never past the deadline
+        elapsed = now - self.start_time
+        next_tick = self.start_time + (math.floor(elapsed / self.refresh_interval) + 1) * self.refresh_interval
+        delay_ms = math.ceil((min(next_tick, self.deadline) - now) * 1000)
+        self.timer_job = self.root.after(max(delay_ms, 1), self.tick_timer)
+        
+    def cancel_timer(self):
+        """Cancel a pending countdown tick"""
+        if self.timer_job is not None:
+            self.root.after_cancel(self.timer_job)
+            self.timer_job = None
+            
     def enable_submit(self):
         """Enable submit button when test is completed"""
         self.user_input.config(state='disabled', bg='#f0f0f0')
@@ -543,66 +790,120 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
         self.timer_label.config(text="Time: 0s - Test Complete!")
         messagebox.showinfo("Test Complete", "Time's up! Click 'Submit Test' to save your results.")
         
+    def on_key_press(self, event):
+        """Record the timing and position of each key press"""
+        if not self.test_active:
+            return
+        if time.perf_counter() >= self.deadline:
+            # The final tick is still queued behind other callbacks; end the
+            # test now and keep this late key out of the input
+            self.cancel_timer()
+            self.tick_timer()
+            return 'break'
+            
+        # Widget bindings run before the Text class binding, so this is the
+        # position the key is about to act on
+        position = self.user_input.count('1.0', tk.INSERT)
+        self.keystroke_log.record(position[0] if position else 0, event.char)
+        
     def on_key_release(self, event):
         """Handle key release events for continuous typing"""
         if not self.test_active:
             return
             
-        # Get typed text
+        # Get typed text and score it right away so the counters stay exact
         self.typed_text = self.user_input.get(1.0, tk.END).rstrip('\n')
         self.total_chars_typed = len(self.typed_text)
+        self.scorer.update(self.typed_text)
+        self.correct_chars = self.scorer.correct_chars
+        self.incorrect_chars = self.scorer.incorrect_chars
         
-        # Update display with highlighting
-        self.update_text_highlighting()
+        # Repaint the display and labels at most once per frame
+        self.schedule_render()
         
-        # Update statistics
+    def schedule_render(self):
+        """Queue a repaint, merging it into one that is already pending"""
+        if self.render_job is not None:
+            self.skipped_renders += 1
+            return
+            
+        delay_ms = math.ceil((self.last_render_time + self.frame_interval - time.perf_counter()) * 1000)
+        if delay_ms > 0:
+            self.render_job = self.root.after(delay_ms, self.render)
+        else:
+            # Run once queued input has been handled so a burst still costs one repaint
+            self.render_job = self.root.after_idle(self.render)
+            
+    def render(self):
+        """Repaint the highlighting and live statistics"""
+        self.render_job = None
+        self.last_render_time = time.perf_counter()
+        self.render_count += 1
+        self.update_text_highlighting()
         self.update_stats()
+        
+    def record_render_counts(self):
+        """Add a finished test's repaint counts to the profile's counters"""
+        if self.profiler is not None:
+            self.profiler.add_count('tests', 1)
+            self.profiler.add_count('renders', self.render_count)
+            self.profiler.add_count('skipped_renders', self.skipped_renders)
+            
+    def cancel_render(self):
+        """Drop a pending repaint"""
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
             
     def update_text_highlighting(self):
-        """Update text highlighting based on typed input"""
-        self.text_display.config(state='normal')
-        self.text_display.delete(1.0, tk.END)
-        
-        # Reset counters
-        self.correct_chars = 0
-        self.incorrect_chars = 0
-        
-        # Compare character by character
-        for i, char in enumerate(self.test_text):
-            if i < len(self.typed_text):
-                typed_char = self.typed_text[i]
-                if char == typed_char:
-                    self.text_display.insert(tk.END, char, 'correct')
-                    self.correct_chars += 1
+        """Update text highlighting based on typed input.
+
+        Only the range that changed since the last repaint is retagged, so
+        the cost depends on the size of the edit rather than the passage.
+        """
+        old_length = len(self.highlighted_text)
+        new_text = self.typed_text
+        text_length = len(self.test_text)
+        
+        start = common_prefix_length(self.highlighted_text, new_text)
+        if start == old_length == len(new_text):
+            return  # Nothing changed (e.g. a modifier key was released)
+        
+        # Retag from the first changed character up to and including the
+        # old and new cursor positions
+        end = min(max(old_length, len(new_text)) + 1, text_length)
+        if start < end:
+            first, last = f"1.{start}", f"1.{end}"
+            for tag in ('correct', 'incorrect', 'current', 'default'):
+                self.text_display.tag_remove(tag, first, last)
+            
+            # Add tags in runs so a paste costs one call per run, not per char
+            run_start, run_tag = start, None
+            for i in range(start, end):
+                if i < len(new_text):
+                    tag = 'correct' if new_text[i] == self.test_text[i] else 'incorrect'
+                elif i == len(new_text):
+                    tag = 'current'
                 else:
-                    self.text_display.insert(tk.END, char, 'incorrect')
-                    self.incorrect_chars += 1
-            elif i == len(self.typed_text):
-                # Current position
-                self.text_display.insert(tk.END, char, 'current')
-            else:
-                # Not yet typed
-                self.text_display.insert(tk.END, char, 'default')
-                
-        self.text_display.config(state='disabled')
+                    tag = 'default'
+                if tag != run_tag:
+                    if run_tag is not None:
+                        self.text_display.tag_add(run_tag, f"1.{run_start}", f"1.{i}")
+                    run_start, run_tag = i, tag
+            self.text_display.tag_add(run_tag, f"1.{run_start}", last)
+        
+        self.highlighted_text = new_text
         
     def update_stats(self):
         """Update WPM, accuracy, and character count display"""
         if self.start_time:
-            elapsed_time = time.time() - self.start_time
+            elapsed_time = min(time.perf_counter() - self.start_time, self.test_duration)
             if elapsed_time > 0:
-                # Calculate WPM (assuming average word length of 5 characters)
-                words_typed = self.correct_chars / 5
-                wpm = int((words_typed / elapsed_time) * 60)
+                wpm = calculate_wpm(self.correct_chars, elapsed_time)
                 self.wpm_label.config(text=f"WPM: {wpm}")
                 
-        # Calculate accuracy
-        if self.total_chars_typed > 0:
-            accuracy = int((self.correct_chars / self.total_chars_typed) * 100)
-            self.accuracy_label.config(text=f"Accuracy: {accuracy}%")
-        else:
-            self.accuracy_label.config(text="Accuracy: 100%")
-            
+        accuracy = calculate_accuracy(self.correct_chars, self.total_chars_typed)
+        self.accuracy_label.config(text=f"Accuracy: {accuracy}%")
         self.chars_label.config(text=f"Chars: {self.total_chars_typed}")
             
     def submit_test(self):
@@ -611,35 +912,61 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
             messagebox.showwarning("Test Not Complete", "Please complete the test before submitting.")
             return
             
-        # Calculate final stats
-        elapsed_time = 60  # Full test duration
-        
-        # Calculate WPM (correct characters / 5 characters per word)
-        words_typed = self.correct_chars / 5
-        wpm = int(words_typed)
-        
-        # Calculate accuracy
-        accuracy = int((self.correct_chars / self.total_chars_typed) * 100) if self.total_chars_typed > 0 else 0
-        
-        # Calculate characters per minute
-        cpm = int((self.total_chars_typed / elapsed_time) * 60)
-        
-        # Save to database
-        self.save_test_result(self.user_name, wpm, accuracy, self.total_chars_typed, 
-                             self.correct_chars, self.incorrect_chars, cpm, elapsed_time)
-        
-        self.show_results(wpm, accuracy, self.total_chars_typed, cpm)
-        
-        # Update the user's best stats display
+        # Calculate final stats over the full test duration
+        elapsed_time = self.test_duration
+        results = final_metrics(self.correct_chars, self.incorrect_chars,
+                                self.total_chars_typed, elapsed_time)
+        wpm, accuracy, cpm = results['wpm'], results['accuracy'], results['cpm']
+        
+        # Queue the result on the database worker's write queue; reading the
+        # best stats once it is queued writes it out. The job only sees
+        # values captured here (the keystroke log is copied, since the next
+        # test clears it), and the buttons stay disabled until it finishes
+        user_name, total_chars = self.user_name, self.total_chars_typed
+        correct_chars, incorrect_chars = self.correct_chars, self.incorrect_chars
+        keystroke_log = self.keystroke_log.copy()
+        key_stats = key_statistics(self.test_text, keystroke_log.events())
+        counts = (total_chars, correct_chars, incorrect_chars)
+        self.submit_button.config(state='disabled')
+        self.reset_button.config(state='disabled')
+        
+        self.db.submit(lambda db: db.queue_test_result(user_name, wpm, accuracy, total_chars, correct_chars,
+                                                       incorrect_chars, cpm, elapsed_time,
+                                                       keystroke_log=keystroke_log, key_stats=key_stats),
+                       write=True, callback=lambda _: self.on_test_queued(user_name, wpm, accuracy, counts, cpm),
+                       errback=self.on_test_save_failed, name='queue_test_result')
+        
+    def on_test_queued(self, user_name, wpm, accuracy, counts, cpm):
+        """Read the best stats after a queued result, skipped when queueing failed so it is reported once"""
+        self.db.submit('get_user_best_stats', user_name,
+                       callback=lambda best_stats: self.on_test_saved(user_name, wpm, accuracy, counts, cpm, best_stats),
+                       errback=self.on_test_save_failed)
+        
+    def on_test_saved(self, user_name, wpm, accuracy, counts, cpm, best_stats):
+        """Show results once the test is stored"""
+        self.show_results(user_name, wpm, accuracy, counts, cpm, best_stats)
+        
+        # Update the user's best stats display (and practice passages, which
+        # now include this test's key stats)
         self.on_name_change(None)
         
         # Reset submit button
         self.submit_button.config(state='disabled', bg='#2196f3')
         self.start_button.config(state='normal')
+        self.reset_button.config(state='normal')
+        self.name_entry.config(state='normal')
+        
+    def on_test_save_failed(self, error):
+        """Report a failed save; the result stays queued and is retried on the next write"""
+        self.show_database_error(error)
+        self.start_button.config(state='normal')
+        self.reset_button.config(state='normal')
         self.name_entry.config(state='normal')
         
-    def show_results(self, wpm, accuracy, total_chars, cpm):
-        """Display test results"""
+
+    def show_results(self, user_name, wpm, accuracy, counts, cpm, best_stats):
+        """Display test results; ``counts`` is (total, correct, incorrect) chars as submitted"""
+        total_chars, correct_chars, incorrect_chars = counts
         # Results popup
         popup = tk.Toplevel(self.root)
         popup.title("Test Results")
@@ -654,7 +981,7 @@ Average WPM: {avg_wpm:.1f} | Average Accuracy: {avg_accuracy:.1f}%
         y = (popup.winfo_screenheight() // 2) - (popup.winfo_height() // 2)
         popup.geometry(f"+{x}+{y}")
         
-        tk.Label(popup, text=f"🎉 Results for {self.user_name}", 
+        tk.Label(popup, text=f"🎉 Results for {user_name}", 
                 font=("Arial", 18, "bold"), bg='#e8f5e8', fg='#2e7d32').pack(pady=20)
         
         results_text = f"""
@@ -664,8 +991,8 @@ Words Per Minute (WPM): {wpm}
 Characters Per Minute: {cpm}
 Accuracy: {accuracy}%
 Total Characters Typed: {total_chars}
-Correct Characters: {self.correct_chars}
-Incorrect Characters: {self.incorrect_chars}
+Correct Characters: {correct_chars}
+Incorrect Characters: {incorrect_chars}
 
 ✅ Results saved to database!
 """
@@ -691,7 +1018,6 @@ Incorrect Characters: {self.incorrect_chars}
                 font=("Arial", 14, "bold"), bg='#e8f5e8', fg=color).pack(pady=10)
         
         # Show personal best info
-        best_stats = self.get_user_best_stats(self.user_name)
         if best_stats['total_tests'] > 1:  # More than current test
             improvement_text = f"""
 📈 YOUR PERSONAL RECORDS:
@@ -707,7 +1033,7 @@ Average WPM: {best_stats['avg_wpm']} | Total Tests: {best_stats['total_tests']}
         
         tk.Button(button_frame, text="View Analytics", 
                  font=("Arial", 12, "bold"), bg='#4caf50', fg='white',
-                 padx=20, pady=5, command=lambda: [popup.destroy(), self.switch_to_analytics()]).pack(side='left', padx=10)
+                 padx=20, pady=5, command=lambda: [popup.destroy(), self.switch_to_analytics(user_name)]).pack(side='left', padx=10)
         
         tk.Button(button_frame, text="New Test", 
                  font=("Arial", 12, "bold"), bg='#2196f3', fg='white',
@@ -717,11 +1043,11 @@ Average WPM: {best_stats['avg_wpm']} | Total Tests: {best_stats['total_tests']}
                  font=("Arial", 12, "bold"), bg='#ff5722', fg='white',
                  padx=20, pady=5, command=popup.destroy).pack(side='left', padx=10)
         
-    def switch_to_analytics(self):
-        """Switch to analytics tab and generate charts for current user"""
+    def switch_to_analytics(self, user_name):
+        """Switch to analytics tab and generate charts for the given user"""
         self.notebook.select(2)  # Select analytics tab
         self.analytics_user_entry.delete(0, tk.END)
-        self.analytics_user_entry.insert(0, self.user_name)
+        self.analytics_user_entry.insert(0, user_name)
         self.generate_analytics()
         
     def reset_test(self):
@@ -732,14 +1058,16 @@ Average WPM: {best_stats['avg_wpm']} | Total Tests: {best_stats['total_tests']}
         self.correct_chars = 0
         self.incorrect_chars = 0
         self.total_chars_typed = 0
-        self.time_left = 60
+        self.time_left = self.test_duration
+        self.cancel_timer()
+        self.cancel_render()
         
         self.user_input.config(state='disabled', bg='white')
         self.user_input.delete(1.0, tk.END)
         self.start_button.config(state='normal')
         self.submit_button.config(state='disabled', bg='#2196f3')
         self.name_entry.config(state='normal')
-        self.timer_label.config(text="Time: 60s")
+        self.timer_label.config(text=f"Time: {self.test_duration}s")
         self.wpm_label.config(text="WPM: 0")
         self.accuracy_label.config(text="Accuracy: 100%")
         self.chars_label.config(text="Chars: 0")
@@ -753,194 +1081,129 @@ Average WPM: {best_stats['avg_wpm']} | Total Tests: {best_stats['total_tests']}
             messagebox.showwarning("Username Required", "Please enter a username to generate analytics.")
             return
             
-        stats = self.get_user_stats(username)
-        if not stats:
+        self.db.submit('get_user_history', username,
+                       callback=lambda history: self.show_user_analytics(username, history))
+        
+    def show_user_analytics(self, username, history):
+        """Draw the analytics charts for a user's test history"""
+        if not history:
             messagebox.showinfo("No Data", f"No test data found for user: {username}")
             return
-            
-        # Clear existing plots
-        for widget in self.canvas_frame.winfo_children():
-            widget.destroy()
-            
-        # Set seaborn style
-        sns.set_style("whitegrid")
-        sns.set_palette("husl")
-        
-        # Create figure with subplots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
-        fig.suptitle(f'Performance Analytics for {username}', fontsize=16, fontweight='bold')
-        
-        # Prepare data
-        dates = [datetime.strptime(stat[9], "%Y-%m-%d") for stat in stats]
-        wpms = [stat[2] for stat in stats]
-        accuracies = [stat[3] for stat in stats]
-        total_chars = [stat[4] for stat in stats]
-        cpms = [stat[7] for stat in stats]
-        
-        # Chart 1: WPM Progress Over Time with seaborn style
-        sns.lineplot(x=dates, y=wpms, marker='o', linewidth=3, markersize=8, ax=ax1, color='#2196f3')
-        ax1.fill_between(dates, wpms, alpha=0.3, color='#2196f3')
-        ax1.set_title('WPM Progress Over Time', fontweight='bold', fontsize=12)
-        ax1.set_ylabel('Words Per Minute')
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # Chart 2: Accuracy Over Time with trend
-        sns.lineplot(x=dates, y=accuracies, marker='s', linewidth=3, markersize=8, ax=ax2, color='#4caf50')
-        ax2.fill_between(dates, accuracies, alpha=0.3, color='#4caf50')
-        ax2.set_title('Accuracy Progress Over Time', fontweight='bold', fontsize=12)
-        ax2.set_ylabel('Accuracy (%)')
-        ax2.tick_params(axis='x', rotation=45)
-        
-        # Chart 3: WPM vs Accuracy Scatter with regression line
-        sns.scatterplot(x=wpms, y=accuracies, s=100, alpha=0.7, ax=ax3)
-        sns.regplot(x=wpms, y=accuracies, ax=ax3, scatter=False, color='red', line_kws={'linewidth': 2})
-        ax3.set_title('WPM vs Accuracy Correlation', fontweight='bold', fontsize=12)
-        ax3.set_xlabel('Words Per Minute')
-        ax3.set_ylabel('Accuracy (%)')
-        
-        # Chart 4: Performance Distribution with KDE
-        sns.histplot(wpms, bins=10, kde=True, ax=ax4, color='#ff9800', alpha=0.7)
-        ax4.axvline(np.mean(wpms), color='red', linestyle='--', linewidth=2, label=f'Average: {np.mean(wpms):.1f}')
-        ax4.set_title('WPM Distribution with Density', fontweight='bold', fontsize=12)
-        ax4.set_xlabel('Words Per Minute')
-        ax4.set_ylabel('Frequency')
-        ax4.legend()
-        
-        plt.tight_layout()
-        
-        # Embed plot in tkinter
-        canvas = FigureCanvasTkAgg(fig, self.canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-        
-        # Add statistics summary
-        stats_summary = tk.Frame(self.canvas_frame, bg='#f0f0f0', relief='raised', bd=2)
-        stats_summary.pack(fill='x', pady=10)
-        
-        summary_text = f"""
-📊 DETAILED ANALYTICS FOR {username.upper()}:
-Total Tests: {len(stats)} | Best WPM: {max(wpms)} | Average WPM: {np.mean(wpms):.1f} | Best Accuracy: {max(accuracies)}%
-Average Accuracy: {np.mean(accuracies):.1f}% | Total Characters Typed: {sum(total_chars)} | Average CPM: {np.mean(cpms):.1f}
-Improvement Trend: {"📈 Improving" if len(wpms) > 1 and wpms[-1] > wpms[0] else "📊 Stable"}
-"""
+        load_analytics_stack()
         
-        tk.Label(stats_summary, text=summary_text, font=("Arial", 10), 
-                bg='#f0f0f0', fg='#333', justify='left').pack(pady=10)
+        data = analytics.prepare_user_data(history)
+        view, canvas, summary_label = self.show_analytics_view('user', analytics.UserAnalyticsView)
+        view.update(username, data)
+        canvas.draw_idle()
+        summary_label.config(text=analytics.user_summary_text(username, data))
         
     def generate_comparison_analytics(self):
         """Generate comparison analytics for top users"""
-        all_stats = self.get_user_stats()
-        if not all_stats:
+        load_analytics_stack()
+        self.db.submit(analytics.query_comparison_data, callback=lambda data: self.show_comparison_analytics(*data))
+        
+    def show_comparison_analytics(self, overall, user_summaries, top_users, distributions, activity, leaders):
+        """Draw the comparison charts for all users"""
+        if not overall['total_tests']:
             messagebox.showinfo("No Data", "No test data found in database.")
             return
+        
+        data = analytics.prepare_comparison_data(user_summaries, top_users, distributions, activity, leaders)
+        view, canvas, summary_label = self.show_analytics_view('comparison', analytics.ComparisonAnalyticsView)
+        view.update(data)
+        canvas.draw_idle()
+        summary_label.config(text=analytics.comparison_summary_text(data, overall))
+        
+    def show_analytics_view(self, name, view_class):
+        """Show one analytics view, creating its figure and canvas the first time.
+        
+        Views are kept for the lifetime of the window; refreshing one updates
+        its artists in place instead of building a new figure.
+        """
+        if name not in self.analytics_views:
+            frame = tk.Frame(self.canvas_frame, bg='white')
+            view = view_class(analytics.create_figure())
+            canvas = FigureCanvasTkAgg(view.figure, frame)
+            canvas.get_tk_widget().pack(fill='both', expand=True)
+            # Zoom and pan; the progress charts re-bucket to the visible range
+            toolbar = NavigationToolbar2Tk(canvas, frame, pack_toolbar=False)
+            toolbar.pack(fill='x')
             
-        # Clear existing plots
-        for widget in self.canvas_frame.winfo_children():
-            widget.destroy()
+            # Statistics summary under the charts
+            stats_summary = tk.Frame(frame, bg='#f0f0f0', relief='raised', bd=2)
+            stats_summary.pack(fill='x', pady=10)
+            summary_label = tk.Label(stats_summary, font=("Arial", 10), 
+                                     bg='#f0f0f0', fg='#333', justify='left')
+            summary_label.pack(pady=10)
+            self.analytics_views[name] = (frame, view, canvas, summary_label)
             
-        # Create DataFrame for easier analysis
-        df = pd.DataFrame(all_stats, columns=['id', 'username', 'wpm', 'accuracy', 'total_chars', 
-                                             'correct_chars', 'incorrect_chars', 'cpm', 'duration', 
-                                             'test_date', 'test_time'])
-        
-        # Set seaborn style
-        sns.set_style("whitegrid")
-        try:
-            plt.style.use('seaborn-v0_8')
-        except:
-            try:
-                plt.style.use('seaborn')
-            except:
-                pass  # Use default style if seaborn styles not available
-        
-        # Create figure with subplots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
-        fig.suptitle('User Comparison Analytics', fontsize=16, fontweight='bold')
-        
-        # Chart 1: Top Users by Average WPM (Seaborn barplot)
-        user_avg_wpm = df.groupby('username')['wpm'].mean().sort_values(ascending=False).head(10)
-        sns.barplot(x=user_avg_wpm.values, y=user_avg_wpm.index, ax=ax1, hue=user_avg_wpm.index, palette='viridis', legend=False)
-        ax1.set_title('Top 10 Users by Average WPM', fontweight='bold', fontsize=12)
-        ax1.set_xlabel('Average WPM')
-        
-        # Chart 2: WPM vs Accuracy Comparison (Enhanced scatter)
-        user_stats = df.groupby('username').agg({'wpm': 'mean', 'accuracy': 'mean', 'id': 'count'}).reset_index()
-        user_stats.columns = ['username', 'avg_wpm', 'avg_accuracy', 'test_count']
-        
-        scatter = ax2.scatter(user_stats['avg_wpm'], user_stats['avg_accuracy'], 
-                            s=user_stats['test_count']*20, alpha=0.6, c=user_stats['avg_wpm'], 
-                            cmap='plasma', edgecolors='black', linewidth=1)
-        ax2.set_title('User Performance Comparison\n(Size = Number of Tests)', fontweight='bold', fontsize=12)
-        ax2.set_xlabel('Average WPM')
-        ax2.set_ylabel('Average Accuracy (%)')
-        plt.colorbar(scatter, ax=ax2, label='Avg WPM')
-        
-        # Chart 3: Performance Distribution Comparison (Violin plot)
-        top_users = user_avg_wpm.head(5).index.tolist()
-        df_top = df[df['username'].isin(top_users)]
-        
-        if len(df_top) > 0:
-            sns.violinplot(data=df_top, x='username', y='wpm', ax=ax3, hue='username', palette='Set2', legend=False)
-            ax3.set_title('WPM Distribution - Top 5 Users', fontweight='bold', fontsize=12)
-            ax3.tick_params(axis='x', rotation=45)
-            ax3.set_ylabel('Words Per Minute')
-        
-        # Chart 4: User Activity Heatmap
-        df['test_date'] = pd.to_datetime(df['test_date'])
-        df['day_of_week'] = df['test_date'].dt.day_name()
-        df['hour'] = pd.to_datetime(df['test_time']).dt.hour
-        
-        # Create activity heatmap data
-        activity_data = df.groupby(['day_of_week', 'hour']).size().unstack(fill_value=0)
-        
-        # Reorder days
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        activity_data = activity_data.reindex([day for day in day_order if day in activity_data.index])
-        
-        if not activity_data.empty:
-            sns.heatmap(activity_data, annot=True, fmt='d', ax=ax4, cmap='YlOrRd', cbar_kws={'label': 'Tests'})
-            ax4.set_title('User Activity Heatmap', fontweight='bold', fontsize=12)
-            ax4.set_xlabel('Hour of Day')
-            ax4.set_ylabel('Day of Week')
-        
-        plt.tight_layout()
-        
-        # Embed plot in tkinter
-        canvas = FigureCanvasTkAgg(fig, self.canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-        
-        # Add comparison statistics
-        stats_summary = tk.Frame(self.canvas_frame, bg='#f0f0f0', relief='raised', bd=2)
-        stats_summary.pack(fill='x', pady=10)
-        
-        unique_users = df['username'].nunique()
-        total_tests = len(df)
-        avg_wpm = df['wpm'].mean()
-        avg_accuracy = df['accuracy'].mean()
-        total_chars = df['total_chars'].sum()
-        top_performer = user_avg_wpm.index[0] if len(user_avg_wpm) > 0 else "N/A"
-        
-        summary_text = f"""
-🏆 PLATFORM COMPARISON ANALYTICS:
-Total Users: {unique_users} | Total Tests: {total_tests} | Platform Avg WPM: {avg_wpm:.1f} | Platform Avg Accuracy: {avg_accuracy:.1f}%
-Total Characters Typed: {total_chars:,} | Top Performer: {top_performer} ({user_avg_wpm.iloc[0]:.1f} WPM avg)
-Most Active User: {df['username'].value_counts().index[0]} ({df['username'].value_counts().iloc[0]} tests)
-"""
-        
-        tk.Label(stats_summary, text=summary_text, font=("Arial", 10), 
-                bg='#f0f0f0', fg='#333', justify='left').pack(pady=10)
+        for view_name, (frame, *_) in self.analytics_views.items():
+            if view_name != name:
+                frame.pack_forget()
+        frame, view, canvas, summary_label = self.analytics_views[name]
+        frame.pack(fill='both', expand=True)
+        return view, canvas, summary_label
         
     def run(self):
         """Start the application"""
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.prewarm_analytics:
+            self.root.after(ANALYTICS_PREWARM_DELAY_MS, self.start_analytics_prewarm)
         self.root.mainloop()
         
+    def start_analytics_prewarm(self):
+        """Import the analytics stack in the background once the UI is up"""
+        threading.Thread(target=load_analytics_stack, name='analytics-prewarm', daemon=True).start()
+        
     def on_closing(self):
         """Handle application closing"""
-        self.conn.close()
+        self.root.after_cancel(self.db_poll_job)
+        if self.profile_overlay:
+            self.root.after_cancel(self.overlay_job)
+        self.passages.close()
+        if not self.db.close(timeout=DB_CLOSE_TIMEOUT):
+            # The worker is a daemon thread, so whatever it has not written yet is lost
+            messagebox.showwarning("Results Not Saved",
+                                   "The statistics database did not respond in time; "
+                                   "the latest test results may not have been saved.")
+        if self.profile_path:
+            try:
+                self.profiler.export(self.profile_path)
+            except OSError as error:
+                messagebox.showerror("Profile Not Saved", f"Could not write {self.profile_path}: {error}")
         self.root.destroy()
 
 if __name__ == "__main__":
-    app = TypingTest()
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Advanced 60 second typing test")
+    parser.add_argument('--db', default=DATABASE_PATH, help="statistics database (default: %(default)s)")
+    parser.add_argument('--wal', action='store_true',
+                        help="use write-ahead logging, for databases shared by several instances")
+    parser.add_argument('--server', default=os.environ.get(SERVER_ENV_VAR),
+                        help=f"results server URL, e.g. http://lab-server:8765, instead of --db "
+                             f"(default: ${SERVER_ENV_VAR})")
+    parser.add_argument('--words', nargs='+', metavar='FILE',
+                        help="word list files, one word per line with an optional frequency weight")
+    parser.add_argument('--seed', type=int, help="seed for reproducible passages")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="record input path and database latencies and write them to FILE (.json or .csv) on exit")
+    parser.add_argument('--profile-overlay', action='store_true', help="show live latency percentiles on screen")
+    args = parser.parse_args()
+    if args.server:
+        # Checked up front so a mistyped URL fails here instead of on the first
+        # database job; imported here so local runs never load the HTTP client
+        from remote_db import parse_server_url
+        try:
+            parse_server_url(args.server)
+        except ValueError as error:
+            parser.error(str(error))
+    passage_generator = None
+    if args.words:
+        # Also before the window opens, so a bad file is a usage error, not a traceback
+        try:
+            passage_generator = PassageGenerator.from_files(args.words, seed=args.seed)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    
+    app = TypingTest(db_path=args.db, wal=args.wal, passage_generator=passage_generator, seed=args.seed,
+                     profile_path=args.profile, profile_overlay=args.profile_overlay, server=args.server)
+    app.run()
\ No newline at end of file